@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
-from .models import NGO, Animal, Adoption, Review
+from django.utils import timezone
+from .models import NGO, Animal, Adoption, Review, Job
 
 # Personalizar o site de administração
 admin.site.site_header = _('Administração do PetHaven')
@@ -103,3 +104,16 @@ class ReviewAdmin(admin.ModelAdmin):
     )
     readonly_fields = ('created_at',)
 
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('task', 'status', 'attempts', 'run_at', 'locked_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'task')
+    readonly_fields = ('task', 'payload', 'attempts', 'locked_by', 'locked_at', 'last_error', 'created_at',
+                       'finished_at')
+    actions = ['requeue']
+    
+    @admin.action(description=_('Executar de novo'))
+    def requeue(self, request, queryset):
+        queryset.exclude(status='running').update(status='queued', attempts=0, run_at=timezone.now(),
+                                                  locked_by='', locked_at=None, finished_at=None)
@@ -0,0 +1,122 @@
+from django.db import IntegrityError, router, transaction
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from .models import Animal, Adoption
+
+
+class TransitionError(Exception):
+    """
+    Mudanças de status recusadas: `errors` é {adoption_id: mensagem}.
+    `conflict` indica corrida com outra requisição (HTTP 409), não pedido inválido.
+    """
+
+    def __init__(self, errors, conflict=False):
+        super().__init__(errors)
+        self.errors = errors
+        self.conflict = conflict
+
+
+def send_post_save(instance, fields):
+    """
+    Os UPDATEs condicionais abaixo não passam por save(): dispara o post_save
+    para que cache, estatísticas e demais receptores (api/signals.py) vejam a
+    mudança, e atualiza o snapshot dos valores gravados.
+    """
+    post_save.send(
+        sender=type(instance), instance=instance, created=False, update_fields=frozenset(fields),
+        raw=False, using=router.db_for_write(type(instance)),
+    )
+    instance.remember_stored_values()
+
+
+def set_status(adoption, status, now):
+    """UPDATE condicionado ao status lido: se outra transação mudou antes, é conflito"""
+    values = {'status': status, 'updated_at': now}
+    if status == 'approved' and adoption.approval_date is None:
+        values['approval_date'] = now
+    if not Adoption.objects.filter(pk=adoption.pk, status=adoption.status).update(**values):
+        raise TransitionError({adoption.pk: 'O status da adoção mudou durante a operação.'}, conflict=True)
+    for field, value in values.items():
+        setattr(adoption, field, value)
+    send_post_save(adoption, values)
+
+
+def set_availability(animal, available, now):
+    values = {'is_available': available, 'updated_at': now}
+    if Animal.objects.filter(pk=animal.pk, is_available=not available).update(**values):
+        for field, value in values.items():
+            setattr(animal, field, value)
+        send_post_save(animal, values)
+
+
+def transition_adoptions(changes, reject_competing=True):
+    """
+    Aplica {adoption_id: novo status} numa única transação, tudo ou nada.
+
+    As adoções e os animais envolvidos são travados com select_for_update
+    (em ordem de id, contra deadlocks) e cada escrita é um UPDATE condicional
+    ao status lido; a restrição `adoption_one_approved_per_animal` é a última
+    barreira contra duas aprovações simultâneas do mesmo animal. Aprovar tira
+    o animal da adoção e, com `reject_competing`, rejeita as outras
+    solicitações pendentes dele; cancelar uma aprovação o devolve.
+
+    Devolve (adoções alteradas, solicitações rejeitadas automaticamente).
+    """
+    try:
+        with transaction.atomic():
+            return apply_transitions(changes, reject_competing)
+    except IntegrityError:
+        raise TransitionError(
+            {pk: 'Outra adoção deste animal foi aprovada ao mesmo tempo.' for pk in changes}, conflict=True,
+        )
+
+
+def apply_transitions(changes, reject_competing):
+    now = timezone.now()
+    adoptions = list(Adoption.objects.select_for_update().filter(pk__in=list(changes)).order_by('pk'))
+    found = {adoption.pk for adoption in adoptions}
+    errors = {pk: 'Adoção não encontrada.' for pk in changes if pk not in found}
+    for adoption in adoptions:
+        new = changes[adoption.pk]
+        if not Adoption.can_transition(adoption.status, new):
+            errors[adoption.pk] = f'Transição de status inválida: {adoption.status} -> {new}.'
+    if errors:
+        raise TransitionError(errors)
+
+    approving = [adoption for adoption in adoptions if changes[adoption.pk] == 'approved']
+    releasing = [adoption for adoption in adoptions
+                 if adoption.status == 'approved' and changes[adoption.pk] == 'cancelled']
+    animal_ids = [adoption.animal_id for adoption in approving]
+    animals = Animal.objects.select_for_update().filter(
+        pk__in=animal_ids + [adoption.animal_id for adoption in releasing],
+    ).order_by('pk').in_bulk()
+
+    taken = set(Adoption.objects.filter(animal__in=animal_ids, status__in=Adoption.ADOPTED_STATUSES)
+                .values_list('animal_id', flat=True))
+    raced = set()
+    for adoption in approving:
+        if adoption.animal_id in taken:
+            errors[adoption.pk] = 'O animal já tem uma adoção aprovada.'
+            raced.add(adoption.pk)
+        elif animal_ids.count(adoption.animal_id) > 1:
+            errors[adoption.pk] = 'O lote aprova mais de uma adoção do mesmo animal.'
+    if errors:
+        # Conflito só quando outra requisição chegou antes; um lote que se contradiz é pedido inválido
+        raise TransitionError(errors, conflict=set(errors) == raced)
+
+    for adoption in adoptions:
+        set_status(adoption, changes[adoption.pk], now)
+    for adoption in releasing:
+        set_availability(animals[adoption.animal_id], True, now)
+    for adoption in approving:
+        set_availability(animals[adoption.animal_id], False, now)
+
+    rejected = []
+    if reject_competing and animal_ids:
+        competing = (Adoption.objects.select_for_update()
+                     .filter(animal__in=animal_ids, status='pending').order_by('pk'))
+        for adoption in competing:
+            set_status(adoption, 'rejected', now)
+            rejected.append(adoption)
+    return adoptions, rejected
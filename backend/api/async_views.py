@@ -0,0 +1,203 @@
+from abc import ABCMeta, abstractmethod
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from django.views import View
+from rest_framework.response import Response
+
+from .cache import HITS_KEY, MISSES_KEY, RESPONSE_CACHE_TIMEOUT, aincr_counter, aresponse_cache_key
+from .conditional import acompute_validators, check_preconditions, set_validator_headers
+from .databases import reads_replica
+from .models import NGO, Animal, Adoption, Review
+from .renderers import ORJSONRenderer
+from .serializers import AnimalSerializer, ReviewSerializer
+from .sparse import sparse_queryset
+from .views import AnimalViewSet, NGOViewSet
+
+
+class AsyncReadView(View, metaclass=ABCMeta):
+    """
+    Leitura de um viewset DRF como view assíncrona do Django, para ASGI.
+
+    O DRF só tem views síncronas: sob ASGI cada requisição ocupa uma thread
+    do início ao fim. Aqui só o trecho síncrono do DRF (autenticação,
+    permissões e validação dos filtros) sai do event loop, via
+    `sync_to_async`; COUNT, linhas e agregado do ETag vêm do ORM assíncrono
+    e os serializers rodam no loop sobre objetos já carregados — o
+    select_related cobre as relações, e um acesso preguiçoso ao banco
+    levantaria SynchronousOnlyOperation em vez de bloquear o loop.
+
+    Usa as mesmas chaves do cache de respostas e os mesmos ETags das
+    actions síncronas equivalentes (`cache_models`, `validator_models` e
+    `timestamps` espelham os decorators delas).
+    """
+    viewset_class = None
+    action = None
+    detail = False
+    cache_models = ()
+    validator_models = ()
+    # Campos para o GET condicional; None desliga
+    timestamps = None
+    http_method_names = ['get', 'head', 'options']
+
+    async def get(self, request, *args, **kwargs):
+        view = self.initialize_viewset(request, kwargs)
+        try:
+            queryset = await sync_to_async(self.prepare)(view)
+            response = await self.conditional_response(view, queryset)
+        except Exception as exc:
+            response = view.handle_exception(exc)
+        response = view.finalize_response(view.request, response)
+        if isinstance(response, Response):
+            response.render()
+        return response
+
+    def initialize_viewset(self, request, kwargs):
+        """Instancia o viewset como o router faria, restrito ao JSON"""
+        view = self.viewset_class(
+            basename=self.viewset_class.queryset.model._meta.model_name,
+            detail=self.detail,
+        )
+        view.action_map = {'get': self.action, 'head': self.action}
+        view.args, view.kwargs = (), kwargs
+        view.format_kwarg = None
+        view.renderer_classes = [ORJSONRenderer]
+        view.request = view.initialize_request(request)
+        view.headers = view.default_response_headers
+        return view
+
+    def prepare(self, view):
+        """Trecho síncrono: DRF `initial()` e a queryset filtrada (sem executá-la)"""
+        view.initial(view.request)
+        queryset = view.filter_queryset(view.get_queryset())
+        if self.detail:
+            lookup = view.kwargs[view.lookup_url_kwarg or view.lookup_field]
+            try:
+                queryset = queryset.filter(**{view.lookup_field: lookup})
+            except (TypeError, ValueError, ValidationError):
+                raise Http404
+        return queryset
+
+    async def conditional_response(self, view, queryset):
+        if self.timestamps is None:
+            return await self.cached_response(view, queryset)
+
+        key = await aresponse_cache_key(view, view.request, self.validator_models, namespace='validators')
+        validators = await cache.aget(key)
+        if validators is None:
+            validators = await acompute_validators(queryset, self.timestamps) or {}
+            if not reads_replica(view):
+                await cache.aset(key, validators, RESPONSE_CACHE_TIMEOUT)
+        if not validators:
+            return await self.cached_response(view, queryset)
+
+        etag, response = check_preconditions(view, view.request, validators)
+        if response is None:
+            response = await self.cached_response(view, queryset)
+        return set_validator_headers(response, etag, validators)
+
+    async def cached_response(self, view, queryset):
+        request = view.request
+        if not self.cache_models or request.user.is_authenticated:
+            return await self.get_response(view, queryset)
+
+        key = await aresponse_cache_key(view, request, self.cache_models)
+        cached = await cache.aget(key)
+        if cached is not None:
+            await aincr_counter(HITS_KEY)
+            status, data = cached
+            response = Response(data, status=status)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        await aincr_counter(MISSES_KEY)
+        response = await self.get_response(view, queryset)
+        if response.status_code == 200 and not reads_replica(view):
+            await cache.aset(key, (response.status_code, response.data), RESPONSE_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    async def get_object(self, queryset):
+        instance = await queryset.afirst()
+        if instance is None:
+            raise Http404
+        return instance
+
+    @abstractmethod
+    async def get_response(self, view, queryset):
+        """Resposta da action (sem cache nem ETag) a partir da queryset já filtrada"""
+
+
+class AsyncListView(AsyncReadView):
+    action = 'list'
+
+    async def get_response(self, view, queryset):
+        if view.paginator is None:
+            rows = [obj async for obj in queryset]
+            return Response(view.get_serializer(rows, many=True).data)
+        page = await view.paginator.apaginate_queryset(queryset, view.request, view=view)
+        return view.paginator.get_paginated_response(view.get_serializer(page, many=True).data)
+
+
+class AsyncRetrieveView(AsyncReadView):
+    action = 'retrieve'
+    detail = True
+
+    async def get_response(self, view, queryset):
+        instance = await self.get_object(queryset)
+        return Response(view.get_serializer(instance).data)
+
+
+class NGOListView(AsyncListView):
+    viewset_class = NGOViewSet
+    cache_models = validator_models = (NGO,)
+    timestamps = ('updated_at',)
+
+
+class NGODetailView(AsyncRetrieveView):
+    viewset_class = NGOViewSet
+    cache_models = validator_models = (NGO,)
+    timestamps = ('updated_at',)
+
+
+class NGOAnimalsView(AsyncReadView):
+    viewset_class = NGOViewSet
+    action = 'animals'
+    detail = True
+    cache_models = (NGO, Animal, Adoption, Review)
+
+    async def get_response(self, view, queryset):
+        ngo = await self.get_object(queryset)
+        animals = Animal.objects.using(ngo._state.db).select_related('ngo').filter(ngo=ngo)
+        animals = [animal async for animal in animals]
+        return Response(AnimalSerializer(animals, many=True).data)
+
+
+class AnimalListView(AsyncListView):
+    viewset_class = AnimalViewSet
+    cache_models = (NGO, Animal, Adoption, Review)
+    validator_models = (NGO, Animal)
+    timestamps = ('updated_at', 'ngo__updated_at')
+
+
+class AnimalDetailView(AsyncRetrieveView):
+    viewset_class = AnimalViewSet
+    cache_models = (NGO, Animal, Adoption, Review)
+    validator_models = (NGO, Animal)
+    timestamps = ('updated_at', 'ngo__updated_at')
+
+
+class AnimalReviewsView(AsyncReadView):
+    viewset_class = AnimalViewSet
+    action = 'reviews'
+    detail = True
+
+    async def get_response(self, view, queryset):
+        animal = await self.get_object(queryset)
+        context = view.get_serializer_context()
+        reviews = sparse_queryset(Review.objects.using(animal._state.db).filter(animal=animal),
+                                  ReviewSerializer, context)
+        reviews = [review async for review in reviews]
+        return Response(ReviewSerializer(reviews, many=True, context=context).data)
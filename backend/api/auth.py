@@ -3,14 +3,20 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
 from django.contrib.auth import authenticate
 
 from .serializers import UserSerializer
+from .throttling import throttle_scope
 
 class CustomAuthToken(ObtainAuthToken):
     permission_classes = [AllowAny]
+    # O ObtainAuthToken desliga os throttles; aqui valem os padrões, com o
+    # limite apertado do escopo 'auth' contra tentativas de senha em massa
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+    throttle_scope = 'auth'
     
     def post(self, request, *args, **kwargs):
         serializer = self.serializer_class(data=request.data,
@@ -29,6 +35,7 @@ class CustomAuthToken(ObtainAuthToken):
             'last_name': user.last_name,
         })
 
+@throttle_scope('auth')
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def register_user(request):
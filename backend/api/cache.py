@@ -0,0 +1,156 @@
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+from .databases import reads_replica
+
+# Tempo máximo de vida de uma resposta. A invalidação de verdade é feita pelos
+# contadores de geração; o TTL só limita o espaço ocupado por chaves órfãs.
+RESPONSE_CACHE_TIMEOUT = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+
+HITS_KEY = 'response_cache:hits'
+MISSES_KEY = 'response_cache:misses'
+
+
+def generation_key(model):
+    return f'generation:{model._meta.label_lower}'
+
+
+def get_generations(models):
+    """
+    Geração atual de cada model. Uma geração ausente (cache novo ou chave
+    despejada) recomeça de um valor baseado no relógio, nunca de zero, para
+    não reencontrar respostas gravadas com uma geração antiga.
+    """
+    keys = [generation_key(model) for model in models]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, time.time_ns(), timeout=None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+async def aget_generations(models):
+    """Versão assíncrona de `get_generations`"""
+    keys = [generation_key(model) for model in models]
+    generations = await cache.aget_many(keys)
+    for key in keys:
+        if key not in generations:
+            await cache.aadd(key, time.time_ns(), timeout=None)
+            generations[key] = await cache.aget(key)
+    return [generations[key] for key in keys]
+
+
+def bump_generation(model):
+    key = generation_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def invalidate(model):
+    """
+    Invalida todas as respostas que dependem de `model`. Incrementa já (para
+    a própria requisição) e de novo no commit, descartando respostas que outra
+    requisição tenha montado com os dados anteriores ao commit.
+    """
+    bump_generation(model)
+    transaction.on_commit(lambda: bump_generation(model))
+
+
+def incr_counter(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+async def aincr_counter(key):
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        await cache.aadd(key, 1, timeout=None)
+
+
+def response_cache_stats():
+    counters = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits = counters.get(HITS_KEY, 0)
+    misses = counters.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / total if total else 0.0,
+    }
+
+
+def request_signature(view, request):
+    """Rota + query string normalizada + tudo que a negociação muda no corpo"""
+    query = sorted((key, request.query_params.getlist(key)) for key in request.query_params)
+    return '|'.join([
+        view.basename,
+        view.action,
+        repr(sorted(view.kwargs.items())),
+        repr(query),
+        request.scheme,
+        request.get_host(),
+        request.accepted_renderer.format,
+        getattr(request, 'LANGUAGE_CODE', ''),
+    ])
+
+
+def build_cache_key(view, request, generations, namespace):
+    signature = f'{request_signature(view, request)}|{generations!r}'
+    digest = hashlib.md5(signature.encode()).hexdigest()
+    return f'{namespace}:{view.basename}:{view.action}:{digest}'
+
+
+def response_cache_key(view, request, models, namespace='response'):
+    """Chave: assinatura da requisição + gerações dos models"""
+    return build_cache_key(view, request, get_generations(models), namespace)
+
+
+async def aresponse_cache_key(view, request, models, namespace='response'):
+    return build_cache_key(view, request, await aget_generations(models), namespace)
+
+
+def cache_response(*models):
+    """
+    Cacheia o `response.data` de GETs anônimos de uma action de viewset.
+
+    `models` são os models dos quais a resposta depende: qualquer save/delete
+    num deles (ver api/signals.py) muda a chave e a resposta antiga deixa de
+    ser usada. Respostas autenticadas e do navegador da API não são cacheadas,
+    nem as lidas de uma réplica (ver `reads_replica`).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, request, *args, **kwargs):
+            if (request.method != 'GET' or request.user.is_authenticated
+                    or request.accepted_renderer.format == 'api'):
+                return func(self, request, *args, **kwargs)
+
+            key = response_cache_key(self, request, models)
+            cached = cache.get(key)
+            if cached is not None:
+                incr_counter(HITS_KEY)
+                status, data = cached
+                response = Response(data, status=status)
+                response['X-Cache'] = 'HIT'
+                return response
+
+            incr_counter(MISSES_KEY)
+            response = func(self, request, *args, **kwargs)
+            if response.status_code == 200 and not reads_replica(self):
+                cache.set(key, (response.status_code, response.data), RESPONSE_CACHE_TIMEOUT)
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
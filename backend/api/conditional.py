@@ -0,0 +1,108 @@
+import functools
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Count, Max, Sum
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .cache import RESPONSE_CACHE_TIMEOUT, get_generations, request_signature, response_cache_key
+from .databases import reads_replica
+
+
+def compute_validators(view, timestamps):
+    """
+    ETag e Last-Modified a partir de um agregado sobre a queryset filtrada.
+
+    MAX de cada campo de `timestamps` detecta edições (inclusive em models
+    relacionados que aparecem no payload, como `ngo__updated_at`); COUNT e
+    SUM(id) detectam linhas que entram ou saem do conjunto. Tudo numa única
+    consulta, sem instanciar models nem rodar serializers.
+    """
+    queryset = view.filter_queryset(view.get_queryset())
+    lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+    if lookup_url_kwarg in view.kwargs:
+        queryset = queryset.filter(**{view.lookup_field: view.kwargs[lookup_url_kwarg]})
+    row = queryset.order_by().aggregate(**validator_aggregates(timestamps))
+    return validators_from_row(row, timestamps)
+
+
+async def acompute_validators(queryset, timestamps):
+    """Versão assíncrona, sobre uma queryset já filtrada pela view"""
+    row = await queryset.order_by().aaggregate(**validator_aggregates(timestamps))
+    return validators_from_row(row, timestamps)
+
+
+def validator_aggregates(timestamps):
+    aggregates = {f'max_{i}': Max(field) for i, field in enumerate(timestamps)}
+    return dict(rows=Count('pk'), pk_sum=Sum('pk'), **aggregates)
+
+
+def validators_from_row(row, timestamps):
+    if not row['rows']:
+        return None
+
+    last_modified = max(row[f'max_{i}'] for i in range(len(timestamps)) if row[f'max_{i}'])
+    fingerprint = repr(sorted((key, str(value)) for key, value in row.items()))
+    return {
+        'fingerprint': fingerprint,
+        'last_modified': int(last_modified.timestamp()),
+    }
+
+
+def conditional_response(*models, timestamps=('updated_at',), untimed=()):
+    """
+    GET condicional (If-None-Match / If-Modified-Since) para actions de viewset.
+
+    Os validadores são calculados antes da view e ficam em cache pela mesma
+    chave geracional de `cache_response`, então um 304 não roda serializers
+    e, com o cache quente, nem toca no banco. Validadores calculados numa
+    réplica valem só para a própria resposta e não vão para o cache. O ETag combina a impressão
+    digital das linhas com a query string e a negociação (formato/idioma),
+    então é forte: muda se o corpo mudar, e só nesse caso.
+    `If-Modified-Since` só vale no detalhe, porque a remoção de uma linha não
+    aumenta o MAX(updated_at) de uma listagem.
+
+    `untimed` são models que aparecem no payload sem um campo de data para
+    `timestamps` (ex.: User em `user_details`): a geração deles entra no
+    ETag, então qualquer alteração neles troca a versão.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return func(self, request, *args, **kwargs)
+
+            key = response_cache_key(self, request, models + untimed, namespace='validators')
+            validators = cache.get(key)
+            if validators is None:
+                validators = compute_validators(self, timestamps) or {}
+                if validators and untimed:
+                    validators['fingerprint'] += repr(get_generations(untimed))
+                if not reads_replica(self):
+                    cache.set(key, validators, RESPONSE_CACHE_TIMEOUT)
+            if not validators:
+                return func(self, request, *args, **kwargs)
+
+            etag, response = check_preconditions(self, request, validators)
+            if response is None:
+                response = func(self, request, *args, **kwargs)
+            return set_validator_headers(response, etag, validators)
+        return wrapper
+    return decorator
+
+
+def check_preconditions(view, request, validators):
+    """ETag da resposta e, se o cliente já tem essa versão, o 304 pronto"""
+    signature = f"{request_signature(view, request)}|{validators['fingerprint']}"
+    etag = quote_etag(hashlib.md5(signature.encode()).hexdigest())
+    is_detail = view.lookup_field in view.kwargs or (view.lookup_url_kwarg or '') in view.kwargs
+    last_modified = validators['last_modified'] if is_detail else None
+    return etag, get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+
+
+def set_validator_headers(response, etag, validators):
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(validators['last_modified'])
+    return response
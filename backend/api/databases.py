@@ -0,0 +1,100 @@
+import hashlib
+import random
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_KEY = 'replicas:pin:%s'
+
+
+def apply_sqlite_pragmas(connection):
+    """SQLITE_PRAGMAS em cada conexão nova (WAL, synchronous, mmap...), exceto SQLITE_KEEP_JOURNAL"""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = settings.SQLITE_PRAGMAS
+    if Path(connection.settings_dict['NAME']) in map(Path, settings.SQLITE_KEEP_JOURNAL):
+        pragmas = {name: value for name, value in pragmas.items() if name not in ('journal_mode', 'synchronous')}
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+class PrimaryReplicaRouter:
+    """
+    Escritas sempre no primário ('default'), inclusive de objetos lidos de
+    uma réplica. Leituras ficam onde a queryset pediu: ReplicaReadMixin
+    manda as dos viewsets de catálogo para uma réplica com `.using()`, e o
+    Django segue o banco da instância nas relações. As réplicas recebem o
+    schema junto com os dados (replicação ou `sync_replicas`), não do migrate.
+    """
+
+    def db_for_read(self, model, **hints):
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+def client_key(request):
+    """Identifica o cliente antes da autenticação do DRF: token, sessão ou IP"""
+    identity = (request.META.get('HTTP_AUTHORIZATION')
+                or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+                or request.META.get('REMOTE_ADDR', ''))
+    return hashlib.sha256(identity.encode()).hexdigest()[:32]
+
+
+def pin_to_primary(request):
+    """Depois de uma escrita, as leituras do cliente vão ao primário por REPLICA_PIN_SECONDS"""
+    cache.set(PIN_KEY % client_key(request), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(request):
+    return cache.get(PIN_KEY % client_key(request)) is not None
+
+
+def read_database(request):
+    """
+    Réplica para as leituras da requisição (a mesma durante toda ela), ou
+    None para o primário: sem réplicas, em métodos de escrita ou com o
+    cliente fixado no primário pela ReplicaPinningMiddleware.
+    """
+    request = getattr(request, '_request', request)
+    if not hasattr(request, 'read_database'):
+        pinned = getattr(request, 'pinned_to_primary', False)
+        request.read_database = (
+            random.choice(settings.DATABASE_REPLICAS)
+            if settings.DATABASE_REPLICAS and request.method in SAFE_METHODS and not pinned else None
+        )
+    return request.read_database
+
+
+class ReplicaReadMixin:
+    """Leituras do viewset numa réplica (ver read_database)"""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        database = read_database(self.request)
+        return queryset if database is None else queryset.using(database)
+
+
+def reads_replica(view):
+    """
+    Se a requisição da view lê de uma réplica. As gerações do cache de
+    respostas sobem no primário, então o que uma réplica atrasada devolve
+    não pode ser gravado sob a geração nova: essas leituras usam o cache,
+    mas não o alimentam.
+    """
+    return isinstance(view, ReplicaReadMixin) and read_database(view.request) is not None
@@ -0,0 +1,53 @@
+from collections import Counter
+
+from django.db.models import Count
+from django.utils.translation import gettext_lazy as _
+
+from .models import Animal
+
+# Campos de filterset_fields de AnimalViewSet que o /api/animals/facets/ conta
+FACETS = ('type', 'size', 'gender', 'ngo', 'is_available')
+CHOICES = {
+    'type': Animal.ANIMAL_TYPES,
+    'size': Animal.SIZE_CHOICES,
+    'gender': Animal._meta.get_field('gender').choices,
+    'is_available': ((True, _('Sim')), (False, _('Não'))),
+}
+
+
+def facet_counts(queryset, selected):
+    """
+    Contagens por valor de cada faceta com uma única consulta agrupada.
+
+    `queryset` já vem com a busca e o raio aplicados, mas sem os filtros de
+    faceta; `selected` traz o valor escolhido de cada faceta ({} ou None
+    quando não há filtro). A consulta conta cada combinação de valores, e
+    cada faceta soma as combinações que atendem aos filtros das *outras*:
+    escolher type=dog não zera os gatos na faceta de tipo. O número de
+    combinações é limitado (tipos × portes × gêneros × ONGs × 2), não pelo
+    de animais.
+    """
+    selected = {name: value for name, value in selected.items() if value not in (None, '')}
+    rows = queryset.order_by().values(*FACETS, 'ngo__name').annotate(count=Count('pk'))
+    counts = {name: Counter() for name in FACETS}
+    ngo_names = {}
+    total = 0
+    for row in rows:
+        ngo_names[row['ngo']] = row['ngo__name']
+        misses = [name for name, value in selected.items() if row[name] != value]
+        if not misses:
+            total += row['count']
+        elif len(misses) > 1:
+            continue
+        for name in misses or FACETS:
+            counts[name][row[name]] += row['count']
+
+    facets = {
+        name: [{'value': value, 'label': str(label), 'count': counts[name][value]} for value, label in choices]
+        for name, choices in CHOICES.items()
+    }
+    facets['ngo'] = [
+        {'value': pk, 'label': ngo_names[pk], 'count': count}
+        for pk, count in sorted(counts['ngo'].items(), key=lambda item: (-item[1], ngo_names[item[0]]))
+    ]
+    return {'count': total, 'facets': {name: facets[name] for name in FACETS}}
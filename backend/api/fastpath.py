@@ -0,0 +1,184 @@
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.utils import translation
+from rest_framework import serializers
+from rest_framework.filters import OrderingFilter
+from rest_framework.response import Response
+
+from .pagination import annotated_ordering
+from .timing import timed_serialization
+
+# Campos cujo to_representation devolve o próprio valor lido do banco
+IDENTITY_FIELDS = (
+    serializers.BooleanField, serializers.CharField, serializers.ChoiceField, serializers.FloatField,
+    serializers.IntegerField, serializers.JSONField, serializers.ReadOnlyField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+# {(model, campo, idioma): {valor: rótulo}}
+_label_tables = {}
+
+
+class NotCompilable(Exception):
+    """O serializer tem um campo que o caminho rápido não sabe reproduzir"""
+
+
+def label_table(model, name):
+    """Rótulos das escolhas de `model.name` no idioma ativo, resolvidos uma única vez"""
+    key = (model, name, translation.get_language())
+    table = _label_tables.get(key)
+    if table is None:
+        field = model._meta.get_field(name)
+        table = _label_tables[key] = {value: str(label) for value, label in field.flatchoices}
+    return table
+
+
+class RowView:
+    """Expõe as colunas de uma linha de `.values()` como atributos, para SerializerMethodFields"""
+    __slots__ = ('row', 'prefix')
+
+    def __init__(self, row, prefix):
+        self.row = row
+        self.prefix = prefix
+
+    def __getattr__(self, name):
+        return self.row[self.prefix + name]
+
+
+class CompiledSerializer:
+    """
+    Versão só-leitura de um ModelSerializer que monta cada linha a partir de
+    um dict de `.values()`, sem instanciar models nem percorrer os campos do
+    DRF linha a linha.
+
+    A compilação lê os campos do serializer (já podados por ?fields=/?expand=)
+    e escolhe, para cada um, a coluna e a conversão equivalentes ao
+    to_representation do DRF: identidade para tipos que o banco já entrega
+    prontos, tabela de rótulos por idioma para `get_<campo>_display` e
+    `display_fields`, e o próprio campo do DRF para o resto (datas). O JSON
+    gerado é idêntico byte a byte ao do serializer original.
+    """
+
+    def __init__(self, serializer, prefix=''):
+        self.prefix = prefix
+        self.columns = []
+        self.plan = []
+        model = serializer.Meta.model
+        self.pk_column = prefix + model._meta.pk.attname
+        for field in serializer._readable_fields:
+            self.plan.append((field.field_name, self.compile_field(serializer, model, field)))
+        for name in getattr(serializer, 'display_fields', ()):
+            self.plan.append((f'{name}_display', self.display(model, name)))
+        self.columns = list(dict.fromkeys(self.columns + [self.pk_column]))
+
+    def column(self, path):
+        column = self.prefix + path
+        self.columns.append(column)
+        return column
+
+    def compile_field(self, serializer, model, field):
+        if isinstance(field, serializers.BaseSerializer):
+            if isinstance(field, serializers.ListSerializer) or '.' in field.source:
+                raise NotCompilable(field.field_name)
+            child = CompiledSerializer(field, prefix=f'{self.prefix}{field.source}__')
+            self.columns.extend(child.columns)
+            pk_column = child.pk_column
+            return lambda row: None if row[pk_column] is None else child.render_row(row)
+
+        if isinstance(field, serializers.SerializerMethodField):
+            sources = getattr(serializer, 'method_field_sources', {}).get(field.field_name)
+            if sources is None:
+                raise NotCompilable(field.field_name)
+            for source in sources:
+                self.column(source)
+            method = getattr(serializer, field.method_name)
+            prefix = self.prefix
+            return lambda row: method(RowView(row, prefix))
+
+        source = field.source
+        if source.startswith('get_') and source.endswith('_display'):
+            return self.display(model, source[len('get_'):-len('_display')])
+        if source == '*':
+            raise NotCompilable(field.field_name)
+
+        model_field = None
+        if '.' not in source:
+            try:
+                model_field = model._meta.get_field(source)
+            except FieldDoesNotExist:
+                raise NotCompilable(field.field_name)
+            if not model_field.concrete:
+                raise NotCompilable(field.field_name)
+        column = self.column(source.replace('.', '__'))
+        if isinstance(field, serializers.FileField):
+            if model_field is None:
+                raise NotCompilable(field.field_name)
+            return self.file_url(model_field, field, column)
+        if isinstance(field, IDENTITY_FIELDS) and not isinstance(field, serializers.DateTimeField):
+            return lambda row: row[column]
+        to_representation = field.to_representation
+        return lambda row: None if row[column] is None else to_representation(row[column])
+
+    def display(self, model, name):
+        column = self.column(name)
+        table = label_table(model, name)
+        return lambda row: table.get(row[column], row[column])
+
+    def file_url(self, model_field, field, column):
+        """Mesma saída do FileField/ImageField do DRF com use_url"""
+        if not getattr(field, 'use_url', True):
+            return lambda row: row[column] or None
+        storage = model_field.storage
+        request = field.context.get('request')
+        build = request.build_absolute_uri if request is not None else None
+
+        def url(row):
+            name = row[column]
+            if not name:
+                return None
+            return build(storage.url(name)) if build else storage.url(name)
+        return url
+
+    def render_row(self, row):
+        return {name: getter(row) for name, getter in self.plan}
+
+    def render(self, rows):
+        with timed_serialization():
+            return [self.render_row(row) for row in rows]
+
+
+def compile_serializer(serializer):
+    try:
+        return CompiledSerializer(serializer)
+    except NotCompilable:
+        return None
+
+
+class FastListMixin:
+    """
+    `list` pelo caminho rápido: a mesma filtragem, paginação e formato, mas
+    com as linhas vindas de `.values()` e montadas por CompiledSerializer.
+    Serializers que não compilam (ou FAST_LIST_SERIALIZATION = False) usam
+    o caminho normal do DRF.
+    """
+
+    def list(self, request, *args, **kwargs):
+        compiled = None
+        if getattr(settings, 'FAST_LIST_SERIALIZATION', True):
+            compiled = compile_serializer(self.get_serializer())
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        keys = []
+        if OrderingFilter in self.filter_backends:
+            # A paginação por cursor lê a chave de ordenação de cada linha
+            ordering = OrderingFilter().get_ordering(request, queryset, self) or []
+            ordering = ordering or [annotated_ordering(queryset) or 'pk']
+            keys = [term.lstrip('-') for term in ordering if term.lstrip('-') not in ('pk', 'id')]
+        rows = queryset.values(*dict.fromkeys(compiled.columns + keys))
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(compiled.render(page))
+        return Response(compiled.render(rows))
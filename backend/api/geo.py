@@ -0,0 +1,193 @@
+import csv
+import functools
+import math
+import unicodedata
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+CITIES_FILE = Path(__file__).resolve().parent / 'data' / 'cities.csv'
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+GEOHASH_PRECISION = 9  # células de ~5 m
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def normalize_city(name):
+    """'São Paulo ' -> 'sao paulo', para casar com a tabela sem depender de acentos"""
+    name = unicodedata.normalize('NFKD', name or '')
+    return ' '.join(''.join(c for c in name if not unicodedata.combining(c)).lower().split())
+
+
+@functools.lru_cache(maxsize=None)
+def city_table():
+    """{cidade normalizada: (latitude, longitude)} da tabela embarcada em api/data/cities.csv"""
+    with open(CITIES_FILE, encoding='utf-8', newline='') as stream:
+        return {
+            normalize_city(row['city']): (float(row['latitude']), float(row['longitude']))
+            for row in csv.DictReader(stream)
+        }
+
+
+def geocode_city(city):
+    """Coordenadas da cidade, ou None se ela não está na tabela"""
+    return city_table().get(normalize_city(city))
+
+
+def geocode_ngos(queryset, batch_size=500):
+    """
+    Preenche coordenadas (pela cidade) e geohash das ONGs de `queryset` com
+    `bulk_update`, sem save() nem sinais. Devolve quantas ficaram localizadas.
+    Acerta updated_at à mão: é dele que saem os ETags (api/conditional.py).
+    """
+    located = []
+    now = timezone.now()
+    for ngo in queryset.only('pk', 'city').iterator(chunk_size=batch_size):
+        point = geocode_city(ngo.city)
+        if point:
+            ngo.latitude, ngo.longitude = point
+            ngo.geohash = encode_geohash(*point)
+            ngo.updated_at = now
+            located.append(ngo)
+    queryset.model.objects.bulk_update(located, ['latitude', 'longitude', 'geohash', 'updated_at'],
+                                       batch_size=batch_size)
+    return len(located)
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Geohash base32: bits de longitude e latitude intercalados"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = value = 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(altura, largura) em graus de uma célula de geohash com `precision` caracteres"""
+    lat_bits = 5 * precision // 2
+    lon_bits = 5 * precision - lat_bits
+    return 180 / 2 ** lat_bits, 360 / 2 ** lon_bits
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """(lat mín., lat máx., lon mín., lon máx.) que contém o círculo"""
+    delta_lat = radius_km / KM_PER_DEGREE
+    cos_lat = math.cos(math.radians(latitude))
+    delta_lon = 180.0 if cos_lat < 1e-6 else min(180.0, delta_lat / cos_lat)
+    return (max(-90.0, latitude - delta_lat), min(90.0, latitude + delta_lat),
+            max(-180.0, longitude - delta_lon), min(180.0, longitude + delta_lon))
+
+
+def covering_cells(box, max_cells=9):
+    """
+    Prefixos de geohash que cobrem a caixa: a maior precisão em que bastam
+    até `max_cells` células. Cada prefixo vira um range no índice.
+    """
+    min_lat, max_lat, min_lon, max_lon = box
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = math.floor(max_lat / height) - math.floor(min_lat / height) + 1
+        columns = math.floor(max_lon / width) - math.floor(min_lon / width) + 1
+        if rows * columns <= max_cells:
+            return sorted({
+                encode_geohash(min(max_lat, min_lat + row * height), min(max_lon, min_lon + column * width),
+                               precision)
+                for row in range(rows) for column in range(columns)
+            })
+    return ['']
+
+
+def parse_point(value):
+    """'lat,lon' -> (lat, lon); ValueError com a mensagem para o cliente"""
+    try:
+        latitude, longitude = (float(part) for part in value.split(','))
+    except ValueError:
+        raise ValueError('Use near=latitude,longitude.')
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError('Coordenadas fora do intervalo.')
+    return latitude, longitude
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def distance_expression(latitude, longitude, prefix=''):
+    """
+    Haversine em SQL até (latitude, longitude), em km. No SQLite as funções
+    trigonométricas vêm registradas pelo próprio Django, sem extensão espacial.
+    """
+    lat = Radians(F(f'{prefix}latitude'))
+    lon = Radians(F(f'{prefix}longitude'))
+    origin_lat = Value(math.radians(latitude), output_field=FloatField())
+    origin_lon = Value(math.radians(longitude), output_field=FloatField())
+    a = (Power(Sin((lat - origin_lat) / 2), 2)
+         + Cos(origin_lat) * Cos(lat) * Power(Sin((lon - origin_lon) / 2), 2))
+    return Value(2 * EARTH_RADIUS_KM, output_field=FloatField()) * ASin(Sqrt(a))
+
+
+def within_radius(queryset, latitude, longitude, radius_km, prefix=''):
+    """
+    Linhas a até `radius_km` do ponto, anotadas com `distance` e ordenadas
+    por ela. O pré-filtro usa ranges no índice de geohash e a caixa em
+    latitude/longitude; o haversine exato só roda nas linhas que sobram.
+    """
+    box = bounding_box(latitude, longitude, radius_km)
+    cells = Q()
+    for cell in covering_cells(box):
+        cells |= Q(**{f'{prefix}geohash__gte': cell, f'{prefix}geohash__lt': cell + '~'})
+    return queryset.filter(
+        cells,
+        **{f'{prefix}latitude__range': box[:2], f'{prefix}longitude__range': box[2:]},
+    ).annotate(
+        distance=distance_expression(latitude, longitude, prefix),
+    ).filter(distance__lte=radius_km).order_by('distance', 'pk')
+
+
+class ProximityFilter(BaseFilterBackend):
+    """
+    `?near=lat,lon&radius=km`: só o que está no raio, do mais perto ao mais
+    longe (um `?ordering=` explícito vem depois, no OrderingFilter). A view
+    indica em `near_prefix` o caminho até os campos de localização
+    (ex.: 'ngo__' para animais).
+    """
+    near_param = 'near'
+    radius_param = 'radius'
+
+    def filter_queryset(self, request, queryset, view):
+        near = request.query_params.get(self.near_param)
+        if not near:
+            return queryset
+        try:
+            latitude, longitude = parse_point(near)
+        except ValueError as exc:
+            raise ValidationError({self.near_param: str(exc)})
+
+        radius = request.query_params.get(self.radius_param) or settings.GEO_DEFAULT_RADIUS_KM
+        try:
+            radius = float(radius)
+        except ValueError:
+            raise ValidationError({self.radius_param: 'Informe o raio em km.'})
+        if not 0 < radius <= settings.GEO_MAX_RADIUS_KM:
+            raise ValidationError({self.radius_param: f'O raio vai até {settings.GEO_MAX_RADIUS_KM} km.'})
+        return within_radius(queryset, latitude, longitude, radius, getattr(view, 'near_prefix', ''))
@@ -0,0 +1,121 @@
+import hashlib
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .cache import invalidate
+from .models import Animal
+
+logger = logging.getLogger(__name__)
+
+# Larguras máximas (px) das variações; a imagem nunca é ampliada.
+VARIANT_WIDTHS = getattr(settings, 'IMAGE_VARIANT_WIDTHS', [160, 320, 640])
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+VARIANTS_DIR = 'animals/variants'
+
+# O Pillow libera a GIL durante decodificação/redimensionamento, então um pool
+# de threads já paraleliza o trabalho sem bloquear a requisição.
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_PIPELINE_WORKERS', 2),
+            thread_name_prefix='image-pipeline',
+        )
+    return _executor
+
+
+def render_variant(image, width, fmt):
+    """Redimensiona `image` para caber em `width` e codifica no formato pedido"""
+    pil_format, options = VARIANT_FORMATS[fmt]
+    variant = image.copy()
+    variant.thumbnail((width, image.height), Image.LANCZOS)
+    if pil_format == 'JPEG' and variant.mode != 'RGB':
+        variant = variant.convert('RGB')
+    buffer = BytesIO()
+    variant.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def generate_variants(name, storage=None):
+    """
+    Gera as variações da foto `name` e devolve o mapa a guardar em
+    `Animal.photo_variants`: {"source": name, "webp": {"320": path, ...}, ...}.
+
+    Os arquivos levam o hash do conteúdo original no nome, então reprocessar
+    a mesma foto é idempotente e os links podem ser cacheados para sempre.
+    """
+    storage = storage or Animal._meta.get_field('photo').storage
+    with storage.open(name, 'rb') as fp:
+        data = fp.read()
+    digest = hashlib.sha256(data).hexdigest()[:16]
+
+    image = Image.open(BytesIO(data))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    variants = {'source': name}
+    widths = sorted({min(width, image.width) for width in VARIANT_WIDTHS})
+    for fmt in VARIANT_FORMATS:
+        variants[fmt] = {}
+        for width in widths:
+            path = posixpath.join(VARIANTS_DIR, f'{digest}-{width}.{fmt}')
+            if not storage.exists(path):
+                path = storage.save(path, ContentFile(render_variant(image, width, fmt)))
+            variants[fmt][str(width)] = path
+    return variants
+
+
+def process_animal_photo(animal_id):
+    """Gera as variações de um animal e grava sem disparar o post_save de novo"""
+    name = Animal.objects.filter(pk=animal_id).values_list('photo', flat=True).first()
+    if not name:
+        return None
+    try:
+        variants = generate_variants(name)
+    except (OSError, ValueError):
+        logger.exception('Falha ao processar a foto %s do animal %s', name, animal_id)
+        return None
+    # Só grava se a foto não mudou enquanto processávamos
+    updated = Animal.objects.filter(pk=animal_id, photo=name).update(
+        photo_variants=variants, updated_at=timezone.now(),
+    )
+    if updated:
+        invalidate(Animal)
+    return variants
+
+
+def schedule_photo_processing(animal):
+    """
+    Agenda o processamento após o commit. Com IMAGE_PIPELINE_ASYNC = False
+    (testes, comandos) processa na hora, na thread atual.
+    """
+    if not animal.photo or animal.photo_variants.get('source') == animal.photo.name:
+        return
+    if getattr(settings, 'IMAGE_PIPELINE_ASYNC', True):
+        transaction.on_commit(lambda: get_executor().submit(process_animal_photo, animal.pk))
+    else:
+        transaction.on_commit(lambda: process_animal_photo(animal.pk))
+
+
+def variant_url(path):
+    return Animal._meta.get_field('photo').storage.url(path)
+
+
+def build_srcset(urls):
+    """{"160": url, "320": url} -> "url 160w, url 320w" """
+    return ', '.join(f'{url} {width}w' for width, url in sorted(urls.items(), key=lambda item: int(item[0])))
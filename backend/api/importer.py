@@ -0,0 +1,159 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from django.db import transaction
+from rest_framework import serializers
+
+from .cache import invalidate
+from .models import NGO, Animal
+from .serializers import AnimalSerializer
+from .stats import animals_created
+
+DEFAULT_BATCH_SIZE = 1000
+# Quantos erros detalhados guardar no relatório; os demais só são contados.
+MAX_REPORTED_ERRORS = 1000
+
+FORMATS = {
+    '.csv': 'csv',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+}
+
+
+def detect_format(filename, default='csv'):
+    for extension, fmt in FORMATS.items():
+        if filename.lower().endswith(extension):
+            return fmt
+    return default
+
+
+def iter_rows(binary_stream, fmt):
+    """
+    Lê o arquivo linha a linha e gera (número da linha, dict | erro).
+
+    Valores vazios do CSV são descartados para que os defaults do model
+    (ex.: size='medium') se apliquem como numa criação via API.
+    """
+    text = io.TextIOWrapper(binary_stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, {key: value for key, value in row.items() if key and value not in ('', None)}
+    elif fmt == 'ndjson':
+        for line_num, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield line_num, serializers.ValidationError({'non_field_errors': [f'JSON inválido: {exc}']})
+                continue
+            if not isinstance(row, dict):
+                row = serializers.ValidationError({'non_field_errors': ['Cada linha deve ser um objeto JSON.']})
+            yield line_num, row
+    else:
+        raise ValueError(f'Formato desconhecido: {fmt}')
+
+
+class BatchNGOField(serializers.PrimaryKeyRelatedField):
+    """Resolve a ONG pelo dicionário pré-carregado do lote, sem uma consulta por linha"""
+
+    def to_internal_value(self, data):
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        ngo = self.context['ngos'].get(pk)
+        if ngo is None:
+            self.fail('does_not_exist', pk_value=data)
+        return ngo
+
+
+class AnimalImportSerializer(AnimalSerializer):
+    """Mesmas regras do AnimalSerializer, restritas aos campos importáveis"""
+    ngo = BatchNGOField(queryset=NGO.objects.all())
+    ngo_name = None
+    photo_variants = None
+
+    class Meta(AnimalSerializer.Meta):
+        fields = ['name', 'type', 'breed', 'age', 'size', 'gender', 'description', 'ngo']
+
+
+class ImportReport:
+
+    def __init__(self):
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, line, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'error_count': self.error_count,
+            'errors': self.errors,
+        }
+
+
+def import_animals(binary_stream, fmt='csv', batch_size=DEFAULT_BATCH_SIZE, default_ngo=None,
+                   dry_run=False, report=None):
+    """
+    Importa animais de um arquivo CSV/NDJSON em lotes.
+
+    Cada lote é validado com as regras do AnimalSerializer (as ONGs do lote
+    são buscadas numa única consulta) e as linhas válidas entram com um
+    `bulk_create` numa transação própria. Linhas inválidas vão para o
+    relatório sem interromper o arquivo. A memória fica limitada ao lote.
+    """
+    report = report or ImportReport()
+    rows = iter_rows(binary_stream, fmt)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        import_batch(batch, report, default_ngo=default_ngo, dry_run=dry_run)
+    return report
+
+
+def import_batch(batch, report, default_ngo=None, dry_run=False):
+    if default_ngo is not None:
+        for _, row in batch:
+            if isinstance(row, dict):
+                row.setdefault('ngo', default_ngo)
+
+    ngo_ids = set()
+    for _, row in batch:
+        if isinstance(row, dict):
+            try:
+                ngo_ids.add(int(row.get('ngo')))
+            except (TypeError, ValueError):
+                pass
+    context = {'ngos': NGO.objects.in_bulk(ngo_ids)}
+
+    # Um único serializer por lote: montar os campos de um ModelSerializer
+    # custa mais que validar a linha, então só `run_validation` roda por linha.
+    serializer = AnimalImportSerializer(context=context)
+    animals = []
+    for line, row in batch:
+        if isinstance(row, serializers.ValidationError):
+            report.add_error(line, row.detail)
+            continue
+        try:
+            animals.append(Animal(**serializer.run_validation(row)))
+        except serializers.ValidationError as exc:
+            report.add_error(line, exc.detail)
+
+    if animals and not dry_run:
+        with transaction.atomic():
+            Animal.objects.bulk_create(animals)
+            # bulk_create não dispara post_save
+            animals_created(animals)
+            invalidate(Animal)
+    report.created += len(animals)
+    return report
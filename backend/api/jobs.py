@@ -0,0 +1,112 @@
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# {nome: função}; registradas com @task em api/tasks.py
+TASKS = {}
+
+
+def task(name):
+    """Registra a função como tarefa `name`; os parâmetros vêm do payload (JSON)"""
+    def decorator(func):
+        TASKS[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, delay=0, max_attempts=None):
+    """
+    Grava a tarefa na transação atual: se ela for desfeita, a tarefa some
+    junto, e um worker só a enxerga depois do commit.
+    """
+    if name not in TASKS:
+        raise LookupError(f'Tarefa desconhecida: {name}')
+    return Job.objects.create(
+        task=name, payload=payload or {}, run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def due_jobs(now):
+    """Na fila e no horário, ou executando com a concessão vencida (worker que morreu)"""
+    expired = now - timedelta(seconds=settings.JOB_LEASE_SECONDS)
+    return Job.objects.filter(
+        Q(status='queued', run_at__lte=now) | Q(status='running', locked_at__lt=expired),
+    )
+
+
+def claim(worker, limit):
+    """
+    Reserva até `limit` tarefas para `worker`. A reserva é um único UPDATE
+    que repete o filtro: o que outro worker pegou antes já não casa com ele,
+    o que basta no SQLite, em que as escritas são serializadas. Onde há
+    SELECT ... FOR UPDATE SKIP LOCKED, os candidatos saem com ele, sem
+    esperar pelas linhas travadas por outro worker.
+    """
+    now = timezone.now()
+    candidates = due_jobs(now).order_by('run_at', 'pk').values_list('pk', flat=True)
+    with transaction.atomic():
+        if connections[router.db_for_write(Job)].features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        ids = list(candidates[:limit])
+        due_jobs(now).filter(pk__in=ids).update(
+            status='running', locked_by=worker, locked_at=now, attempts=F('attempts') + 1,
+        )
+    return list(Job.objects.filter(pk__in=ids, status='running', locked_by=worker, locked_at=now).order_by('pk'))
+
+
+def backoff(attempts):
+    """Espera antes da nova tentativa: exponencial, com teto e ±20% de variação"""
+    delay = min(settings.JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.JOB_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def execute(job_id, worker):
+    """
+    Roda uma tarefa reservada por `worker` e grava o resultado. As escritas
+    exigem que a reserva ainda seja dele: se a concessão venceu e outro
+    worker a pegou, vale o resultado do outro.
+    """
+    job = Job.objects.filter(pk=job_id, status='running', locked_by=worker).first()
+    if job is None:
+        return None
+    mine = Job.objects.filter(pk=job.pk, status='running', locked_by=worker, locked_at=job.locked_at)
+    func = TASKS.get(job.task)
+    try:
+        if func is None:
+            raise LookupError(f'Tarefa desconhecida: {job.task}')
+        func(**job.payload)
+    except Exception as exc:
+        final = func is None or job.attempts >= job.max_attempts
+        logger.warning('Tarefa %s #%s falhou (tentativa %d/%d): %s', job.task, job.pk, job.attempts,
+                       job.max_attempts, exc, exc_info=final)
+        error = ''.join(traceback.format_exception(exc))
+        if final:
+            mine.update(status='failed', last_error=error, locked_by='', finished_at=timezone.now())
+            return 'failed'
+        mine.update(status='queued', last_error=error, locked_by='', locked_at=None,
+                    run_at=timezone.now() + timedelta(seconds=backoff(job.attempts)))
+        return 'retry'
+    mine.update(status='done', last_error='', finished_at=timezone.now())
+    return 'done'
+
+
+def run_pending(worker='inline', limit=None):
+    """Executa no processo atual as tarefas vencidas até esvaziar a fila (ou `limit`)"""
+    results = []
+    while limit is None or len(results) < limit:
+        jobs = claim(worker, 10 if limit is None else min(10, limit - len(results)))
+        if not jobs:
+            break
+        results.extend(execute(job.pk, worker) for job in jobs)
+    return results
@@ -0,0 +1,116 @@
+import asyncio
+import statistics
+import threading
+import time
+from itertools import count
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import NGO, Animal
+
+PATHS = [
+    '/api/animals/',
+    '/api/animals/{animal}/',
+    '/api/animals/{animal}/reviews/',
+    '/api/ngos/',
+    '/api/ngos/{ngo}/',
+    '/api/ngos/{ngo}/animals/',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara as leituras síncronas (/api/...) com as assíncronas (/api/async/...) '
+        'sob a mesma carga, chamando a aplicação ASGI em processo'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Requisições por rota e modo')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requisições simultâneas')
+        parser.add_argument('--path', action='append', default=[],
+                            help='Rota síncrona a medir (ex.: /api/animals/). Pode repetir.')
+        parser.add_argument('--host', default='localhost', help='Cabeçalho Host (precisa estar em ALLOWED_HOSTS)')
+        parser.add_argument('--cold', action='store_true',
+                            help='Query string única por requisição, para não medir só o cache de respostas')
+
+    def handle(self, *args, **options):
+        animal = Animal.objects.values_list('pk', flat=True).first()
+        ngo = NGO.objects.values_list('pk', flat=True).first()
+        if animal is None or ngo is None:
+            raise CommandError('O banco precisa de ao menos uma ONG e um animal.')
+
+        paths = options['path'] or [path.format(animal=animal, ngo=ngo) for path in PATHS]
+        self.stdout.write(f"{'rota':<34}{'modo':<7}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}"
+                          f"{'máx. ms':>9}{'threads':>9}{'erros':>7}")
+        for path in paths:
+            for mode, url in (('sync', path), ('async', path.replace('/api/', '/api/async/', 1))):
+                result = asyncio.run(self.run(url, options))
+                self.stdout.write(
+                    f"{path:<34}{mode:<7}{result['throughput']:>9.0f}{result['p50']:>9.1f}"
+                    f"{result['p99']:>9.1f}{result['max']:>9.1f}{result['threads']:>9}{result['errors']:>7}"
+                )
+
+    async def run(self, url, options):
+        app = get_asgi_application()
+        semaphore = asyncio.Semaphore(options['concurrency'])
+        sequence = count()
+        latencies = []
+        errors = 0
+        peak_threads = threading.active_count()
+
+        async def one():
+            nonlocal errors, peak_threads
+            query = f'_={next(sequence)}' if options['cold'] else ''
+            async with semaphore:
+                start = time.perf_counter()
+                status = await self.request(app, url, query, options['host'])
+                latencies.append((time.perf_counter() - start) * 1000)
+                peak_threads = max(peak_threads, threading.active_count())
+            if status != 200:
+                errors += 1
+
+        # Aquece conexões, caches e imports antes de medir
+        await asyncio.gather(*(self.request(app, url, '', options['host']) for _ in range(5)))
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(options['requests'])))
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            'throughput': len(latencies) / elapsed,
+            'p50': statistics.median(latencies),
+            'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+            'max': latencies[-1],
+            'threads': peak_threads,
+            'errors': errors,
+        }
+
+    async def request(self, app, path, query, host):
+        """Uma requisição GET direto na aplicação ASGI; devolve o status"""
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query.encode(),
+            'root_path': '',
+            'headers': [(b'host', host.encode()), (b'accept', b'application/json')],
+            'client': ('127.0.0.1', 0),
+            'server': (host, 80),
+        }
+        status = None
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+
+        await app(scope, receive, send)
+        return status
@@ -0,0 +1,266 @@
+import json
+import re
+import statistics
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from functools import reduce
+from itertools import count
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.filters import OrderingFilter
+
+from api.geo import ProximityFilter
+from api.search import FullTextSearchFilter
+from api.sparse import SparseFieldsViewMixin
+from api.urls import router
+
+QUERIES_RE = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede todas as rotas GET do DefaultRouter (listas com cada filtro, busca, ordenação e cursor, '
+        'detalhes e actions) em processo ou contra um servidor local; p50/p95/p99, vazão e queries, '
+        'com resultado em JSON para comparar commits'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=30, help='Requisições medidas por rota')
+        parser.add_argument('--warmup', type=int, default=3, help='Requisições de aquecimento por rota')
+        parser.add_argument('--concurrency', type=int, default=1, help='Requisições simultâneas')
+        parser.add_argument('--url', help='Servidor a medir (ex.: http://127.0.0.1:8000); padrão: em processo')
+        parser.add_argument('--host', default='localhost', help='Cabeçalho Host no modo em processo')
+        parser.add_argument('--user', help='Usuário autenticado (rotas privadas respondem 401 sem ele)')
+        parser.add_argument('--throttle', action='store_true',
+                            help='Mantém os limites de requisições no modo em processo (padrão: desligados)')
+        parser.add_argument('--match', help='Só as rotas cujo nome ou URL contém este texto')
+        parser.add_argument('--cold', action='store_true',
+                            help='Query string única por requisição, para não medir só o cache de respostas')
+        parser.add_argument('--output', help='Grava os resultados neste arquivo JSON')
+        parser.add_argument('--compare', help='JSON de uma execução anterior para comparar')
+        parser.add_argument('--threshold', type=float, default=20.0,
+                            help='Aumento percentual do p95 considerado regressão (padrão: 20)')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='Termina com erro se houver regressão em relação ao --compare')
+
+    def handle(self, *args, **options):
+        if options['url'] or options['throttle']:
+            return self.run(options)
+        # Sem isso as medições viram 429 ao passar do limite de busca/escrita
+        rates_off = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}}
+        with override_settings(REST_FRAMEWORK=rates_off):
+            return self.run(options)
+
+    def run(self, options):
+        baseline = self.load(options['compare']) if options['compare'] else None
+        send = self.http_sender(options) if options['url'] else self.client_sender(options)
+        endpoints = [
+            (name, url) for name, url in self.endpoints()
+            if not options['match'] or options['match'] in name or options['match'] in url
+        ]
+        if not endpoints:
+            raise CommandError('Nenhuma rota para medir.')
+
+        self.stdout.write(f"{'rota':<58}{'status':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+                          f"{'req/s':>8}{'queries':>9}")
+        results = []
+        for name, url in endpoints:
+            result = self.measure(send, name, url, options)
+            results.append(result)
+            self.stdout.write(
+                f"{name:<58}{result['status']:>7}{result['p50']:>9.1f}{result['p95']:>9.1f}"
+                f"{result['p99']:>9.1f}{result['throughput']:>8.0f}{self.format_queries(result['queries']):>9}"
+            )
+
+        report = {
+            'commit': self.git_commit(),
+            'timestamp': timezone.now().isoformat(),
+            'target': options['url'] or 'in-process',
+            'options': {key: options[key] for key in ('requests', 'warmup', 'concurrency', 'cold', 'user')},
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultados gravados em {options['output']}."))
+        if baseline is not None:
+            regressions = self.compare(baseline, results, options['threshold'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f'{regressions} rota(s) com regressão.')
+
+    def endpoints(self):
+        """(nome, URL) de cada rota GET do router, com as variações de filtro/busca/ordenação"""
+        for _, viewset, basename in router.registry:
+            model = viewset.queryset.model
+            sample = model.objects.order_by('pk').first()
+            if 'get' in viewset.http_method_names:
+                list_url = reverse(f'{basename}-list')
+                yield f'{basename}-list', list_url
+                for params in self.list_variants(viewset, sample):
+                    label = '&'.join(f'{key}={value}' for key, value in params.items())
+                    yield f'{basename}-list {label}', f'{list_url}?{urlencode(params)}'
+                if sample is not None:
+                    yield f'{basename}-detail', reverse(f'{basename}-detail', args=[sample.pk])
+            for extra in viewset.get_extra_actions():
+                if 'get' not in extra.mapping:
+                    continue
+                if not extra.detail:
+                    yield f'{basename}-{extra.url_name}', reverse(f'{basename}-{extra.url_name}')
+                elif sample is not None:
+                    yield (f'{basename}-{extra.url_name}',
+                           reverse(f'{basename}-{extra.url_name}', args=[sample.pk]))
+
+    def list_variants(self, viewset, sample):
+        backends = viewset.filter_backends
+        for field in getattr(viewset, 'filterset_fields', None) or ():
+            value = getattr(sample, viewset.queryset.model._meta.get_field(field).attname, None)
+            if value is not None:
+                yield {field: str(value).lower() if isinstance(value, bool) else value}
+        if getattr(viewset, 'search_fields', None) and sample is not None:
+            words = re.findall(r'\w{3,}', str(getattr(sample, viewset.search_fields[0]) or ''))
+            if words:
+                yield {'search': words[0]}
+                if FullTextSearchFilter in backends:
+                    yield {'search': words[0], 'ordering': '-rating_average'}
+        if ProximityFilter in backends and sample is not None:
+            location = reduce(getattr, getattr(viewset, 'near_prefix', '').split('__')[:-1], sample)
+            if location.latitude is not None:
+                yield {'near': f'{location.latitude},{location.longitude}', 'radius': 50}
+        if OrderingFilter in backends:
+            for field in getattr(viewset, 'ordering_fields', None) or ():
+                yield {'ordering': field}
+                yield {'ordering': f'-{field}'}
+            yield {'cursor': ''}
+        if issubclass(viewset, SparseFieldsViewMixin):
+            yield {'expand': ','.join(viewset.serializer_class.Meta.expandable_fields)}
+
+    def client_sender(self, options):
+        """Requisições na própria aplicação Django (um Client por thread)"""
+        user = self.get_user(options)
+        local = threading.local()
+
+        def send(url):
+            if not hasattr(local, 'client'):
+                local.client = Client(HTTP_HOST=options['host'])
+                if user is not None:
+                    local.client.force_login(user)
+            response = local.client.get(url, HTTP_ACCEPT='application/json')
+            if response.streaming:
+                b''.join(response.streaming_content)
+            return response.status_code, response.get('Server-Timing', '')
+        return send
+
+    def http_sender(self, options):
+        """Requisições HTTP a um servidor já rodando"""
+        headers = {'Accept': 'application/json'}
+        user = self.get_user(options)
+        if user is not None:
+            headers['Authorization'] = f'Token {Token.objects.get_or_create(user=user)[0].key}'
+        base = options['url'].rstrip('/')
+
+        def send(url):
+            request = urllib.request.Request(base + url, headers=headers)
+            try:
+                with urllib.request.urlopen(request) as response:
+                    response.read()
+                    return response.status, response.headers.get('Server-Timing', '')
+            except urllib.error.HTTPError as exc:
+                return exc.code, exc.headers.get('Server-Timing', '')
+        return send
+
+    def get_user(self, options):
+        if not options['user']:
+            return None
+        user = User.objects.filter(username=options['user']).first()
+        if user is None:
+            raise CommandError(f"Usuário {options['user']} não encontrado.")
+        return user
+
+    def measure(self, send, name, url, options):
+        sequence = count()
+        separator = '&' if '?' in url else '?'
+
+        def one(_):
+            target = f'{url}{separator}_={next(sequence)}' if options['cold'] else url
+            start = time.perf_counter()
+            status, timing = send(target)
+            elapsed = (time.perf_counter() - start) * 1000
+            match = QUERIES_RE.search(timing)
+            return elapsed, status, int(match.group(1)) if match else None
+
+        for _ in range(options['warmup']):
+            one(None)
+        started = time.perf_counter()
+        if options['concurrency'] > 1:
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                samples = list(pool.map(one, range(options['requests'])))
+        else:
+            samples = [one(None) for _ in range(options['requests'])]
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(sample[0] for sample in samples)
+        statuses = [sample[1] for sample in samples]
+        queries = [sample[2] for sample in samples if sample[2] is not None]
+        return {
+            'name': name,
+            'url': url,
+            'status': statistics.mode(statuses),
+            'errors': sum(status >= 400 for status in statuses),
+            'p50': self.percentile(latencies, 50),
+            'p95': self.percentile(latencies, 95),
+            'p99': self.percentile(latencies, 99),
+            'mean': statistics.fmean(latencies),
+            'throughput': len(samples) / elapsed,
+            'queries': statistics.median(queries) if queries else None,
+        }
+
+    def percentile(self, values, percent):
+        return values[min(len(values) - 1, round(len(values) * percent / 100 + 0.5) - 1)]
+
+    def format_queries(self, queries):
+        return '-' if queries is None else f'{queries:g}'
+
+    def load(self, path):
+        try:
+            with open(path, encoding='utf-8') as baseline:
+                return json.load(baseline)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Não foi possível ler {path}: {exc}')
+
+    def compare(self, baseline, results, threshold):
+        """Diferenças de p95 e queries por rota; devolve quantas regrediram"""
+        previous = {result['name']: result for result in baseline['results']}
+        self.stdout.write(f"\nComparação com {baseline.get('commit') or baseline['timestamp']}:")
+        regressions = 0
+        for result in results:
+            old = previous.get(result['name'])
+            if old is None:
+                continue
+            change = (result['p95'] - old['p95']) / old['p95'] * 100 if old['p95'] else 0.0
+            more_queries = (result['queries'] or 0) > (old['queries'] or 0)
+            regressed = change > threshold or more_queries
+            regressions += regressed
+            self.stdout.write(
+                f"{result['name']:<58}p95 {old['p95']:>8.1f} -> {result['p95']:>8.1f} ms ({change:+.0f}%)"
+                f"  queries {self.format_queries(old['queries'])} -> {self.format_queries(result['queries'])}"
+                + (self.style.ERROR('  REGRESSÃO') if regressed else '')
+            )
+        return regressions
+
+    def git_commit(self):
+        try:
+            return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,79 @@
+import gzip
+import time
+from io import BytesIO
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.middleware import brotli
+from api.renderers import ORJSONParser, ORJSONRenderer, orjson
+
+PATHS = [
+    '/api/ngos/',
+    '/api/animals/',
+    '/api/adoptions/?expand=animal_details,user_details',
+    '/api/reviews/?expand=animal_details',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede, por resposta, o tempo de gerar e ler o JSON com o renderer/parser do DRF e com o '
+        'orjson, e o tamanho da resposta sem compressão, com gzip e com brotli'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', action='append', default=[],
+                            help='Rota a medir (ex.: /api/animals/). Pode repetir.')
+        parser.add_argument('--user', help='Usuário autenticado nas requisições (padrão: anônimo)')
+        parser.add_argument('--repeat', type=int, default=200, help='Repetições de cada medida')
+        parser.add_argument('--host', default='localhost', help='Cabeçalho Host (precisa estar em ALLOWED_HOSTS)')
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stderr.write('orjson não está instalado: as duas colunas medem o renderer do DRF.')
+        client = Client(HTTP_HOST=options['host'])
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"Usuário {options['user']} não encontrado.")
+            client.force_login(user)
+
+        self.stdout.write(
+            f"{'rota':<52}{'render µs':>11}{'orjson µs':>11}{'parse µs':>10}{'orjson µs':>11}"
+            f"{'bytes':>9}{'gzip':>8}{'gzip µs':>9}{'br':>8}{'br µs':>8}"
+        )
+        for path in options['path'] or PATHS:
+            response = client.get(path, HTTP_ACCEPT='application/json')
+            if response.status_code != 200:
+                self.stdout.write(f'{path:<52}HTTP {response.status_code} (use --user para rotas autenticadas)')
+                continue
+            self.report(path, response.data, options['repeat'])
+
+    def report(self, path, data, repeat):
+        body = JSONRenderer().render(data)
+        gzipped, gzip_time = self.measure(lambda: gzip.compress(body, compresslevel=6), repeat)
+        if brotli is not None:
+            compressed, brotli_time = self.measure(lambda: brotli.compress(body, quality=4), repeat)
+            brotli_columns = f'{len(compressed):>8}{brotli_time:>8.0f}'
+        else:
+            brotli_columns = f"{'-':>8}{'-':>8}"
+        self.stdout.write(
+            f'{path:<52}'
+            f'{self.measure(lambda: JSONRenderer().render(data), repeat)[1]:>11.0f}'
+            f'{self.measure(lambda: ORJSONRenderer().render(data), repeat)[1]:>11.0f}'
+            f'{self.measure(lambda: JSONParser().parse(BytesIO(body)), repeat)[1]:>10.0f}'
+            f'{self.measure(lambda: ORJSONParser().parse(BytesIO(body)), repeat)[1]:>11.0f}'
+            f'{len(body):>9}{len(gzipped):>8}{gzip_time:>9.0f}{brotli_columns}'
+        )
+
+    def measure(self, func, repeat):
+        """Resultado de `func` e a média em microssegundos"""
+        result = func()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return result, (time.perf_counter() - start) / repeat * 1e6
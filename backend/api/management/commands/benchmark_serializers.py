@@ -0,0 +1,96 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from api.fastpath import CompiledSerializer
+from api.models import NGO, Animal, Adoption, Review
+from api.sparse import SparseFieldsViewMixin, sparse_queryset
+from api.views import AdoptionViewSet, AnimalViewSet, ReviewViewSet
+
+CASES = [
+    ('animais', AnimalViewSet, ''),
+    ('adoções', AdoptionViewSet, 'expand=animal_details,user_details'),
+    ('avaliações', ReviewViewSet, 'expand=animal_details'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara a serialização do DRF com o caminho rápido (api/fastpath.py) nas listagens, '
+        'em linhas por segundo, sobre dados gerados numa transação desfeita ao final'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Linhas por listagem')
+        parser.add_argument('--repeat', type=int, default=3, help='Rodadas por caminho (vale a melhor)')
+        parser.add_argument('--host', default='localhost', help='Host das URLs absolutas (precisa estar em ALLOWED_HOSTS)')
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1:
+            raise CommandError('--rows precisa ser positivo.')
+        self.stdout.write(f"{'listagem':<14}{'linhas':>8}{'DRF linhas/s':>15}{'rápido linhas/s':>18}{'ganho':>8}")
+        with transaction.atomic():
+            self.create_rows(options['rows'])
+            for label, viewset, query in CASES:
+                slow, fast = self.measure(viewset, query, options)
+                self.stdout.write(
+                    f"{label:<14}{options['rows']:>8}{options['rows'] / slow:>15.0f}"
+                    f"{options['rows'] / fast:>18.0f}{slow / fast:>7.1f}x"
+                )
+            transaction.set_rollback(True)
+
+    def create_rows(self, total):
+        ngo = NGO.objects.create(name='ONG Benchmark', city='São Paulo', email='benchmark@example.com')
+        animals = Animal.objects.bulk_create(
+            Animal(
+                name=f'Animal {i}', type=('dog', 'cat', 'other')[i % 3], breed='SRD', age=i % 120,
+                size=('small', 'medium', 'large')[i % 3], gender=('male', 'female')[i % 2],
+                description='Animal gerado para o benchmark.', ngo=ngo,
+            )
+            for i in range(total)
+        )
+        users = User.objects.bulk_create(User(username=f'benchmark-{i}') for i in range(total))
+        Adoption.objects.bulk_create(
+            Adoption(user=user, animal=animal, status=('pending', 'rejected', 'cancelled')[i % 3])
+            for i, (user, animal) in enumerate(zip(users, animals))
+        )
+        Review.objects.bulk_create(
+            Review(user=user, animal=animal, rating=i % 5 + 1, comment='Comentário do benchmark.')
+            for i, (user, animal) in enumerate(zip(users, animals))
+        )
+
+    def measure(self, viewset, query, options):
+        """Melhor tempo de cada caminho, incluindo a leitura do banco e o JSON"""
+        request = Request(RequestFactory(SERVER_NAME=options['host']).get('/', QUERY_STRING=query))
+        context = {'request': request, 'format': None, 'view': None}
+        serializer_class = viewset.serializer_class
+        model = viewset.queryset.model
+        queryset = viewset.queryset.filter(pk__in=model.objects.order_by('-pk')[:options['rows']].values('pk'))
+        if issubclass(viewset, SparseFieldsViewMixin):
+            queryset = sparse_queryset(queryset, serializer_class, context)
+        queryset = queryset.order_by('pk')
+        renderer = JSONRenderer()
+
+        def slow():
+            return renderer.render(serializer_class(list(queryset), many=True, context=context).data)
+
+        def fast():
+            compiled = CompiledSerializer(serializer_class(context=context))
+            return renderer.render(compiled.render(queryset.values(*compiled.columns)))
+
+        if slow() != fast():
+            raise CommandError(f'{model.__name__}: o caminho rápido gerou um JSON diferente do DRF.')
+        return self.best(slow, options['repeat']), self.best(fast, options['repeat'])
+
+    def best(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
@@ -0,0 +1,105 @@
+from itertools import combinations
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.urls import router
+
+
+class Command(BaseCommand):
+    help = (
+        'Executa EXPLAIN QUERY PLAN para cada combinação de filtros/ordenação '
+        'das listagens do router e aponta varreduras completas de tabela'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--viewset', action='append', default=[],
+                            help='Prefixo do router a analisar (ex.: animals). Pode repetir.')
+        parser.add_argument('--max-filters', type=int, default=None,
+                            help='Número máximo de filtros combinados (padrão: todos)')
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help='Mostra o plano de todas as consultas, não só as problemáticas')
+        parser.add_argument('--fail', action='store_true',
+                            help='Sai com erro se alguma varredura completa for encontrada')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Este comando interpreta planos do SQLite (EXPLAIN QUERY PLAN).')
+
+        factory = APIRequestFactory()
+        total = scans = 0
+        for prefix, viewset, basename in router.registry:
+            if options['viewset'] and prefix not in options['viewset']:
+                continue
+            for params in self.combinations(viewset, options['max_filters']):
+                queryset = self.list_queryset(factory, prefix, viewset, params)
+                if queryset is None:
+                    continue
+                plan = queryset.explain()
+                # Sem filtro nem ordenação o LIMIT encerra a varredura na primeira página
+                full_scans = self.full_scans(plan) if params else []
+                total += 1
+                scans += bool(full_scans)
+                if full_scans or options['verbose_plans']:
+                    label = '&'.join(f'{k}={v}' for k, v in params.items()) or '(sem filtros)'
+                    style = self.style.WARNING if full_scans else self.style.SUCCESS
+                    self.stdout.write(style(f'/api/{prefix}/?{label}'))
+                    for line in plan.splitlines():
+                        self.stdout.write(f'    {line}')
+
+        self.stdout.write(f'{total} consultas analisadas, {scans} com varredura completa de tabela.')
+        if scans and options['fail']:
+            raise CommandError(f'{scans} consultas fazem varredura completa de tabela.')
+
+    def combinations(self, viewset, max_filters):
+        """Gera os query params de todas as combinações de filtros x ordenações"""
+        fields = list(getattr(viewset, 'filterset_fields', None) or [])
+        values = {field: self.sample_value(viewset.queryset.model, field) for field in fields}
+        fields = [field for field in fields if values[field] is not None]
+        orderings = [None]
+        for field in getattr(viewset, 'ordering_fields', None) or []:
+            orderings += [field, f'-{field}']
+
+        limit = len(fields) if max_filters is None else max_filters
+        for size in range(limit + 1):
+            for combo in combinations(fields, size):
+                for ordering in orderings:
+                    params = {field: values[field] for field in combo}
+                    if ordering:
+                        params['ordering'] = ordering
+                    yield params
+
+    def sample_value(self, model, name):
+        """Valor representativo para o filtro: primeira escolha, booleano ou pk existente"""
+        field = model._meta.get_field(name)
+        if field.is_relation:
+            return field.related_model.objects.values_list('pk', flat=True).first()
+        if field.choices:
+            return field.choices[0][0]
+        if field.get_internal_type() == 'BooleanField':
+            return 'true'
+        if field.get_internal_type().endswith('IntegerField'):
+            return '1'
+        return 'x'
+
+    def list_queryset(self, factory, prefix, viewset, params):
+        """Monta a mesma queryset paginada que a action `list` executaria"""
+        view = viewset(action='list', format_kwarg=None, kwargs={}, args=())
+        view.request = Request(factory.get(f'/api/{prefix}/', params))
+        try:
+            queryset = view.filter_queryset(view.get_queryset())
+        except ValidationError as exc:
+            self.stderr.write(f'/api/{prefix}/ {params}: {exc.detail}')
+            return None
+        page_size = view.paginator.get_page_size(view.request) if view.paginator else None
+        return queryset[:page_size] if page_size else queryset
+
+    def full_scans(self, plan):
+        """Linhas 'SCAN <tabela>' sem índice; 'SCAN ... USING INDEX' percorre um índice"""
+        return [
+            line for line in plan.splitlines()
+            if 'SCAN ' in line and 'USING' not in line and 'CONSTANT ROW' not in line
+        ]
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from api.cache import invalidate
+from api.geo import geocode_ngos
+from api.models import NGO
+
+
+class Command(BaseCommand):
+    help = 'Localiza as ONGs pela cidade, com a tabela embarcada em api/data/cities.csv'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Refaz também as que já têm coordenadas (ex.: depois de atualizar a tabela)')
+
+    def handle(self, *args, **options):
+        queryset = NGO.objects.all() if options['all'] else NGO.objects.filter(geohash='')
+        located = geocode_ngos(queryset)
+        missing = NGO.objects.filter(geohash='').count()
+        invalidate(NGO)
+        self.stdout.write(self.style.SUCCESS(f'{located} ONGs localizadas; {missing} sem cidade conhecida.'))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.importer import DEFAULT_BATCH_SIZE, ImportReport, detect_format, import_animals
+
+
+class ConsoleReport(ImportReport):
+    """Escreve cada erro assim que aparece em vez de acumular em memória"""
+
+    def __init__(self, stderr):
+        super().__init__()
+        self.stderr = stderr
+
+    def add_error(self, line, errors):
+        self.error_count += 1
+        self.stderr.write(f'linha {line}: {errors}')
+
+
+class Command(BaseCommand):
+    help = 'Importa animais em massa de um arquivo CSV ou NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Arquivo .csv, .ndjson ou .jsonl')
+        parser.add_argument('--format', dest='file_format', choices=['csv', 'ndjson'],
+                            help='Formato do arquivo (padrão: pela extensão)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help=f'Linhas por lote/transação (padrão: {DEFAULT_BATCH_SIZE})')
+        parser.add_argument('--ngo', type=int, help='ONG usada nas linhas sem a coluna ngo')
+        parser.add_argument('--dry-run', action='store_true', help='Só valida, sem gravar')
+
+    def handle(self, *args, **options):
+        file_format = options['file_format'] or detect_format(options['path'])
+        try:
+            stream = open(options['path'], 'rb')
+        except OSError as exc:
+            raise CommandError(exc)
+
+        with stream:
+            report = import_animals(
+                stream, file_format, batch_size=options['batch_size'], default_ngo=options['ngo'],
+                dry_run=options['dry_run'], report=ConsoleReport(self.stderr),
+            )
+
+        verb = 'validadas' if options['dry_run'] else 'importadas'
+        self.stdout.write(self.style.SUCCESS(f'{report.created} linhas {verb}, {report.error_count} com erro.'))
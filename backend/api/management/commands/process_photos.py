@@ -0,0 +1,35 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+
+from api.images import process_animal_photo
+from api.models import Animal
+
+
+class Command(BaseCommand):
+    help = 'Gera miniaturas e variações WebP/JPEG das fotos de animais já cadastradas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Reprocessa também as fotos que já têm variações')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Número de threads de processamento (padrão: 4)')
+
+    def handle(self, *args, **options):
+        animals = Animal.objects.exclude(photo='').exclude(photo__isnull=True)
+        pending = [
+            pk for pk, photo, variants in animals.values_list('pk', 'photo', 'photo_variants').iterator()
+            if options['force'] or variants.get('source') != photo
+        ]
+        self.stdout.write(f'{len(pending)} fotos para processar.')
+
+        done = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futures = {executor.submit(process_animal_photo, pk): pk for pk in pending}
+            for future in as_completed(futures):
+                if future.result():
+                    done += 1
+                else:
+                    failed += 1
+                    self.stderr.write(f'Animal {futures[future]}: foto não processada')
+        self.stdout.write(self.style.SUCCESS(f'{done} processadas, {failed} com erro.'))
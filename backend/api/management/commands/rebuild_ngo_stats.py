@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.stats import rebuild_all_stats
+
+
+class Command(BaseCommand):
+    help = 'Recalcula a tabela de resumo das estatísticas das ONGs'
+
+    def handle(self, *args, **options):
+        total = rebuild_all_stats()
+        self.stdout.write(self.style.SUCCESS(f'Estatísticas de {total} ONGs recalculadas.'))
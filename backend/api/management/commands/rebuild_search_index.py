@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.search import FTS_TABLES, ensure_fts_triggers
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói os índices de busca textual (FTS5) de animais e ONGs'
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Os índices FTS5 só existem no SQLite.')
+        ensure_fts_triggers()
+        with connection.cursor() as cursor:
+            for table in FTS_TABLES:
+                cursor.execute(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+                cursor.execute(f"INSERT INTO {table}({table}) VALUES ('optimize')")
+                self.stdout.write(self.style.SUCCESS(f'{table} reconstruído'))
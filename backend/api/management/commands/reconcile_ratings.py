@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api.ratings import reconcile_all
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os agregados de avaliação de animais e ONGs que divergem das avaliações'
+
+    def handle(self, *args, **options):
+        fixed = reconcile_all()
+        self.stdout.write(self.style.SUCCESS(
+            f"{fixed['animals']} animais e {fixed['ngos']} ONGs corrigidos."
+        ))
@@ -0,0 +1,78 @@
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.jobs import claim, execute, run_pending
+
+
+class Command(BaseCommand):
+    help = (
+        'Worker da fila de tarefas (api/jobs.py): reserva as tarefas vencidas e as executa num pool de '
+        'processos, com novas tentativas e espera exponencial em caso de falha'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 2,
+                            help='Processos do pool; 0 executa no próprio processo')
+        parser.add_argument('--poll', type=float, default=1.0, help='Intervalo (s) entre consultas com a fila vazia')
+        parser.add_argument('--once', action='store_true', help='Sai quando não houver mais tarefas vencidas')
+
+    def handle(self, *args, **options):
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.stdout.write(f"Worker {worker} com {options['processes'] or 'nenhum'} processo(s).")
+        try:
+            if options['processes'] < 1:
+                self.run_inline(worker, options)
+            else:
+                self.run_pool(worker, options)
+        except KeyboardInterrupt:
+            self.stdout.write('Interrompido; tarefas em andamento voltam para a fila quando a reserva vencer.')
+
+    def run_inline(self, worker, options):
+        while True:
+            done = run_pending(worker)
+            self.report(done)
+            if not done:
+                if options['once']:
+                    return
+                time.sleep(options['poll'])
+            close_old_connections()
+
+    def run_pool(self, worker, options):
+        # spawn: os filhos abrem as próprias conexões, sem herdar a do pai
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(options['processes'], mp_context=context, initializer=django.setup) as pool:
+            running = set()
+            while True:
+                # Reserva só o que o pool consegue começar logo, para não segurar tarefas
+                free = 2 * options['processes'] - len(running)
+                jobs = claim(worker, free) if free > 0 else []
+                running.update(pool.submit(execute, job.pk, worker) for job in jobs)
+                if not running:
+                    if options['once']:
+                        return
+                    time.sleep(options['poll'])
+                    continue
+                finished, running = wait(running, timeout=options['poll'], return_when=FIRST_COMPLETED)
+                self.report([self.result(future) for future in finished])
+                close_old_connections()
+
+    def result(self, future):
+        try:
+            return future.result()
+        except Exception as exc:  # processo do pool morreu ou o banco falhou ao gravar o resultado
+            self.stderr.write(f'Falha no worker: {exc!r}')
+            return None
+
+    def report(self, results):
+        for status in ('done', 'retry', 'failed'):
+            count = results.count(status)
+            if count:
+                style = self.style.SUCCESS if status == 'done' else self.style.WARNING
+                self.stdout.write(style(f'{count} tarefa(s): {status}'))
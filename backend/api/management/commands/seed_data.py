@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.seed import seed
+
+
+class Command(BaseCommand):
+    help = 'Gera ONGs, animais, usuários, adoções (todos os status) e avaliações sintéticos para testes de carga'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ngos', type=int, default=10)
+        parser.add_argument('--animals', type=int, default=500)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--adoptions', type=int, default=800)
+        parser.add_argument('--reviews', type=int, default=300,
+                            help='Limitado ao número de animais adotados (aprovados/concluídos)')
+        parser.add_argument('--scale', type=float, default=1.0, help='Multiplica todas as quantidades')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Linhas por INSERT')
+        parser.add_argument('--seed', type=int, help='Semente do gerador, para repetir o mesmo catálogo')
+        parser.add_argument('--password', help='Senha dos usuários gerados (padrão: sem senha utilizável)')
+
+    def handle(self, *args, **options):
+        counts = {name: int(options[name] * options['scale'])
+                  for name in ('ngos', 'animals', 'users', 'adoptions', 'reviews')}
+        if any(value < 0 for value in counts.values()) or options['batch_size'] < 1:
+            raise CommandError('Quantidades não podem ser negativas.')
+
+        start = time.perf_counter()
+        created = seed(**counts, batch_size=options['batch_size'], random_seed=options['seed'],
+                       password=options['password'])
+        elapsed = time.perf_counter() - start
+        summary = ', '.join(f'{total} {str(model._meta.verbose_name_plural).lower()}' for model, total in created.items())
+        self.stdout.write(self.style.SUCCESS(f'Criados em {elapsed:.1f}s: {summary}.'))
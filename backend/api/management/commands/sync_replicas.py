@@ -0,0 +1,34 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Copia o banco primário para as réplicas SQLite de PETHAVEN_DB_REPLICAS (backup online do '
+        'SQLite), para testar localmente o roteamento de leituras'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('aliases', nargs='*', help='Réplicas a copiar (padrão: todas)')
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or settings.DATABASE_REPLICAS
+        if not aliases:
+            raise CommandError('Nenhuma réplica configurada (defina PETHAVEN_DB_REPLICAS).')
+        primary = connections['default']
+        if primary.vendor != 'sqlite':
+            raise CommandError('Só copia bancos SQLite; use a replicação do próprio banco.')
+        primary.ensure_connection()
+        for alias in aliases:
+            if alias not in settings.DATABASE_REPLICAS:
+                raise CommandError(f'{alias} não é uma réplica.')
+            connections[alias].close()
+            target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(self.style.SUCCESS(f"{alias} atualizada ({settings.DATABASES[alias]['NAME']})."))
@@ -0,0 +1,224 @@
+import heapq
+import math
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import get_generations
+from .geo import EARTH_RADIUS_KM
+from .models import NGO, Animal
+
+try:
+    import numpy as np
+except ImportError:  # opcional: sem numpy, a mesma pontuação em Python puro, bem mais lenta
+    np = None
+
+TYPES = [value for value, _ in Animal.ANIMAL_TYPES]
+SIZES = [value for value, _ in Animal.SIZE_CHOICES]
+GENDERS = [value for value, _ in Animal._meta.get_field('gender').choices]
+CODES = {'type': TYPES, 'size': SIZES, 'gender': GENDERS}
+COLUMNS = ('id', 'type', 'size', 'gender', 'age', 'latitude', 'longitude')
+SOURCE_FIELDS = ('pk', 'type', 'size', 'gender', 'age', 'ngo__latitude', 'ngo__longitude')
+# Folga na busca por alterações: cobre relógios e transações que demoraram a fazer commit
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+def encode_row(row):
+    """Linha de SOURCE_FIELDS -> valores das COLUMNS (categorias viram códigos, graus viram radianos)"""
+    pk, animal_type, size, gender, age, latitude, longitude = row
+    if latitude is None or longitude is None:
+        latitude = longitude = math.nan
+    return (pk, TYPES.index(animal_type), SIZES.index(size), GENDERS.index(gender), float(age),
+            math.radians(latitude), math.radians(longitude))
+
+
+class FeatureMatrix:
+    """
+    Animais disponíveis em colunas na memória do processo (arrays do numpy,
+    ou listas sem ele), compartilhadas entre as requisições.
+
+    Cada leitura compara as gerações de NGO e Animal do cache de respostas
+    (api/cache.py), que todo save e importação incrementa: sem mudança,
+    nenhuma query. As gerações só mostram escritas de outros processos
+    (workers, run_jobs) com um cache compartilhado; com o LocMemCache, a
+    matriz também se ressincroniza a cada MATCHING_REFRESH_SECONDS. Na
+    ressincronização, relê só os animais alterados desde a última (ou cuja
+    ONG mudou) e aplica a diferença; um COUNT confere o total e, se não
+    bater (ex.: exclusões em outro processo), reconstrói tudo.
+
+    As colunas nunca mudam no lugar: cada atualização troca o dicionário
+    inteiro, então quem está pontuando segue com a versão que pegou.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.columns = None
+        self.index = {}
+        self.generations = None
+        self.synced_at = None
+
+    def snapshot(self):
+        generations = get_generations([NGO, Animal])
+        if generations != self.generations or self.expired():
+            with self.lock:
+                if generations != self.generations or self.expired():
+                    self.refresh()
+                    self.generations = generations
+        return self.columns
+
+    def expired(self):
+        age = timedelta(seconds=settings.MATCHING_REFRESH_SECONDS)
+        return self.synced_at is None or timezone.now() - self.synced_at > age
+
+    def refresh(self):
+        started = timezone.now()
+        if self.columns is not None:
+            since = self.synced_at - SYNC_OVERLAP
+            changed = list(Animal.objects.filter(Q(updated_at__gte=since) | Q(ngo__updated_at__gte=since))
+                           .values_list(*SOURCE_FIELDS, 'is_available'))
+            if len(changed) < max(100, len(self.index) // 5):
+                self.apply(changed)
+                if len(self.index) == Animal.objects.filter(is_available=True).count():
+                    self.synced_at = started
+                    return
+        self.rebuild()
+        self.synced_at = started
+
+    def rebuild(self):
+        rows = [encode_row(row) for row in Animal.objects.filter(is_available=True)
+                .order_by('pk').values_list(*SOURCE_FIELDS).iterator(chunk_size=5000)]
+        self.index = {row[0]: position for position, row in enumerate(rows)}
+        self.columns = self.build(list(zip(*rows)) if rows else [()] * len(COLUMNS))
+
+    def build(self, values):
+        if np is None:
+            return {name: list(column) for name, column in zip(COLUMNS, values)}
+        dtypes = (np.int64, np.int8, np.int8, np.int8, np.float32, np.float64, np.float64)
+        return {name: np.array(column, dtype=dtype) for name, column, dtype in zip(COLUMNS, values, dtypes)}
+
+    def apply(self, changed):
+        """
+        Atualiza, remove (trocando com a última posição) e acrescenta linhas
+        de cópias das colunas. As novas só ganham posição depois de todas as
+        remoções, a partir do tamanho final.
+        """
+        columns = {name: column.copy() for name, column in self.columns.items()}
+        index = dict(self.index)
+        size = len(index)
+        added = []
+        for *row, available in changed:
+            position = index.get(row[0])
+            if available and position is not None:
+                for name, value in zip(COLUMNS, encode_row(row)):
+                    columns[name][position] = value
+            elif available:
+                added.append(encode_row(row))
+            elif position is not None:
+                size -= 1
+                last = columns['id'][size]
+                for column in columns.values():
+                    column[position] = column[size]
+                index[int(last)] = position
+                del index[row[0]]
+        columns = {name: column[:size] for name, column in columns.items()}
+        for offset, row in enumerate(added):
+            index[row[0]] = size + offset
+        if added:
+            extra = self.build(list(zip(*added)))
+            columns = {
+                name: column + extra[name] if np is None else np.concatenate([column, extra[name]])
+                for name, column in columns.items()
+            }
+        self.columns, self.index = columns, index
+
+
+matrix = FeatureMatrix()
+
+
+def top_matches(preferences, limit):
+    """
+    Os `limit` animais disponíveis mais próximos das preferências, do maior
+    para o menor escore: [(id, escore de 0 a 1, distância em km ou None)].
+    """
+    columns = matrix.snapshot()
+    if not len(columns['id']):
+        return []
+    score = score_numpy if np is not None else score_python
+    return score(columns, preferences, limit)
+
+
+def weights(preferences):
+    """Pesos (MATCHING_WEIGHTS) só dos critérios que o perfil informa"""
+    given = {
+        'type': bool(preferences.get('type')), 'size': bool(preferences.get('size')),
+        'gender': bool(preferences.get('gender')),
+        'age': preferences.get('age_min') is not None or preferences.get('age_max') is not None,
+        'distance': preferences.get('near') is not None,
+    }
+    return {name: weight for name, weight in settings.MATCHING_WEIGHTS.items() if given[name]}
+
+
+def score_numpy(columns, preferences, limit):
+    active = weights(preferences)
+    total = np.zeros(len(columns['id']))
+    for name in ('type', 'size', 'gender'):
+        if name in active:
+            codes = [CODES[name].index(value) for value in preferences[name]]
+            total += active[name] * np.isin(columns[name], codes)
+    if 'age' in active:
+        ages = columns['age']
+        gap = (np.maximum(preferences.get('age_min', 0) - ages, 0)
+               + np.maximum(ages - preferences.get('age_max', math.inf), 0))
+        total += active['age'] * np.clip(1 - gap / settings.MATCHING_AGE_TOLERANCE, 0, 1)
+    distance = None
+    if 'distance' in active:
+        latitude, longitude = map(math.radians, preferences['near'])
+        lat, lon = columns['latitude'], columns['longitude']
+        a = np.sin((lat - latitude) / 2) ** 2 + math.cos(latitude) * np.cos(lat) * np.sin((lon - longitude) / 2) ** 2
+        distance = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+        # ONG sem localização: NaN, que não pontua
+        closeness = np.nan_to_num(1 / (1 + distance / preferences['radius']), nan=0.0)
+        total += active['distance'] * closeness
+    total /= sum(active.values()) or 1
+
+    limit = min(limit, len(total))
+    best = np.argpartition(-total, limit - 1)[:limit]
+    # Desempate estável pelo id
+    best = best[np.lexsort((columns['id'][best], -total[best]))]
+    return [
+        (int(columns['id'][i]), round(float(total[i]), 4),
+         None if distance is None or math.isnan(distance[i]) else round(float(distance[i]), 2))
+        for i in best
+    ]
+
+
+def score_python(columns, preferences, limit):
+    active = weights(preferences)
+    divisor = sum(active.values()) or 1
+    codes = {name: {CODES[name].index(value) for value in preferences[name]}
+             for name in ('type', 'size', 'gender') if name in active}
+    age_min, age_max = preferences.get('age_min', 0), preferences.get('age_max', math.inf)
+    near = tuple(map(math.radians, preferences['near'])) if 'distance' in active else None
+
+    def one(i):
+        total = sum(active[name] for name, accepted in codes.items() if columns[name][i] in accepted)
+        if 'age' in active:
+            age = columns['age'][i]
+            gap = max(age_min - age, 0) + max(age - age_max, 0)
+            total += active['age'] * min(max(1 - gap / settings.MATCHING_AGE_TOLERANCE, 0), 1)
+        distance = None
+        if near is not None and not math.isnan(columns['latitude'][i]):
+            lat, lon = columns['latitude'][i], columns['longitude'][i]
+            a = (math.sin((lat - near[0]) / 2) ** 2
+                 + math.cos(near[0]) * math.cos(lat) * math.sin((lon - near[1]) / 2) ** 2)
+            distance = 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+            total += active['distance'] / (1 + distance / preferences['radius'])
+        return total / divisor, distance
+
+    scored = ((one(i), columns['id'][i]) for i in range(len(columns['id'])))
+    best = heapq.nsmallest(limit, scored, key=lambda item: (-item[0][0], item[1]))
+    return [(pk, round(score, 4), None if distance is None else round(distance, 2))
+            for (score, distance), pk in best]
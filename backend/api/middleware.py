@@ -0,0 +1,203 @@
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.urls import URLResolver, get_resolver
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from .databases import is_pinned, pin_to_primary
+from .timing import RequestTimings, current_timings, logger as timing_logger
+
+try:
+    import brotli
+except ImportError:  # em requirements.txt; sem o pacote Brotli, só gzip
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'application/javascript', 'text/', 'image/svg+xml')
+
+
+def accepts_encoding(request, encoding):
+    """Se o Accept-Encoding aceita `encoding` (q=0 recusa)"""
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = item.strip().partition(';')
+        if name.strip().lower() != encoding:
+            continue
+        quality = params.strip()
+        try:
+            return not quality.startswith('q=') or float(quality[2:]) > 0
+        except ValueError:
+            return False
+    return False
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compressão das respostas: brotli quando o pacote está instalado e o
+    cliente aceita, senão o gzip do Django (também nos exports em streaming).
+    Só comprime tipos de texto a partir de RESPONSE_COMPRESSION_MIN_SIZE
+    bytes — abaixo disso o cabeçalho e a CPU custam mais que o ganho.
+    """
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or not self.compressible(response):
+            return response
+        if not response.streaming and len(response.content) < settings.RESPONSE_COMPRESSION_MIN_SIZE:
+            return response
+        if brotli is None or response.streaming or not accepts_encoding(request, 'br'):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = brotli.compress(response.content, quality=settings.RESPONSE_COMPRESSION_BROTLI_QUALITY)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        # Mesmo tratamento do gzip: o ETag forte vira fraco
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
+
+    def compressible(self, response):
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class RequestTimingMiddleware:
+    """
+    Mede as requisições das rotas de `api.urls`: número de queries e tempo
+    de SQL (via api.timing.sql_timer), de serialização, da view e total.
+    Devolve tudo no cabeçalho Server-Timing (se SERVER_TIMING_HEADER) e
+    registra no logger `api.timing` as requisições acima de SLOW_REQUEST_MS
+    e as queries acima de SLOW_QUERY_MS, com o SQL normalizado e a view.
+
+    Funciona nos dois modos: sob ASGI os hooks são corrotinas, para não
+    custar um salto de thread por requisição às views assíncronas.
+    """
+    sync_capable = True
+    async_capable = True
+    urlconf = 'api.urls'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefixes = None
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            self.process_view = self.aprocess_view
+            self.process_template_response = self.aprocess_template_response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self.view_started(request)
+
+    def process_template_response(self, request, response):
+        self.view_finished()
+        return response
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        self.view_started(request)
+
+    async def aprocess_template_response(self, request, response):
+        self.view_finished()
+        return response
+
+    def view_started(self, request):
+        timings = current_timings.get()
+        if timings is not None and self.is_api_route(request.resolver_match):
+            timings.view_name = request.resolver_match.view_name or request.resolver_match._func_path
+            timings.view_start = perf_counter()
+
+    def view_finished(self):
+        # Respostas do DRF são renderizadas depois daqui: o resto é renderização
+        timings = current_timings.get()
+        if timings is not None and timings.view_start is not None:
+            timings.view = perf_counter() - timings.view_start
+
+    def is_api_route(self, match):
+        if self.prefixes is None:
+            self.prefixes = tuple(
+                str(pattern.pattern) for pattern in get_resolver().url_patterns
+                if isinstance(pattern, URLResolver)
+                and getattr(pattern.urlconf_name, '__name__', pattern.urlconf_name) == self.urlconf
+            )
+        return match is not None and match.route.startswith(self.prefixes)
+
+    def finish(self, request, response, timings):
+        if timings.view_name is None:
+            return response
+        end = perf_counter()
+        total = end - timings.start
+        view = timings.view if timings.view is not None else end - timings.view_start
+        render = total - view - (timings.view_start - timings.start)
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={timings.sql * 1000:.1f};desc="{timings.queries} queries"',
+                f'serializer;dur={timings.serializer * 1000:.1f}',
+                f'view;dur={view * 1000:.1f}',
+                f'render;dur={render * 1000:.1f}',
+                f'total;dur={total * 1000:.1f}',
+            ])
+        if total * 1000 >= settings.SLOW_REQUEST_MS:
+            timing_logger.warning(
+                'Requisição lenta (%.1f ms): %s %s [%s] status=%s queries=%d sql=%.1fms '
+                'serializer=%.1fms view=%.1fms', total * 1000, request.method, request.get_full_path(),
+                timings.view_name, response.status_code, timings.queries, timings.sql * 1000,
+                timings.serializer * 1000, view * 1000,
+            )
+        return response
+
+
+class RateLimitHeadersMiddleware(MiddlewareMixin):
+    """
+    RateLimit-* (draft da IETF) com o limite mais apertado que os throttles
+    de api/throttling.py avaliaram na requisição. O Retry-After das
+    respostas 429 vem do próprio DRF.
+    """
+
+    def process_response(self, request, response):
+        rate_limit = getattr(request, 'rate_limit', None)
+        if rate_limit is not None:
+            response['RateLimit-Limit'] = str(rate_limit.limit)
+            response['RateLimit-Remaining'] = str(rate_limit.remaining)
+            response['RateLimit-Reset'] = str(rate_limit.reset)
+            response['RateLimit-Policy'] = f'{rate_limit.limit};w={rate_limit.duration};scope="{rate_limit.scope}"'
+        return response
+
+
+class ReplicaPinningMiddleware(MiddlewareMixin):
+    """
+    Leia o que escreveu: depois de uma escrita (POST, PUT, PATCH, DELETE) as
+    leituras do mesmo cliente vão ao primário por REPLICA_PIN_SECONDS, tempo
+    para a réplica alcançar. Sem réplicas configuradas não faz nada.
+    """
+
+    def process_request(self, request):
+        if settings.DATABASE_REPLICAS:
+            request.pinned_to_primary = is_pinned(request)
+
+    def process_response(self, request, response):
+        if settings.DATABASE_REPLICAS and request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+            pin_to_primary(request)
+        return response
@@ -0,0 +1,57 @@
+from django.db import migrations
+
+# Tabelas FTS5 de conteúdo externo: o índice guarda apenas os tokens e lê as
+# colunas originais de api_animal/api_ngo. As triggers mantêm o índice em dia
+# com inserts, updates e deletes feitos por qualquer caminho (ORM, admin, SQL).
+# "remove_diacritics 2" faz a dobra de acentos (cão == cao, ração == racao).
+FTS_TABLES = {
+    'api_animal_fts': ('api_animal', ['name', 'breed', 'description']),
+    'api_ngo_fts': ('api_ngo', ['name', 'city', 'email']),
+}
+
+
+def create_fts_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for fts_table, (table, columns) in FTS_TABLES.items():
+        cols = ', '.join(columns)
+        new_cols = ', '.join(f'new.{c}' for c in columns)
+        old_cols = ', '.join(f'old.{c}' for c in columns)
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {fts_table} USING fts5({cols}, content='{table}', "
+            f"content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {fts_table}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.id, {new_cols}); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {fts_table}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {fts_table}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); "
+            f"INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.id, {new_cols}); END"
+        )
+        schema_editor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+
+def drop_fts_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for fts_table in FTS_TABLES:
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {fts_table}_{suffix}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {fts_table}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_alter_adoption_options_alter_animal_options_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_tables, drop_fts_tables),
+    ]
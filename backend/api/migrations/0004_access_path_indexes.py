@@ -0,0 +1,61 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_fulltext_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='adoption',
+            index=models.Index(fields=['status', 'adoption_date'], name='adoption_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='adoption',
+            index=models.Index(fields=['animal', 'status'], name='adoption_animal_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='animal',
+            index=models.Index(fields=['ngo', 'is_available', 'created_at'], name='animal_ngo_avail_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='animal',
+            index=models.Index(fields=['type', 'size', 'gender'], name='animal_type_size_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='animal',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['created_at'], name='animal_avail_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='animal',
+            index=models.Index(fields=['name'], name='animal_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='animal',
+            index=models.Index(fields=['age'], name='animal_age_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='animal',
+            index=models.Index(fields=['created_at'], name='animal_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ngo',
+            index=models.Index(fields=['city'], name='ngo_city_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['rating', 'created_at'], name='review_rating_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['created_at'], name='review_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['animal', 'created_at'], name='review_animal_created_idx'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:24
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, Sum
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Animal = apps.get_model('api', 'Animal')
+    NGO = apps.get_model('api', 'NGO')
+    Review = apps.get_model('api', 'Review')
+    for model, lookup in ((Animal, 'animal'), (NGO, 'animal__ngo')):
+        rows = Review.objects.values(lookup).annotate(c=Count('pk'), s=Sum('rating'), a=Avg('rating'))
+        for row in rows:
+            model.objects.filter(pk=row[lookup]).update(
+                rating_count=row['c'], rating_sum=row['s'], rating_average=row['a'],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_animal_photo_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='animal',
+            name='rating_average',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='Média das avaliações'),
+        ),
+        migrations.AddField(
+            model_name='animal',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Número de avaliações'),
+        ),
+        migrations.AddField(
+            model_name='animal',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Soma das avaliações'),
+        ),
+        migrations.AddField(
+            model_name='ngo',
+            name='rating_average',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='Média das avaliações'),
+        ),
+        migrations.AddField(
+            model_name='ngo',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Número de avaliações'),
+        ),
+        migrations.AddField(
+            model_name='ngo',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Soma das avaliações'),
+        ),
+        migrations.AddIndex(
+            model_name='animal',
+            index=models.Index(fields=['rating_average'], name='animal_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ngo',
+            index=models.Index(fields=['rating_average'], name='ngo_rating_idx'),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import F
+
+
+def backfill_approval_date(apps, schema_editor):
+    # Sem registro da aprovação, a última alteração é a melhor aproximação
+    Adoption = apps.get_model('api', 'Adoption')
+    Adoption.objects.filter(status__in=['approved', 'completed']).update(approval_date=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='adoption',
+            name='approval_date',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Data de aprovação'),
+        ),
+        migrations.CreateModel(
+            name='NGOStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=30, verbose_name='Métrica')),
+                ('key', models.CharField(blank=True, max_length=30, verbose_name='Chave')),
+                ('value', models.IntegerField(default=0, verbose_name='Valor')),
+                ('ngo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='api.ngo', verbose_name='ONG')),
+            ],
+            options={
+                'verbose_name': 'Estatística da ONG',
+                'verbose_name_plural': 'Estatísticas das ONGs',
+                'unique_together': {('ngo', 'metric', 'key')},
+            },
+        ),
+        migrations.RunPython(backfill_approval_date, migrations.RunPython.noop),
+    ]
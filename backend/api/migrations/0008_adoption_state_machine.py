@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:41
+
+from django.db import migrations, models
+
+
+def resolve_duplicates(apps, schema_editor):
+    """
+    Dados anteriores às restrições: a aprovação mais antiga de cada animal
+    fica e as demais viram rejeitadas; das solicitações pendentes repetidas
+    do mesmo usuário para o mesmo animal, só a mais antiga continua pendente.
+    """
+    Adoption = apps.get_model('api', 'Adoption')
+    keep = {}
+    rejected = []
+    for pk, animal_id in (Adoption.objects.filter(status__in=['approved', 'completed'])
+                          .order_by('adoption_date', 'pk').values_list('pk', 'animal_id')):
+        if keep.setdefault(animal_id, pk) != pk:
+            rejected.append(pk)
+    Adoption.objects.filter(pk__in=rejected).update(status='rejected', approval_date=None)
+
+    keep = {}
+    cancelled = []
+    for pk, user_id, animal_id in (Adoption.objects.filter(status='pending')
+                                   .order_by('adoption_date', 'pk').values_list('pk', 'user_id', 'animal_id')):
+        if keep.setdefault((user_id, animal_id), pk) != pk:
+            cancelled.append(pk)
+    Adoption.objects.filter(pk__in=cancelled).update(status='cancelled')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_ngo_stats'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='adoption',
+            unique_together=set(),
+        ),
+        migrations.RunPython(resolve_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='adoption',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['approved', 'completed'])), fields=('animal',), name='adoption_one_approved_per_animal'),
+        ),
+        migrations.AddConstraint(
+            model_name='adoption',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('user', 'animal'), name='adoption_one_pending_per_user'),
+        ),
+    ]
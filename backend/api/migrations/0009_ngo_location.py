@@ -0,0 +1,138 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:11
+
+import unicodedata
+
+import django.core.validators
+from django.db import migrations, models
+
+# Cópia congelada de api/data/cities.csv e do geohash de api/geo.py na época
+# desta migração: mudanças futuras no código não alteram o que ela grava
+CITIES = {
+    'aracaju': (-10.9472, -37.0731),
+    'anapolis': (-16.3281, -48.9534),
+    'belem': (-1.4558, -48.4902),
+    'belo horizonte': (-19.9167, -43.9345),
+    'birigui': (-21.2886, -50.34),
+    'blumenau': (-26.9194, -49.0661),
+    'boa vista': (2.8235, -60.6758),
+    'brasilia': (-15.7939, -47.8828),
+    'campina grande': (-7.2307, -35.8817),
+    'campinas': (-22.9099, -47.0626),
+    'campo grande': (-20.4697, -54.6201),
+    'canoas': (-29.9177, -51.1836),
+    'caruaru': (-8.276, -35.9819),
+    'caxias do sul': (-29.1678, -51.1794),
+    'contagem': (-19.932, -44.0539),
+    'cuiaba': (-15.6014, -56.0979),
+    'curitiba': (-25.4284, -49.2733),
+    'duque de caxias': (-22.7856, -43.3117),
+    'feira de santana': (-12.2664, -38.9663),
+    'florianopolis': (-27.5954, -48.548),
+    'fortaleza': (-3.7319, -38.5267),
+    'goiania': (-16.6869, -49.2648),
+    'guarulhos': (-23.4538, -46.5333),
+    'jaboatao dos guararapes': (-8.113, -35.015),
+    'joao pessoa': (-7.1195, -34.845),
+    'joinville': (-26.3045, -48.8487),
+    'juiz de fora': (-21.7642, -43.3496),
+    'londrina': (-23.3045, -51.1696),
+    'macapa': (0.0349, -51.0694),
+    'maceio': (-9.6658, -35.7353),
+    'manaus': (-3.119, -60.0217),
+    'maringa': (-23.4205, -51.9333),
+    'natal': (-5.7945, -35.211),
+    'niteroi': (-22.8832, -43.1034),
+    'nova iguacu': (-22.7592, -43.451),
+    'olinda': (-8.0089, -34.8553),
+    'osasco': (-23.5329, -46.7917),
+    'palmas': (-10.2491, -48.3243),
+    'pelotas': (-31.7654, -52.3376),
+    'petrolina': (-9.3891, -40.503),
+    'petropolis': (-22.5112, -43.1779),
+    'porto alegre': (-30.0346, -51.2177),
+    'porto velho': (-8.7612, -63.9004),
+    'recife': (-8.0476, -34.877),
+    'ribeirao preto': (-21.1704, -47.8103),
+    'rio branco': (-9.9754, -67.8249),
+    'rio de janeiro': (-22.9068, -43.1729),
+    'salvador': (-12.9777, -38.5016),
+    'santo andre': (-23.6639, -46.5383),
+    'santos': (-23.9608, -46.3336),
+    'sao bernardo do campo': (-23.6914, -46.5646),
+    'sao jose dos campos': (-23.1896, -45.8841),
+    'sao luis': (-2.5307, -44.3068),
+    'sao paulo': (-23.5505, -46.6333),
+    'sorocaba': (-23.5015, -47.4526),
+    'teresina': (-5.092, -42.8038),
+    'uberlandia': (-18.9186, -48.2772),
+    'vila velha': (-20.3297, -40.2925),
+    'vitoria': (-20.3155, -40.3128),
+}
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def normalize_city(name):
+    name = unicodedata.normalize('NFKD', name or '')
+    return ' '.join(''.join(c for c in name if not unicodedata.combining(c)).lower().split())
+
+
+def encode_geohash(latitude, longitude, precision=9):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = value = 0
+    return ''.join(chars)
+
+
+def geocode_existing_ngos(apps, schema_editor):
+    NGO = apps.get_model('api', 'NGO')
+    located = []
+    for ngo in NGO.objects.only('pk', 'city').iterator(chunk_size=500):
+        point = CITIES.get(normalize_city(ngo.city))
+        if point:
+            ngo.latitude, ngo.longitude = point
+            ngo.geohash = encode_geohash(*point)
+            located.append(ngo)
+    NGO.objects.bulk_update(located, ['latitude', 'longitude', 'geohash'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_adoption_state_machine'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ngo',
+            name='geohash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=12, verbose_name='Geohash'),
+        ),
+        migrations.AddField(
+            model_name='ngo',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-90), django.core.validators.MaxValueValidator(90)], verbose_name='Latitude'),
+        ),
+        migrations.AddField(
+            model_name='ngo',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-180), django.core.validators.MaxValueValidator(180)], verbose_name='Longitude'),
+        ),
+        migrations.AddIndex(
+            model_name='ngo',
+            index=models.Index(fields=['geohash'], name='ngo_geohash_idx'),
+        ),
+        migrations.RunPython(geocode_existing_ngos, migrations.RunPython.noop),
+    ]
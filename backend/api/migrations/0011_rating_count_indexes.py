@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_job_queue'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='animal',
+            index=models.Index(fields=['rating_count'], name='animal_rating_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ngo',
+            index=models.Index(fields=['rating_count'], name='ngo_rating_count_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_rating_count_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='animal',
+            index=models.Index(fields=['size', 'gender'], name='animal_size_gender_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='animal',
+            index=models.Index(fields=['gender'], name='animal_gender_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ngo',
+            index=models.Index(fields=['name'], name='ngo_name_idx'),
+        ),
+    ]
@@ -1,9 +1,58 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
-class NGO(models.Model):
+from .geo import encode_geohash, geocode_city
+
+# Mantidos por UPDATEs atômicos em api/ratings.py; um save() comum de uma
+# instância carregada antes da avaliação não pode sobrescrevê-los.
+RATING_FIELDS = ('rating_count', 'rating_sum', 'rating_average')
+
+
+def without_rating_fields(instance, kwargs):
+    """Restringe o UPDATE de um save() aos campos que não são agregados"""
+    if instance._state.adding or kwargs.get('force_insert') or kwargs.get('update_fields') is not None:
+        return kwargs
+    fields = [
+        field.name for field in instance._meta.concrete_fields
+        if not field.primary_key and field.name not in RATING_FIELDS
+    ]
+    return dict(kwargs, update_fields=fields)
+
+class TrackedModel(models.Model):
+    """
+    Guarda em `_stored` os valores de `tracked_fields` como estão no banco,
+    para que os sinais (api/signals.py) calculem deltas de agregados numa
+    edição. Atualizado ao carregar e depois de cada save().
+    """
+    tracked_fields = ()
+    
+    class Meta:
+        abstract = True
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_stored_values()
+        return instance
+    
+    def remember_stored_values(self):
+        self._stored = {field: self.__dict__.get(field) for field in self.tracked_fields}
+    
+    def stored_values(self):
+        """Valores do banco, ou None para uma instância ainda não gravada"""
+        return getattr(self, '_stored', None)
+    
+    def save(self, *args, **kwargs):
+        # A linha e os agregados atualizados pelos sinais entram juntos
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        self.remember_stored_values()
+
+class NGO(TrackedModel):
     """Organização Não-Governamental que registra animais para adoção"""
     name = models.CharField(_('Nome'), max_length=100)
     city = models.CharField(_('Cidade'), max_length=100)
@@ -16,17 +65,53 @@ class NGO(models.Model):
     # website = models.URLField(_('Website'), blank=True, null=True)
     # state = models.CharField(_('Estado'), max_length=2, blank=True, null=True)
     # zip_code = models.CharField(_('CEP'), max_length=10, blank=True, null=True)
+    # Localização para a busca por proximidade (api/geo.py). Sem coordenadas
+    # informadas, vêm da cidade pela tabela embarcada em api/data/cities.csv.
+    latitude = models.FloatField(_('Latitude'), blank=True, null=True,
+                                 validators=[MinValueValidator(-90), MaxValueValidator(90)])
+    longitude = models.FloatField(_('Longitude'), blank=True, null=True,
+                                  validators=[MinValueValidator(-180), MaxValueValidator(180)])
+    geohash = models.CharField(_('Geohash'), max_length=12, blank=True, default='', editable=False)
+    # Agregados das avaliações, mantidos em dia por api/ratings.py
+    rating_count = models.PositiveIntegerField(_('Número de avaliações'), default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(_('Soma das avaliações'), default=0, editable=False)
+    rating_average = models.FloatField(_('Média das avaliações'), blank=True, null=True, editable=False)
     created_at = models.DateTimeField(_('Criado em'), auto_now_add=True)
     updated_at = models.DateTimeField(_('Atualizado em'), auto_now=True)
     
     class Meta:
         verbose_name = _('ONG')
         verbose_name_plural = _('ONGs')
+        indexes = [
+            models.Index(fields=['city'], name='ngo_city_idx'),
+            models.Index(fields=['name'], name='ngo_name_idx'),
+            models.Index(fields=['rating_average'], name='ngo_rating_idx'),
+            models.Index(fields=['rating_count'], name='ngo_rating_count_idx'),
+            models.Index(fields=['geohash'], name='ngo_geohash_idx'),
+        ]
+    
+    tracked_fields = ('city', 'latitude', 'longitude')
     
     def __str__(self):
         return self.name
+    
+    def save(self, *args, **kwargs):
+        self.update_location()
+        super().save(*args, **without_rating_fields(self, kwargs))
+    
+    def update_location(self):
+        """
+        Geocodifica pela cidade quando faltam coordenadas ou quando só a cidade
+        mudou, e recalcula o geohash.
+        """
+        stored = self.stored_values()
+        moved = (stored is not None and stored['city'] != self.city
+                 and (stored['latitude'], stored['longitude']) == (self.latitude, self.longitude))
+        if self.latitude is None or self.longitude is None or moved:
+            self.latitude, self.longitude = geocode_city(self.city) or (None, None)
+        self.geohash = '' if self.latitude is None else encode_geohash(self.latitude, self.longitude)
 
-class Animal(models.Model):
+class Animal(TrackedModel):
     """Animal disponível para adoção"""
     ANIMAL_TYPES = (
         ('dog', _('Cachorro')),
@@ -52,19 +137,47 @@ class Animal(models.Model):
     # color = models.CharField(_('Cor'), max_length=50, blank=True, null=True)
     description = models.TextField(_('Descrição'))
     photo = models.ImageField(_('Foto'), upload_to='animals/', blank=True, null=True)
+    # Miniaturas/WebP geradas a partir da foto (ver api/images.py)
+    photo_variants = models.JSONField(_('Variações da foto'), default=dict, blank=True, editable=False)
     ngo = models.ForeignKey(NGO, verbose_name=_('ONG'), related_name='animals', on_delete=models.CASCADE)
     is_available = models.BooleanField(_('Disponível para adoção'), default=True)
+    # Agregados das avaliações, mantidos em dia por api/ratings.py
+    rating_count = models.PositiveIntegerField(_('Número de avaliações'), default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(_('Soma das avaliações'), default=0, editable=False)
+    rating_average = models.FloatField(_('Média das avaliações'), blank=True, null=True, editable=False)
     created_at = models.DateTimeField(_('Criado em'), auto_now_add=True)
     updated_at = models.DateTimeField(_('Atualizado em'), auto_now=True)
     
     class Meta:
         verbose_name = _('Animal')
         verbose_name_plural = _('Animais')
+        # Índices pensados para os filtros/ordenações servidos pelo AnimalViewSet.
+        # A maior parte do tráfego lista apenas animais disponíveis, por isso o
+        # índice parcial (is_available=True) de created_at fica pequeno e quente no cache.
+        indexes = [
+            models.Index(fields=['ngo', 'is_available', 'created_at'], name='animal_ngo_avail_created_idx'),
+            models.Index(fields=['type', 'size', 'gender'], name='animal_type_size_idx'),
+            # ?size= e ?gender= sem ?type= não usam o prefixo do índice acima
+            models.Index(fields=['size', 'gender'], name='animal_size_gender_idx'),
+            models.Index(fields=['gender'], name='animal_gender_idx'),
+            models.Index(fields=['created_at'], name='animal_avail_created_idx',
+                         condition=models.Q(is_available=True)),
+            models.Index(fields=['name'], name='animal_name_idx'),
+            models.Index(fields=['age'], name='animal_age_idx'),
+            models.Index(fields=['created_at'], name='animal_created_idx'),
+            models.Index(fields=['rating_average'], name='animal_rating_idx'),
+            models.Index(fields=['rating_count'], name='animal_rating_count_idx'),
+        ]
+    
+    tracked_fields = ('ngo_id', 'type', 'size', 'is_available')
     
     def __str__(self):
         return f"{self.name} ({self.type})"
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **without_rating_fields(self, kwargs))
 
-class Adoption(models.Model):
+class Adoption(TrackedModel):
     """Representa o relacionamento N:N entre Usuário e Animal para adoção"""
     STATUS_CHOICES = (
         ('pending', _('Pendente')),
@@ -79,28 +192,72 @@ class Adoption(models.Model):
     status = models.CharField(_('Status'), max_length=10, choices=STATUS_CHOICES, default='pending')
     # Usando o campo adoption_date existente como request_date
     adoption_date = models.DateTimeField(_('Data da solicitação'), auto_now_add=True)
-    # Campos comentados para evitar erros no banco de dados
+    approval_date = models.DateTimeField(_('Data de aprovação'), blank=True, null=True, editable=False)
+    # Campo comentado para evitar erros no banco de dados
     # request_date = models.DateTimeField(_('Data da solicitação'), auto_now_add=True)
-    # approval_date = models.DateTimeField(_('Data de aprovação'), blank=True, null=True)
     updated_at = models.DateTimeField(_('Atualizado em'), auto_now=True)
     notes = models.TextField(_('Observações'), blank=True, null=True)
     
+    # Transições permitidas a partir de cada status; os demais são finais
+    TRANSITIONS = {
+        'pending': ('approved', 'rejected', 'cancelled'),
+        'approved': ('completed', 'cancelled'),
+    }
+    # Status que tiram o animal da adoção: no máximo uma adoção assim por animal
+    ADOPTED_STATUSES = ('approved', 'completed')
+    
     class Meta:
-        unique_together = ('user', 'animal', 'status')
         verbose_name = _('Adoção')
         verbose_name_plural = _('Adoções')
+        indexes = [
+            models.Index(fields=['status', 'adoption_date'], name='adoption_status_date_idx'),
+            models.Index(fields=['animal', 'status'], name='adoption_animal_status_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['animal'], condition=models.Q(status__in=['approved', 'completed']),
+                name='adoption_one_approved_per_animal',
+            ),
+            models.UniqueConstraint(
+                fields=['user', 'animal'], condition=models.Q(status='pending'),
+                name='adoption_one_pending_per_user',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.animal.name} ({self.get_status_display()})"
     
+    tracked_fields = ('animal_id', 'status', 'approval_date')
+    
+    @classmethod
+    def can_transition(cls, current, new):
+        return new in cls.TRANSITIONS.get(current, ())
+    
+    def clean(self):
+        stored = self.stored_values()
+        if stored and stored['status'] != self.status and not self.can_transition(stored['status'], self.status):
+            raise ValidationError({'status': _('Transição de status inválida: %(current)s -> %(new)s') % {
+                'current': stored['status'], 'new': self.status,
+            }})
+    
     def save(self, *args, **kwargs):
-        # If adoption is approved, set animal as not available
-        if self.status == 'approved':
-            self.animal.is_available = False
-            self.animal.save()
-        super().save(*args, **kwargs)
+        # A API muda status por api/adoptions.py; aqui fica o caminho do admin
+        # e do shell, que trava o animal só quando a adoção passa a aprovada.
+        stored = self.stored_values()
+        if self.status != 'approved' or (stored and stored['status'] == 'approved'):
+            return super().save(*args, **kwargs)
+        if self.approval_date is None:
+            self.approval_date = timezone.now()
+        with transaction.atomic():
+            animal = Animal.objects.select_for_update().get(pk=self.animal_id)
+            if animal.is_available:
+                animal.is_available = False
+                animal.save(update_fields=['is_available', 'updated_at'])
+            if Adoption.animal.is_cached(self):
+                self.animal.is_available = False
+            super().save(*args, **kwargs)
 
-class Review(models.Model):
+class Review(TrackedModel):
     """Avaliações dos usuários sobre as experiências de adoção"""
     user = models.ForeignKey(User, verbose_name=_('Usuário'), related_name='reviews', on_delete=models.CASCADE)
     animal = models.ForeignKey(Animal, verbose_name=_('Animal'), related_name='reviews', on_delete=models.CASCADE)
@@ -116,7 +273,67 @@ class Review(models.Model):
         unique_together = ('user', 'animal')
         verbose_name = _('Avaliação')
         verbose_name_plural = _('Avaliações')
+        indexes = [
+            models.Index(fields=['rating', 'created_at'], name='review_rating_created_idx'),
+            models.Index(fields=['created_at'], name='review_created_idx'),
+            models.Index(fields=['animal', 'created_at'], name='review_animal_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username}'s review of {self.animal.name} - {self.rating}/5"
+    
+    tracked_fields = ('animal_id', 'rating')
+
 
+class NGOStat(models.Model):
+    """
+    Tabela de resumo das estatísticas de cada ONG (api/stats.py): uma linha
+    por (métrica, chave) com a contagem atual, atualizada incrementalmente
+    pelos sinais de Animal e Adoption.
+    """
+    ngo = models.ForeignKey(NGO, verbose_name=_('ONG'), related_name='stats', on_delete=models.CASCADE)
+    metric = models.CharField(_('Métrica'), max_length=30)
+    key = models.CharField(_('Chave'), max_length=30, blank=True)
+    value = models.IntegerField(_('Valor'), default=0)
+    
+    class Meta:
+        unique_together = ('ngo', 'metric', 'key')
+        verbose_name = _('Estatística da ONG')
+        verbose_name_plural = _('Estatísticas das ONGs')
+    
+    def __str__(self):
+        return f"{self.ngo_id} {self.metric}[{self.key}] = {self.value}"
+
+class Job(models.Model):
+    """
+    Tarefa em segundo plano (api/jobs.py), gravada na mesma transação da
+    mudança que a gerou e executada pelo comando run_jobs.
+    """
+    STATUS_CHOICES = (
+        ('queued', _('Na fila')),
+        ('running', _('Executando')),
+        ('done', _('Concluída')),
+        ('failed', _('Falhou')),
+    )
+    
+    task = models.CharField(_('Tarefa'), max_length=100)
+    payload = models.JSONField(_('Parâmetros'), default=dict, blank=True)
+    status = models.CharField(_('Status'), max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(_('Tentativas'), default=0)
+    max_attempts = models.PositiveSmallIntegerField(_('Máximo de tentativas'), default=5)
+    run_at = models.DateTimeField(_('Executar a partir de'), default=timezone.now)
+    locked_by = models.CharField(_('Worker'), max_length=100, blank=True, default='')
+    locked_at = models.DateTimeField(_('Iniciada em'), blank=True, null=True)
+    last_error = models.TextField(_('Último erro'), blank=True, default='')
+    created_at = models.DateTimeField(_('Criada em'), auto_now_add=True)
+    finished_at = models.DateTimeField(_('Concluída em'), blank=True, null=True)
+    
+    class Meta:
+        verbose_name = _('Tarefa')
+        verbose_name_plural = _('Tarefas')
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.get_status_display()})"
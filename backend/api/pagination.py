@@ -0,0 +1,259 @@
+import hashlib
+from base64 import b64decode, b64encode
+from urllib import parse
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage, Paginator as DjangoPaginator
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+# Contagens abaixo deste valor são baratas e sempre calculadas na hora; acima
+# dele o COUNT(*) é reaproveitado do cache por COUNT_CACHE_TIMEOUT segundos.
+COUNT_CACHE_THRESHOLD = getattr(settings, 'PAGINATION_COUNT_CACHE_THRESHOLD', 1000)
+COUNT_CACHE_TIMEOUT = getattr(settings, 'PAGINATION_COUNT_CACHE_TIMEOUT', 60)
+
+
+def count_cache_key(queryset):
+    sql, params = queryset.query.sql_with_params()
+    digest = hashlib.md5(f'{queryset.db}:{sql}:{params!r}'.encode()).hexdigest()
+    return f'pagination:count:{digest}'
+
+
+def cached_count(queryset):
+    """COUNT(*) da queryset, reaproveitado do cache quando o resultado é grande"""
+    key = count_cache_key(queryset)
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        if count >= COUNT_CACHE_THRESHOLD:
+            cache.set(key, count, COUNT_CACHE_TIMEOUT)
+    return count
+
+
+async def acached_count(queryset):
+    """Versão assíncrona de `cached_count`, para as views de api/async_views.py"""
+    key = count_cache_key(queryset)
+    count = await cache.aget(key)
+    if count is None:
+        count = await queryset.acount()
+        if count >= COUNT_CACHE_THRESHOLD:
+            await cache.aset(key, count, COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def annotated_ordering(queryset):
+    """Primeiro termo da ordenação da queryset quando é uma anotação (ex.: `distance` do ?near=)"""
+    for term in queryset.query.order_by[:1]:
+        if isinstance(term, str) and term.lstrip('-') in queryset.query.annotations:
+            return term
+    return None
+
+
+class CachedCountPaginator(DjangoPaginator):
+
+    @cached_property
+    def count(self):
+        return cached_count(self.object_list)
+
+
+class PageNumberPagination(pagination.PageNumberPagination):
+    """Paginação por número de página, com total vindo de `cached_count`"""
+    django_paginator_class = CachedCountPaginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not queryset.ordered:
+            queryset = queryset.order_by('pk')
+        return super().paginate_queryset(queryset, request, view)
+    
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Mesma página de `paginate_queryset`, com COUNT e linhas pelo ORM assíncrono"""
+        if not queryset.ordered:
+            queryset = queryset.order_by('pk')
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        # `count` é cached_property: preenchido aqui, o Paginator não consulta o banco
+        paginator.count = await acached_count(queryset)
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        self.page.object_list = [obj async for obj in self.page.object_list]
+
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.request = request
+        return self.page.object_list
+
+
+class KeysetPagination(pagination.BasePagination):
+    """
+    Paginação por cursor (keyset) sobre o campo de ordenação pedido + id.
+
+    O cursor guarda o valor da chave e o id da última linha entregue, então a
+    página N é um `WHERE (chave, id) > (valor, id)` servido por índice, com o
+    mesmo custo da primeira página e sem COUNT(*). A chave é o primeiro termo
+    de `?ordering=` (validado contra `ordering_fields`); sem ele, a anotação
+    pela qual a queryset já vem ordenada (a distância do ?near=) ou o id.
+    """
+    cursor_query_param = 'cursor'
+    page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE')
+    invalid_cursor_message = 'Cursor inválido'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request, view)
+        return self.page_rows(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request, view)
+        return self.page_rows([obj async for obj in queryset])
+
+    def page_queryset(self, queryset, request, view):
+        """Queryset da página pedida pelo cursor, com uma linha a mais para saber se há próxima"""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.key, descending = self.get_key(request, queryset, view)
+        self.pk_name = queryset.model._meta.pk.attname
+        if self.key in queryset.query.annotations:
+            model_field = queryset.query.annotations[self.key].output_field
+        else:
+            model_field = queryset.model._meta.get_field(self.key)
+
+        self.position = self.decode_cursor(request, model_field)
+        self.reverse = bool(self.position and self.position['reverse'])
+        # Página anterior: percorre a ordenação invertida e desfaz no final
+        backwards = descending != self.reverse
+        if self.position:
+            queryset = queryset.filter(self.after(self.position, backwards, model_field.null))
+        if backwards:
+            queryset = queryset.order_by(F(self.key).desc(nulls_last=True), '-pk')
+        else:
+            queryset = queryset.order_by(F(self.key).asc(nulls_first=True), 'pk')
+        return queryset[:self.page_size + 1]
+
+    def page_rows(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+
+        self.next_position = self.previous_position = None
+        if rows and (has_more or self.reverse):
+            self.next_position = self.position_of(rows[-1])
+        if rows and (self.position and (has_more or not self.reverse)):
+            self.previous_position = self.position_of(rows[0])
+        return rows
+
+    def after(self, position, backwards, nullable):
+        """
+        Condição "depois da posição" na ordem percorrida. NULLs ficam antes de
+        todos os valores na ordem crescente e depois na decrescente.
+        """
+        op = 'lt' if backwards else 'gt'
+        key, value, pk = self.key, position['value'], position['pk']
+        if value is None:
+            condition = Q(**{f'{key}__isnull': True, f'pk__{op}': pk})
+            return condition if backwards else condition | Q(**{f'{key}__isnull': False})
+        # (chave >= v) AND (chave > v OR id > i): a primeira condição vira
+        # um range no índice da chave, a segunda desempata pelo id
+        condition = Q(**{f'{key}__{op}e': value}) & (Q(**{f'{key}__{op}': value}) | Q(**{f'pk__{op}': pk}))
+        if nullable and backwards:
+            condition |= Q(**{f'{key}__isnull': True})
+        return condition
+
+    def get_key(self, request, queryset, view):
+        ordering = None
+        if view is not None and OrderingFilter in getattr(view, 'filter_backends', []):
+            ordering = OrderingFilter().get_ordering(request, queryset, view)
+        term = ordering[0] if ordering else annotated_ordering(queryset) or 'pk'
+        key = term.lstrip('-')
+        if key in ('pk', 'id'):
+            key = queryset.model._meta.pk.name
+        return key, term.startswith('-')
+
+    def position_of(self, obj):
+        if isinstance(obj, dict):
+            # Linha de `.values()` (caminho rápido de api/fastpath.py)
+            value, pk = obj[self.key], obj[self.pk_name]
+        else:
+            value, pk = getattr(obj, self.key), obj.pk
+        return {'value': value.isoformat() if hasattr(value, 'isoformat') else value, 'pk': pk}
+
+    def decode_cursor(self, request, model_field):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            tokens = parse.parse_qs(b64decode(encoded.encode('ascii')).decode('utf-8'), keep_blank_values=True)
+            return {
+                'value': None if 'n' in tokens else model_field.to_python(tokens['v'][0]),
+                'pk': int(tokens['i'][0]),
+                'reverse': tokens.get('r', ['0'])[0] == '1',
+            }
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position, reverse):
+        tokens = {'i': position['pk']}
+        if position['value'] is None:
+            tokens['n'] = '1'
+        else:
+            tokens['v'] = position['value']
+        if reverse:
+            tokens['r'] = '1'
+        encoded = b64encode(parse.urlencode(tokens, doseq=True).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        return self.encode_cursor(self.next_position, reverse=False) if self.next_position else None
+
+    def get_previous_link(self):
+        return self.encode_cursor(self.previous_position, reverse=True) if self.previous_position else None
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class HybridPagination(PageNumberPagination):
+    """
+    Página por número (com `count`) por padrão; modo cursor com `?cursor=`.
+
+    Clientes que precisam do total continuam usando `?page=N`; listagens
+    profundas (rolagem infinita, exportações) devem usar `?cursor=` — vazio
+    na primeira página e depois os links `next`/`previous` da resposta.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if KeysetPagination.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination()
+            self.keyset.page_size = self.get_page_size(request)
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if KeysetPagination.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination()
+            self.keyset.page_size = self.get_page_size(request)
+            return await self.keyset.apaginate_queryset(queryset, request, view)
+        return await super().apaginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
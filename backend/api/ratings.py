@@ -0,0 +1,87 @@
+from django.db.models import Count, F, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.utils import timezone
+
+from .cache import invalidate
+from .models import NGO, Animal, Review
+
+
+def average_expression(count, total):
+    """sum / count em ponto flutuante; NULL quando não há avaliações"""
+    return Cast(total, FloatField()) / NullIf(count, Value(0))
+
+
+def apply_rating_delta(animal_id, count_delta, sum_delta):
+    """
+    Soma os deltas nos agregados do animal e da ONG dele com UPDATEs de
+    expressões F(): o banco faz a conta sobre o valor atual da linha, então
+    avaliações simultâneas não se sobrescrevem.
+    """
+    if not count_delta and not sum_delta:
+        return
+    new_count = F('rating_count') + count_delta
+    new_sum = F('rating_sum') + sum_delta
+    values = {
+        'rating_count': new_count,
+        'rating_sum': new_sum,
+        'rating_average': average_expression(new_count, new_sum),
+        # updated_at entra nos ETags (api/conditional.py)
+        'updated_at': timezone.now(),
+    }
+    Animal.objects.filter(pk=animal_id).update(**values)
+    NGO.objects.filter(animals=animal_id).update(**values)
+    invalidate(Animal)
+    invalidate(NGO)
+
+
+def review_saved(instance, created):
+    stored = instance.stored_values()
+    if created or not stored or stored['animal_id'] is None:
+        apply_rating_delta(instance.animal_id, 1, instance.rating)
+    elif stored['animal_id'] != instance.animal_id:
+        apply_rating_delta(stored['animal_id'], -1, -stored['rating'])
+        apply_rating_delta(instance.animal_id, 1, instance.rating)
+    else:
+        apply_rating_delta(instance.animal_id, 0, instance.rating - stored['rating'])
+
+
+def review_deleted(instance):
+    stored = instance.stored_values() or {'animal_id': instance.animal_id, 'rating': instance.rating}
+    apply_rating_delta(stored['animal_id'], -1, -stored['rating'])
+
+
+def actual_aggregates(reviews):
+    """Subqueries de COUNT/SUM de `reviews` (já correlacionadas por OuterRef)"""
+    reviews = reviews.order_by().values(group=Value(1))
+    count = Coalesce(Subquery(reviews.annotate(c=Count('pk')).values('c')), 0)
+    total = Coalesce(Subquery(reviews.annotate(s=Sum('rating')).values('s')), 0)
+    return count, total
+
+
+def reconcile(model, reviews):
+    """
+    Recalcula os agregados das linhas de `model` que divergem das avaliações
+    e devolve quantas foram corrigidas.
+    """
+    count, total = actual_aggregates(reviews)
+    drifted = model.objects.annotate(actual_count=count, actual_sum=total).exclude(
+        rating_count=F('actual_count'), rating_sum=F('actual_sum'),
+    ).values('pk')
+    return model.objects.filter(pk__in=list(drifted.values_list('pk', flat=True))).update(
+        rating_count=count,
+        rating_sum=total,
+        rating_average=average_expression(count, total),
+        updated_at=timezone.now(),
+    )
+
+
+def reconcile_all():
+    fixed = {
+        'animals': reconcile(Animal, Review.objects.filter(animal=OuterRef('pk'))),
+        'ngos': reconcile(NGO, Review.objects.filter(animal__ngo=OuterRef('pk'))),
+    }
+    if fixed['animals']:
+        invalidate(Animal)
+    if fixed['ngos']:
+        invalidate(NGO)
+    return fixed
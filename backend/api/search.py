@@ -0,0 +1,108 @@
+import re
+
+from django.db import connections
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+# Tabela FTS5 -> (tabela de conteúdo, colunas indexadas). Mesma definição da
+# migração 0003_fulltext_search.
+FTS_TABLES = {
+    'api_animal_fts': ('api_animal', ['name', 'breed', 'description']),
+    'api_ngo_fts': ('api_ngo', ['name', 'city', 'email']),
+}
+
+
+def fts_trigger_sql(fts_table, table, columns):
+    cols = ', '.join(columns)
+    new_cols = ', '.join(f'new.{c}' for c in columns)
+    old_cols = ', '.join(f'old.{c}' for c in columns)
+    return {
+        f'{fts_table}_ai': (
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.id, {new_cols}); END"
+        ),
+        f'{fts_table}_ad': (
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); END"
+        ),
+        f'{fts_table}_au': (
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); "
+            f"INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.id, {new_cols}); END"
+        ),
+    }
+
+
+def ensure_fts_triggers(using='default', **kwargs):
+    """
+    Recria as triggers de sincronização que estiverem faltando e reconstrói o
+    índice correspondente. Necessário porque o SQLite não tem ALTER TABLE
+    completo: migrações que alteram api_animal/api_ngo recriam a tabela e as
+    triggers somem junto com a tabela antiga. Ligado ao post_migrate.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = {row[0] for row in cursor.fetchall()}
+        for fts_table, (table, columns) in FTS_TABLES.items():
+            if fts_table not in existing:
+                continue
+            triggers = fts_trigger_sql(fts_table, table, columns)
+            if existing.issuperset(triggers):
+                continue
+            for sql in triggers.values():
+                cursor.execute(sql)
+            cursor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+
+# Termos de busca: sequências de letras/dígitos em qualquer alfabeto.
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def build_match_query(search):
+    """
+    Converte o texto digitado pelo usuário numa expressão MATCH do FTS5.
+
+    Cada termo vira um prefixo entre aspas ("gato"*), o que evita erros de
+    sintaxe com operadores do FTS5 e cobre as palavras que começam com ele,
+    como os plurais regulares (gato/gatos), mas não flexões que mudam o
+    final (gato não encontra gata). Todos os termos precisam aparecer (AND).
+    """
+    terms = TERM_RE.findall(search or '')
+    return ' '.join('"%s"*' % term for term in terms)
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    Busca textual via índice FTS5 do SQLite, ordenada por relevância (BM25).
+    O rank é uma anotação, então a paginação por cursor o usa como chave.
+
+    A view informa a tabela virtual em `search_fts_table` e, opcionalmente, o
+    peso de cada coluna em `search_fts_weights`. Em bancos sem FTS5 (ex.:
+    PostgreSQL) cai no SearchFilter padrão sobre `search_fields`.
+    """
+    rank_alias = 'search_rank'
+
+    def filter_queryset(self, request, queryset, view):
+        fts_table = getattr(view, 'search_fts_table', None)
+        if not fts_table or connections[queryset.db].vendor != 'sqlite':
+            return super().filter_queryset(request, queryset, view)
+
+        match = build_match_query(request.query_params.get(self.search_param, ''))
+        if not match:
+            return queryset
+
+        weights = getattr(view, 'search_fts_weights', ())
+        bm25_args = ''.join(', %s' % float(w) for w in weights)
+        table = queryset.model._meta.db_table
+        pk = queryset.model._meta.pk.column
+        return queryset.extra(
+            tables=[fts_table],
+            where=[f'{fts_table}.rowid = {table}.{pk}', f'{fts_table} MATCH %s'],
+            params=[match],
+        ).annotate(**{
+            self.rank_alias: RawSQL(f'bm25({fts_table}{bm25_args})', (), output_field=FloatField()),
+        }).order_by(self.rank_alias, 'pk')
@@ -0,0 +1,135 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .cache import invalidate
+from .geo import encode_geohash, geocode_city
+from .models import NGO, Animal, Adoption, Review
+from .ratings import reconcile_all
+from .stats import build_stats
+
+CITIES = ['Recife', 'Olinda', 'São Paulo', 'Rio de Janeiro', 'Belo Horizonte', 'Salvador', 'Fortaleza',
+          'Curitiba', 'Porto Alegre', 'Manaus', 'Belém', 'Goiânia', 'Campinas', 'Natal', 'Florianópolis']
+NGO_WORDS = ['Patas', 'Focinhos', 'Amigos', 'Lar', 'Abrigo', 'Resgate', 'Vira-latas', 'Bichos', 'Esperança']
+FIRST_NAMES = ['Ana', 'Bruno', 'Carla', 'Diego', 'Elisa', 'Fábio', 'Gabriela', 'Heitor', 'Isabela', 'João',
+               'Larissa', 'Marcos', 'Natália', 'Otávio', 'Paula', 'Rafael', 'Sofia', 'Tiago', 'Vitória']
+LAST_NAMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Pereira', 'Costa', 'Almeida', 'Ribeiro']
+PET_NAMES = ['Thor', 'Mel', 'Luna', 'Bob', 'Nina', 'Pipoca', 'Fred', 'Amora', 'Paçoca', 'Bidu', 'Belinha',
+             'Tobias', 'Frida', 'Chico', 'Jade', 'Pretinha', 'Zeca', 'Lola', 'Simba', 'Mia']
+BREEDS = {
+    'dog': ['SRD', 'Labrador', 'Poodle', 'Pinscher', 'Beagle', 'Shih Tzu', 'Pastor Alemão'],
+    'cat': ['SRD', 'Siamês', 'Persa', 'Angorá', 'Maine Coon'],
+    'other': ['Coelho', 'Calopsita', 'Hamster', 'Porquinho-da-índia'],
+}
+TRAITS = ['dócil', 'brincalhão', 'calmo', 'carinhoso', 'tímido', 'curioso', 'vacinado', 'castrado',
+          'sociável com crianças', 'acostumado com outros animais', 'resgatado da rua', 'cheio de energia']
+COMMENTS = ['Adaptou-se muito bem em casa.', 'Processo de adoção rápido e atencioso.',
+            'Companheiro incrível, recomendo a ONG.', 'Precisou de paciência nas primeiras semanas.',
+            'A família toda se apaixonou.', 'Chegou vacinado e saudável.']
+# Distribuição aproximada dos status num catálogo em produção
+STATUS_WEIGHTS = {'pending': 30, 'approved': 10, 'rejected': 25, 'cancelled': 10, 'completed': 25}
+
+
+def seed(ngos=10, animals=500, users=200, adoptions=800, reviews=300, batch_size=1000,
+         random_seed=None, password=None):
+    """
+    Gera um catálogo sintético com `bulk_create`, numa transação.
+
+    As adoções cobrem todos os STATUS_CHOICES respeitando as restrições do
+    model (uma aprovada/concluída por animal, uma pendente por usuário e
+    animal); animais adotados ficam indisponíveis e as avaliações vêm de
+    quem os adotou, então `reviews` é limitado pelas adoções concluídas ou
+    aprovadas. Como bulk_create não dispara sinais, agregados de avaliação,
+    estatísticas das ONGs e o cache de respostas são acertados no fim.
+
+    Devolve {model: linhas criadas}.
+    """
+    rng = random.Random(random_seed)
+    now = timezone.now()
+    # Usuários novos nunca colidem com os existentes
+    first_user = (User.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+    password = make_password(password)
+
+    with transaction.atomic():
+        ngo_rows = []
+        for i in range(ngos):
+            city = rng.choice(CITIES)
+            # bulk_create não passa por NGO.save(): localiza aqui, espalhando as ONGs pela cidade
+            latitude, longitude = geocode_city(city)
+            latitude, longitude = latitude + rng.uniform(-0.05, 0.05), longitude + rng.uniform(-0.05, 0.05)
+            ngo_rows.append(NGO(
+                name=f'{rng.choice(NGO_WORDS)} {rng.choice(NGO_WORDS)} {i + 1}',
+                city=city, email=f'contato{i + 1}@ong{rng.randrange(10 ** 6)}.org.br',
+                phone=f'(81) 9{rng.randrange(10 ** 8):08d}',
+                description=f'ONG dedicada ao resgate de animais em {city}.',
+                latitude=latitude, longitude=longitude, geohash=encode_geohash(latitude, longitude),
+            ))
+        NGO.objects.bulk_create(ngo_rows, batch_size=batch_size)
+
+        animal_rows = []
+        for i in range(animals if ngo_rows else 0):
+            animal_type = rng.choices(['dog', 'cat', 'other'], weights=[55, 35, 10])[0]
+            animal_rows.append(Animal(
+                name=rng.choice(PET_NAMES), type=animal_type, breed=rng.choice(BREEDS[animal_type]),
+                age=rng.randint(1, 180), size=rng.choice(['small', 'medium', 'large']),
+                gender=rng.choice(['male', 'female']), ngo=rng.choice(ngo_rows),
+                description=f"Muito {', '.join(rng.sample(TRAITS, 3))}. Procura um lar responsável.",
+            ))
+
+        user_rows = User.objects.bulk_create([
+            User(
+                username=f'{first.lower()}.{last.lower()}.{first_user + i}', first_name=first, last_name=last,
+                email=f'{first.lower()}.{first_user + i}@example.com', password=password,
+            )
+            for i, (first, last) in enumerate(
+                (rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)) for _ in range(users)
+            )
+        ], batch_size=batch_size)
+
+        adoption_rows = []
+        adopted = {}
+        pending = set()
+        statuses = list(STATUS_WEIGHTS)
+        weights = list(STATUS_WEIGHTS.values())
+        for _ in range(adoptions if animal_rows and user_rows else 0):
+            user, index = rng.choice(user_rows), rng.randrange(len(animal_rows))
+            status = rng.choices(statuses, weights=weights)[0]
+            if status in Adoption.ADOPTED_STATUSES and index in adopted:
+                status = 'rejected'
+            elif status == 'pending' and (user.pk, index) in pending:
+                status = 'cancelled'
+            approval_date = None
+            if status in Adoption.ADOPTED_STATUSES:
+                adopted[index] = user
+                animal_rows[index].is_available = False
+                approval_date = now + timedelta(hours=rng.randint(1, 24 * 30))
+            elif status == 'pending':
+                pending.add((user.pk, index))
+            adoption_rows.append(Adoption(
+                user=user, animal=animal_rows[index], status=status, approval_date=approval_date,
+            ))
+
+        Animal.objects.bulk_create(animal_rows, batch_size=batch_size)
+        Adoption.objects.bulk_create(adoption_rows, batch_size=batch_size)
+
+        review_rows = Review.objects.bulk_create([
+            Review(user=user, animal=animal_rows[index], comment=rng.choice(COMMENTS),
+                   rating=rng.choices([1, 2, 3, 4, 5], weights=[3, 5, 12, 35, 45])[0])
+            for index, user in rng.sample(list(adopted.items()), min(reviews, len(adopted)))
+        ], batch_size=batch_size)
+
+        # bulk_create não dispara post_save
+        reconcile_all()
+        build_stats(ngo.pk for ngo in ngo_rows)
+        for model in (NGO, Animal, Adoption, Review):
+            invalidate(model)
+
+    return {
+        NGO: len(ngo_rows), Animal: len(animal_rows), User: len(user_rows),
+        Adoption: len(adoption_rows), Review: len(review_rows),
+    }
@@ -1,50 +1,141 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth.models import User
 from .models import NGO, Animal, Adoption, Review
+from .geo import parse_point
+from .images import build_srcset, variant_url
+from .sparse import SparseFieldsMixin
+from .timing import TimedSerializerMixin
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name']
         read_only_fields = ['id']
 
-class NGOSerializer(serializers.ModelSerializer):
+class NGOSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = NGO
         fields = '__all__'
 
-class AnimalSerializer(serializers.ModelSerializer):
+class AnimalSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     ngo_name = serializers.ReadOnlyField(source='ngo.name')
+    photo_variants = serializers.SerializerMethodField()
+    # Rótulos acrescentados por to_representation (campo -> "<campo>_display")
+    display_fields = ['type', 'size', 'gender']
+    # Colunas que cada SerializerMethodField lê, para o caminho rápido (api/fastpath.py)
+    method_field_sources = {'photo_variants': ['photo_variants']}
     
     class Meta:
         model = Animal
         fields = '__all__'
         extra_kwargs = {
-            'is_available': {'read_only': True}
+            'is_available': {'read_only': True},
+            # O banco tem CHECK (age >= 0); sem isso a violação vira erro 500
+            'age': {'min_value': 0},
         }
     
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        representation['type_display'] = instance.get_type_display()
-        representation['size_display'] = instance.get_size_display()
-        representation['gender_display'] = instance.get_gender_display()
+        for name in self.display_fields:
+            representation[f'{name}_display'] = getattr(instance, f'get_{name}_display')()
         return representation
+    
+    def get_photo_variants(self, instance):
+        """
+        URLs das variações da foto por formato e largura, mais o srcset pronto:
+        {"webp": {"160": url, ...}, "jpeg": {...}, "srcset": {"webp": "...", ...}}
+        """
+        request = self.context.get('request')
+        variants = {}
+        for fmt, paths in instance.photo_variants.items():
+            if fmt == 'source':
+                continue
+            urls = {width: variant_url(path) for width, path in paths.items()}
+            if request is not None:
+                urls = {width: request.build_absolute_uri(url) for width, url in urls.items()}
+            variants[fmt] = urls
+        if variants:
+            variants['srcset'] = {fmt: build_srcset(urls) for fmt, urls in variants.items()}
+        return variants
 
-class AdoptionSerializer(serializers.ModelSerializer):
+class AdoptionSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     user_details = UserSerializer(source='user', read_only=True)
     animal_details = AnimalSerializer(source='animal', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
     
     class Meta:
         model = Adoption
         fields = '__all__'
-        read_only_fields = ['adoption_date', 'updated_at']
+        # O status só muda pelas transições de update_status/batch_status
+        read_only_fields = ['adoption_date', 'updated_at', 'status']
+        expandable_fields = {'user_details': 'user', 'animal_details': 'animal__ngo'}
     
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        representation['status_display'] = instance.get_status_display()
-        return representation
+    def get_extra_kwargs(self):
+        # Trocar o animal de uma adoção aprovada deixaria os dois indisponíveis
+        extra_kwargs = super().get_extra_kwargs()
+        if self.instance is not None:
+            for field in ('animal', 'user'):
+                extra_kwargs.setdefault(field, {})['read_only'] = True
+        return extra_kwargs
+    
+    def validate(self, data):
+        user = data.get('user', getattr(self.instance, 'user', None))
+        animal = data.get('animal', getattr(self.instance, 'animal', None))
+        pending = Adoption.objects.filter(user=user, animal=animal, status='pending')
+        if self.instance is not None:
+            pending = pending.exclude(pk=self.instance.pk)
+        if pending.exists():
+            raise serializers.ValidationError("Já existe uma solicitação pendente para este animal.")
+        return data
+
+class AdoptionStatusChangeSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=Adoption.STATUS_CHOICES)
+
+class AdoptionBatchStatusSerializer(serializers.Serializer):
+    changes = AdoptionStatusChangeSerializer(many=True, allow_empty=False)
+    reject_competing = serializers.BooleanField(default=True)
+    
+    def validate_changes(self, changes):
+        ids = [change['id'] for change in changes]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError("Cada adoção só pode aparecer uma vez no lote.")
+        return changes
+
+class ChoiceListField(serializers.ListField):
+    """Lista de opções repetindo o parâmetro (?size=small&size=medium) ou separadas por vírgula"""
+    
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            data = [data]
+        return super().to_internal_value([item for value in data for item in str(value).split(',') if item])
+
+class MatchPreferencesSerializer(serializers.Serializer):
+    """Perfil do adotante para /api/animals/matches/ (api/matching.py)"""
+    type = ChoiceListField(child=serializers.ChoiceField(choices=Animal.ANIMAL_TYPES), required=False)
+    size = ChoiceListField(child=serializers.ChoiceField(choices=Animal.SIZE_CHOICES), required=False)
+    gender = ChoiceListField(child=serializers.ChoiceField(choices=Animal._meta.get_field('gender').choices),
+                             required=False)
+    age_min = serializers.IntegerField(min_value=0, required=False)
+    age_max = serializers.IntegerField(min_value=0, required=False)
+    near = serializers.CharField(required=False)
+    radius = serializers.FloatField(min_value=0.1, max_value=settings.GEO_MAX_RADIUS_KM,
+                                    default=settings.GEO_DEFAULT_RADIUS_KM)
+    limit = serializers.IntegerField(min_value=1, max_value=settings.MATCHING_MAX_RESULTS, default=20)
+    
+    def validate_near(self, value):
+        try:
+            return parse_point(value)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+    
+    def validate(self, data):
+        if data.get('age_min', 0) > data.get('age_max', float('inf')):
+            raise serializers.ValidationError({'age_max': 'Deve ser maior ou igual a age_min.'})
+        return data
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     user_details = UserSerializer(source='user', read_only=True)
     animal_details = AnimalSerializer(source='animal', read_only=True)
     
@@ -52,6 +143,7 @@ class ReviewSerializer(serializers.ModelSerializer):
         model = Review
         fields = '__all__'
         read_only_fields = ['created_at']
+        expandable_fields = {'user_details': 'user', 'animal_details': 'animal__ngo'}
         
     def validate(self, data):
         """
@@ -0,0 +1,93 @@
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+from .cache import invalidate
+from .databases import apply_sqlite_pragmas
+from .images import schedule_photo_processing
+from .ratings import review_deleted, review_saved
+from .stats import adoption_deleted, adoption_saved, animal_deleted, animal_saved
+from .tasks import adoption_status_changed, release_animal
+from .timing import install_sql_timer
+from .models import NGO, Animal, Adoption, Review
+
+
+@receiver([post_save, post_delete], sender=NGO)
+@receiver([post_save, post_delete], sender=Animal)
+@receiver([post_save, post_delete], sender=Adoption)
+@receiver([post_save, post_delete], sender=Review)
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_responses(sender, **kwargs):
+    invalidate(sender)
+
+
+@receiver(post_save, sender=Animal)
+def process_animal_photo(sender, instance, **kwargs):
+    schedule_photo_processing(instance)
+
+
+@receiver(post_delete, sender=Token)
+def evict_deleted_token(sender, instance, **kwargs):
+    token_cache.invalidate(instance.key)
+
+
+@receiver([post_save, post_delete], sender=User)
+def evict_user_tokens(sender, instance, **kwargs):
+    # Desativação, troca de dados ou remoção: o próximo acesso relê do banco
+    token_cache.invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=Review)
+def update_rating_aggregates_on_save(sender, instance, created, **kwargs):
+    review_saved(instance, created)
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_aggregates_on_delete(sender, instance, **kwargs):
+    review_deleted(instance)
+
+
+@receiver(post_save, sender=Animal)
+def update_ngo_stats_on_animal_save(sender, instance, created, **kwargs):
+    animal_saved(instance, created)
+
+
+@receiver(post_delete, sender=Animal)
+def update_ngo_stats_on_animal_delete(sender, instance, **kwargs):
+    animal_deleted(instance)
+
+
+@receiver(post_save, sender=Adoption)
+def update_ngo_stats_on_adoption_save(sender, instance, created, **kwargs):
+    adoption_saved(instance, created)
+
+
+@receiver(post_save, sender=Adoption)
+def enqueue_adoption_followup(sender, instance, created, raw=False, **kwargs):
+    # Avisos e disponibilidade saem da requisição: vão para a fila (api/tasks.py)
+    previous = None if created else (instance.stored_values() or {}).get('status')
+    if not raw and (created or previous != instance.status):
+        adoption_status_changed(instance, previous)
+
+
+@receiver(post_delete, sender=Adoption)
+def update_ngo_stats_on_adoption_delete(sender, instance, **kwargs):
+    adoption_deleted(instance)
+
+
+@receiver(post_delete, sender=Adoption)
+def enqueue_adoption_release(sender, instance, **kwargs):
+    release_animal(instance)
+
+
+@receiver(connection_created)
+def time_sql_queries(sender, connection, **kwargs):
+    install_sql_timer(connection)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    apply_sqlite_pragmas(connection)
@@ -0,0 +1,88 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def field_list(request, param):
+    """`?fields=a,b&fields=c` -> {'a', 'b', 'c'}; None se o parâmetro não veio"""
+    values = request.query_params.getlist(param)
+    if not values:
+        return None
+    return {name.strip() for value in values for name in value.split(',') if name.strip()}
+
+
+class SparseFieldsMixin:
+    """
+    Campos sob demanda para um ModelSerializer.
+
+    Os aninhados de `Meta.expandable_fields` ({campo: select_related}) ficam
+    fora da resposta, a menos que venham em `?expand=` (ou em `?fields=`);
+    `?fields=` restringe os demais campos aos listados. Só o serializer de
+    topo com request no contexto é afetado: usado sem request (shell,
+    comandos) ele sai completo. Nas escritas `?fields=` é ignorado, porque
+    a validação precisa de todos os campos do corpo.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None:
+            return
+        fields = field_list(request, FIELDS_PARAM) if request.method in SAFE_METHODS else None
+        expand = (field_list(request, EXPAND_PARAM) or set()) | (fields or set())
+        for name in list(self.fields):
+            if name in self.Meta.expandable_fields:
+                keep = name in expand
+            else:
+                keep = fields is None or name in fields or name == self.Meta.model._meta.pk.name
+            if not keep:
+                self.fields.pop(name)
+
+
+def model_column(model, source):
+    """Campo concreto do model por trás de `source`, ou None se não houver um"""
+    name = source.split('.')[0]
+    if name.startswith('get_') and name.endswith('_display'):
+        name = name[len('get_'):-len('_display')]
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    return name if field.concrete else None
+
+
+def sparse_queryset(queryset, serializer_class, context):
+    """
+    Restringe `queryset` às colunas e joins que o serializer, já podado pela
+    requisição, vai ler: `.only()` nas colunas e `select_related` apenas dos
+    aninhados expandidos.
+    """
+    serializer = serializer_class(context=context)
+    model = queryset.model
+    expandable = serializer.Meta.expandable_fields
+    columns = {model._meta.pk.name}
+    joins = []
+    for name, field in serializer.fields.items():
+        if name in expandable:
+            joins.append(expandable[name])
+        column = model_column(model, field.source)
+        if column is None:
+            # Campo calculado fora do model: não dá para saber o que ele lê
+            return queryset
+        columns.add(column)
+    queryset = queryset.select_related(None).only(*columns)
+    # select_related() sem argumentos seguiria todas as chaves estrangeiras
+    return queryset.select_related(*joins) if joins else queryset
+
+
+class SparseFieldsViewMixin:
+    """Aplica `sparse_queryset` nas actions de leitura do viewset"""
+    sparse_actions = ('list', 'retrieve')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in self.sparse_actions:
+            return queryset
+        return sparse_queryset(queryset, self.get_serializer_class(), self.get_serializer_context())
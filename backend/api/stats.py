@@ -0,0 +1,229 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import NGO, Animal, Adoption, NGOStat
+
+# Métricas guardadas em NGOStat. BUILT marca que a ONG já foi materializada:
+# sem ele, as contagens (mesmo as zeradas) ainda não existem na tabela.
+AVAILABLE_BY_TYPE = 'available_type'
+AVAILABLE_BY_SIZE = 'available_size'
+ADOPTIONS_BY_STATUS = 'adoption_status'
+APPROVAL_HOURS = 'approval_hours'
+BUILT = '_built'
+
+
+def approval_hours(adoption_date, approval_date):
+    return max(int((approval_date - adoption_date).total_seconds() // 3600), 0)
+
+
+def animal_contributions(ngo_id, animal_type, size, is_available):
+    if ngo_id is None or not is_available:
+        return []
+    return [(ngo_id, AVAILABLE_BY_TYPE, animal_type), (ngo_id, AVAILABLE_BY_SIZE, size)]
+
+
+def adoption_contributions(ngo_id, status, adoption_date, approval_date):
+    if ngo_id is None:
+        return []
+    keys = [(ngo_id, ADOPTIONS_BY_STATUS, status)]
+    if approval_date is not None and adoption_date is not None:
+        keys.append((ngo_id, APPROVAL_HOURS, str(approval_hours(adoption_date, approval_date))))
+    return keys
+
+
+def compute_stats(ngo_ids):
+    """
+    Calcula do zero as contagens das ONGs: {ngo_id: Counter({(métrica, chave): valor})}.
+
+    São três consultas, não um único agregado: animais disponíveis por
+    tipo/porte e adoções por status vêm agrupados, mas as horas até a
+    aprovação dependem de duas datas por linha e são contadas em Python.
+    Só roda na primeira leitura de cada ONG e em `rebuild_all_stats`; o
+    dia a dia são os deltas de `apply_stat_deltas`.
+    """
+    stats = {ngo_id: Counter() for ngo_id in ngo_ids}
+
+    animals = (Animal.objects.filter(ngo__in=ngo_ids, is_available=True)
+               .values('ngo', 'type', 'size').annotate(n=Count('pk')).order_by())
+    for row in animals:
+        for ngo_id, metric, key in animal_contributions(row['ngo'], row['type'], row['size'], True):
+            stats[ngo_id][metric, key] += row['n']
+
+    adoptions = (Adoption.objects.filter(animal__ngo__in=ngo_ids)
+                 .values('animal__ngo', 'status').annotate(n=Count('pk')).order_by())
+    for row in adoptions:
+        stats[row['animal__ngo']][ADOPTIONS_BY_STATUS, row['status']] += row['n']
+
+    approved = (Adoption.objects.filter(animal__ngo__in=ngo_ids, approval_date__isnull=False)
+                .values_list('animal__ngo', 'adoption_date', 'approval_date'))
+    for ngo_id, adoption_date, approval_date in approved:
+        stats[ngo_id][APPROVAL_HOURS, str(approval_hours(adoption_date, approval_date))] += 1
+    return stats
+
+
+def build_stats(ngo_ids):
+    """Recalcula e regrava as linhas de NGOStat das ONGs"""
+    ngo_ids = list(ngo_ids)
+    stats = compute_stats(ngo_ids)
+    with transaction.atomic():
+        NGOStat.objects.filter(ngo__in=ngo_ids).delete()
+        NGOStat.objects.bulk_create([
+            NGOStat(ngo_id=ngo_id, metric=metric, key=key, value=value)
+            for ngo_id, counts in stats.items()
+            for (metric, key), value in counts.items() if value
+        ] + [NGOStat(ngo_id=ngo_id, metric=BUILT, key='', value=1) for ngo_id in ngo_ids])
+    return stats
+
+
+def rebuild_all_stats(batch_size=500):
+    ngo_ids = list(NGO.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(ngo_ids), batch_size):
+        build_stats(ngo_ids[start:start + batch_size])
+    return len(ngo_ids)
+
+
+def apply_stat_deltas(deltas):
+    """
+    Soma `deltas` ({(ngo_id, métrica, chave): delta}) nas linhas de NGOStat com
+    UPDATEs de F(), como em api/ratings.py. ONGs ainda não materializadas são
+    ignoradas: a primeira leitura as calcula por inteiro. Linha que ainda não
+    existe é criada zerada com ON CONFLICT DO NOTHING antes da soma, então
+    duas escritas simultâneas na mesma chave não esbarram no unique_together.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    built = set(NGOStat.objects.filter(
+        ngo__in={ngo_id for ngo_id, _, _ in deltas}, metric=BUILT,
+    ).values_list('ngo_id', flat=True))
+    for (ngo_id, metric, key), delta in deltas.items():
+        if ngo_id not in built:
+            continue
+        row = NGOStat.objects.filter(ngo_id=ngo_id, metric=metric, key=key)
+        if not row.update(value=F('value') + delta):
+            NGOStat.objects.bulk_create([NGOStat(ngo_id=ngo_id, metric=metric, key=key, value=0)],
+                                        ignore_conflicts=True)
+            row.update(value=F('value') + delta)
+
+
+def diff(old_keys, new_keys):
+    deltas = Counter(new_keys)
+    deltas.subtract(old_keys)
+    return deltas
+
+
+def animal_saved(instance, created):
+    stored = instance.stored_values()
+    new = animal_contributions(instance.ngo_id, instance.type, instance.size, instance.is_available)
+    if created:
+        apply_stat_deltas(diff([], new))
+        return
+    if not stored:
+        # Instância montada à mão: sem os valores anteriores, recalcula
+        build_stats([instance.ngo_id])
+        return
+    old = animal_contributions(stored['ngo_id'], stored['type'], stored['size'], stored['is_available'])
+    deltas = diff(old, new)
+    if stored['ngo_id'] != instance.ngo_id:
+        # As adoções do animal passam a contar para a nova ONG
+        for status, adoption_date, approval_date in instance.adoptions.values_list(
+                'status', 'adoption_date', 'approval_date'):
+            deltas.subtract(adoption_contributions(stored['ngo_id'], status, adoption_date, approval_date))
+            deltas.update(adoption_contributions(instance.ngo_id, status, adoption_date, approval_date))
+    apply_stat_deltas(deltas)
+
+
+def animal_deleted(instance):
+    stored = instance.stored_values() or {
+        'ngo_id': instance.ngo_id, 'type': instance.type, 'size': instance.size, 'is_available': instance.is_available,
+    }
+    old = animal_contributions(stored['ngo_id'], stored['type'], stored['size'], stored['is_available'])
+    apply_stat_deltas(diff(old, []))
+
+
+def ngo_of(animal_id):
+    return Animal.objects.filter(pk=animal_id).values_list('ngo_id', flat=True).first()
+
+
+def adoption_saved(instance, created):
+    stored = instance.stored_values()
+    ngo_id = instance.animal.ngo_id
+    new = adoption_contributions(ngo_id, instance.status, instance.adoption_date, instance.approval_date)
+    if created:
+        apply_stat_deltas(diff([], new))
+        return
+    if not stored:
+        build_stats([ngo_id])
+        return
+    old_ngo_id = ngo_id if stored['animal_id'] == instance.animal_id else ngo_of(stored['animal_id'])
+    old = adoption_contributions(old_ngo_id, stored['status'], instance.adoption_date, stored['approval_date'])
+    apply_stat_deltas(diff(old, new))
+
+
+def adoption_deleted(instance):
+    stored = instance.stored_values() or {
+        'animal_id': instance.animal_id, 'status': instance.status, 'approval_date': instance.approval_date,
+    }
+    old = adoption_contributions(
+        ngo_of(stored['animal_id']), stored['status'], instance.adoption_date, stored['approval_date'],
+    )
+    apply_stat_deltas(diff(old, []))
+
+
+def animals_created(animals):
+    """Para o bulk_create da importação, que não dispara post_save"""
+    deltas = Counter()
+    for animal in animals:
+        deltas.update(animal_contributions(animal.ngo_id, animal.type, animal.size, animal.is_available))
+    apply_stat_deltas(deltas)
+
+
+def median_from_histogram(histogram):
+    """Mediana de {valor: ocorrências}; média dos dois centrais se o total for par"""
+    total = sum(histogram.values())
+    if not total:
+        return None
+    middle = [(total - 1) // 2, total // 2]
+    found = []
+    seen = 0
+    for value, count in sorted(histogram.items()):
+        while middle and middle[0] < seen + count:
+            found.append(value)
+            middle.pop(0)
+        seen += count
+    return sum(found) / len(found)
+
+
+def ngo_stats(ngo):
+    """
+    Estatísticas da ONG lidas da tabela de resumo numa única consulta; se a
+    ONG ainda não foi materializada, calcula e grava na hora. A mediana até
+    a aprovação sai do histograma em horas inteiras (truncadas), não das
+    datas exatas: erra por menos de uma hora.
+    """
+    rows = NGOStat.objects.filter(ngo=ngo).values_list('metric', 'key', 'value')
+    counts = {(metric, key): value for metric, key, value in rows}
+    if (BUILT, '') not in counts:
+        counts = build_stats([ngo.pk])[ngo.pk]
+
+    def group(metric):
+        return {key: value for (name, key), value in sorted(counts.items()) if name == metric and value}
+
+    by_type = group(AVAILABLE_BY_TYPE)
+    by_status = group(ADOPTIONS_BY_STATUS)
+    hours = {int(key): value for key, value in group(APPROVAL_HOURS).items()}
+    return {
+        'ngo': ngo.pk,
+        'available_animals': {
+            'total': sum(by_type.values()),
+            'by_type': by_type,
+            'by_size': group(AVAILABLE_BY_SIZE),
+        },
+        'adoptions': {
+            'total': sum(by_status.values()),
+            'by_status': by_status,
+        },
+        'median_approval_hours': median_from_histogram(hours),
+    }
@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .adoptions import set_availability
+from .jobs import enqueue, task
+from .models import Animal, Adoption
+
+ADOPTION_STATUS_CHANGED = 'adoption.status_changed'
+ANIMAL_AVAILABILITY = 'animal.sync_availability'
+
+
+def adoption_status_changed(adoption, previous):
+    """Enfileira o que vem depois de uma adoção criada ou com novo status (api/signals.py)"""
+    enqueue(ADOPTION_STATUS_CHANGED, {
+        'adoption_id': adoption.pk, 'status': adoption.status, 'previous': previous,
+    })
+
+
+def release_animal(adoption):
+    """Uma adoção aprovada ou concluída excluída devolve o animal (api/signals.py)"""
+    if adoption.status in Adoption.ADOPTED_STATUSES:
+        enqueue(ANIMAL_AVAILABILITY, {'animal_id': adoption.animal_id})
+
+
+@task(ADOPTION_STATUS_CHANGED)
+def handle_adoption_status_changed(adoption_id, status, previous):
+    adoption = Adoption.objects.select_related('user', 'animal__ngo').filter(pk=adoption_id).first()
+    if adoption is None:
+        return
+    sync_availability(adoption.animal_id)
+    notify_adoption(adoption, status, previous)
+
+
+@task(ANIMAL_AVAILABILITY)
+def sync_availability(animal_id):
+    """
+    A API já acerta a disponibilidade na própria transação; isto cobre o
+    admin e o shell, em que cancelar uma aprovação não devolvia o animal,
+    e a exclusão de uma adoção aprovada (release_animal).
+    Decide pelas adoções no banco, não pelo status do payload: o pool e as
+    novas tentativas podem rodar uma aprovação antiga depois do
+    cancelamento. Idempotente: sem mudança, não escreve.
+    """
+    with transaction.atomic():
+        animal = Animal.objects.select_for_update().filter(pk=animal_id).first()
+        if animal is None:
+            return
+        adopted = Adoption.objects.filter(animal=animal, status__in=Adoption.ADOPTED_STATUSES).exists()
+        set_availability(animal, not adopted, timezone.now())
+
+
+def notify_adoption(adoption, status, previous):
+    """E-mail para quem pediu a adoção e para a ONG"""
+    animal, ngo, user = adoption.animal, adoption.animal.ngo, adoption.user
+    label = dict(Adoption.STATUS_CHOICES)[status]
+    messages = []
+    if previous is None:
+        subject = f'Nova solicitação de adoção: {animal.name}'
+        body = f'{user.get_full_name() or user.username} quer adotar {animal.name}.'
+        messages.append((subject, body, ngo.email))
+    else:
+        subject = f'Adoção de {animal.name}: {label}'
+        messages.append((subject, f'Sua solicitação para adotar {animal.name} agora está: {label}.', user.email))
+        messages.append((subject, f'A adoção de {animal.name} por {user.username} agora está: {label}.',
+                         ngo.email))
+    # Uma conexão SMTP para todas; falha sobe para o worker tentar de novo
+    get_connection(fail_silently=False).send_messages([
+        EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [to])
+        for subject, body, to in messages if to
+    ])
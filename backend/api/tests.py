@@ -1,3 +1,1603 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models import F, QuerySet
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .adoptions import TransitionError, set_status
+from .geo import encode_geohash, haversine_km
+from .authentication import token_cache
+from .databases import PrimaryReplicaRouter, is_pinned
+from .jobs import TASKS, claim, enqueue, execute, run_pending
+from . import matching
+from .models import NGO, Animal, Adoption, Job, NGOStat, Review
+from .pagination import HybridPagination
+from .renderers import ORJSONParser, ORJSONRenderer
+from .ratings import reconcile_all
+from .seed import seed
+from .stats import BUILT, apply_stat_deltas, compute_stats
+from .throttling import SlidingWindowThrottle
+from .timing import normalize_sql
+from .views import AnimalViewSet, NGOViewSet
+
+# Contadores dos limites no mesmo LocMemCache do 'default' (mesmo LOCATION), em vez dos
+# arquivos compartilhados: o cache.clear() de cada teste zera os dois
+shared_test_cache = override_settings(CACHES={name: settings.CACHES['default'] for name in ('default', 'throttle')})
+
+
+def setUpModule():
+    shared_test_cache.enable()
+
+
+def tearDownModule():
+    shared_test_cache.disable()
+
+
+class PetHavenTestCase(TestCase):
+    """Base com um pequeno catálogo: várias ONGs, animais, adoções e avaliações"""
+    ROWS = 8
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = []
+        cls.ngos = []
+        cls.animals = []
+        for i in range(cls.ROWS):
+            user = User.objects.create_user(f'user{i}', f'user{i}@example.com', 'senha-forte-123')
+            ngo = NGO.objects.create(name=f'ONG {i}', city='Recife' if i % 2 else 'Olinda',
+                                     email=f'ong{i}@example.com')
+            animal = Animal.objects.create(
+                name=f'Animal {i}', type=('dog', 'cat', 'other')[i % 3], breed='SRD', age=i + 1,
+                size=('small', 'medium', 'large')[i % 3], gender=('male', 'female')[i % 2],
+                description=f'Descrição do animal {i}', ngo=ngo,
+            )
+            cls.users.append(user)
+            cls.ngos.append(ngo)
+            cls.animals.append(animal)
+        cls.user = cls.users[0]
+        cls.ngo = cls.ngos[0]
+        for i, animal in enumerate(cls.animals):
+            Adoption.objects.create(user=cls.user, animal=animal, status='pending')
+            Adoption.objects.create(user=cls.users[(i + 1) % cls.ROWS], animal=cls.animals[0], status='rejected')
+            Review.objects.create(user=cls.users[i], animal=cls.animals[0], rating=i % 5 + 1,
+                                  comment=f'Comentário {i}')
+            if i:
+                Review.objects.create(user=cls.user, animal=animal, rating=5, comment='Ótimo')
+        for i in range(1, cls.ROWS):
+            Animal.objects.create(
+                name=f'Filhote {i}', type='dog', breed='SRD', age=2, gender='male',
+                description='Filhote', ngo=cls.ngo,
+            )
+
+    def setUp(self):
+        # O rollback entre testes não dispara sinais, então as gerações do
+        # cache de respostas não acompanham: cada teste começa com cache vazio.
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class QueryBudgetTests(PetHavenTestCase):
+    """Falha quando um endpoint passa do orçamento fixo de consultas (N+1)"""
+
+    # Cada orçamento é independente do número de linhas retornadas. ONGs,
+    # animais e adoções gastam uma consulta a mais no agregado do ETag.
+    BUDGETS = [
+        ('/api/users/', 2),
+        ('/api/ngos/', 3),
+        ('/api/animals/', 3),
+        ('/api/adoptions/', 3),
+        ('/api/reviews/', 2),
+        ('/api/users/{user}/', 1),
+        ('/api/users/{user}/adoptions/', 2),
+        ('/api/users/{user}/reviews/', 2),
+        ('/api/ngos/{ngo}/', 2),
+        ('/api/ngos/{ngo}/animals/', 2),
+        ('/api/animals/{animal}/', 2),
+        ('/api/animals/{animal}/adoptions/', 2),
+        ('/api/animals/{animal}/reviews/', 2),
+        ('/api/adoptions/{adoption}/', 2),
+        ('/api/reviews/{review}/', 1),
+    ]
+
+    def format_url(self, url):
+        return url.format(
+            user=self.user.pk, ngo=self.ngo.pk, animal=self.animals[0].pk,
+            adoption=Adoption.objects.first().pk, review=Review.objects.first().pk,
+        )
+
+    def assertMaxQueries(self, budget, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        self.assertLessEqual(
+            len(ctx.captured_queries), budget,
+            '%s: %d consultas (orçamento %d)\n%s' % (
+                url, len(ctx.captured_queries), budget,
+                '\n'.join(q['sql'] for q in ctx.captured_queries),
+            ),
+        )
+        return response
+
+    def test_endpoints_stay_within_budget(self):
+        for url, budget in self.BUDGETS:
+            url = self.format_url(url)
+            with self.subTest(url=url):
+                response = self.assertMaxQueries(budget, url)
+                data = response.json()
+                rows = data.get('results', data) if isinstance(data, dict) else data
+                if isinstance(rows, list):
+                    self.assertGreater(len(rows), 1, url)
+
+    def test_listings_use_indexes(self):
+        out = StringIO()
+        call_command('explain_queries', fail=True, stdout=out)
+        self.assertIn(' 0 com varredura completa', out.getvalue())
+
+
+class FullTextSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ngo = NGO.objects.create(name='Amigos dos Bichos', city='São Paulo', email='contato@amigos.org')
+        NGO.objects.create(name='Patas Unidas', city='Recife', email='patas@example.com')
+        cls.rex = Animal.objects.create(name='Rex', type='dog', breed='Pastor Alemão', age=24, gender='male',
+                                        description='Cão muito brincalhão', ngo=cls.ngo)
+        cls.mia = Animal.objects.create(name='Mia', type='cat', breed='Siamês', age=12, gender='female',
+                                        description='Gata calma que adora o Rex', ngo=cls.ngo)
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, url, term):
+        response = APIClient().get(url, {'search': term})
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in response.json()['results']]
+
+    def test_accent_folding_and_prefix(self):
+        self.assertEqual(self.search('/api/animals/', 'cao brincalhao'), ['Rex'])
+        self.assertEqual(self.search('/api/animals/', 'siames'), ['Mia'])
+        self.assertEqual(self.search('/api/animals/', 'gat'), ['Mia'])
+
+    def test_ranked_by_relevance(self):
+        # "Rex" no nome pesa mais que na descrição
+        self.assertEqual(self.search('/api/animals/', 'rex'), ['Rex', 'Mia'])
+
+    @mock.patch.object(HybridPagination, 'page_size', 1)
+    def test_cursor_pages_keep_relevance_order(self):
+        # O mais relevante tem o id maior: paginar pelo id inverteria a ordem
+        Animal.objects.filter(pk=self.rex.pk).update(name='Thor', description='Irmão do Rex')
+        Animal.objects.filter(pk=self.mia.pk).update(name='Rex')
+        client, url, names = APIClient(), '/api/animals/?search=rex&cursor=', []
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200, response.content)
+            names += [row['name'] for row in response.json()['results']]
+            url, previous = response.json()['next'], response.json()['previous']
+        self.assertEqual(names, ['Rex', 'Thor'])
+        self.assertEqual([row['name'] for row in client.get(previous).json()['results']], ['Rex'])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.rex.description = 'Tranquilo'
+        self.rex.save()
+        self.assertEqual(self.search('/api/animals/', 'brincalhao'), [])
+        self.mia.delete()
+        self.assertEqual(self.search('/api/animals/', 'rex'), ['Rex'])
+
+    def test_operators_are_treated_as_text(self):
+        self.assertEqual(self.search('/api/animals/', '"rex" OR (mia'), [])
+
+    def test_ngo_search(self):
+        self.assertEqual(self.search('/api/ngos/', 'sao paulo'), ['Amigos dos Bichos'])
+        self.assertEqual(self.search('/api/ngos/', 'example'), ['Patas Unidas'])
+
+
+class KeysetPaginationTests(PetHavenTestCase):
+
+    def walk(self, url, params):
+        names, pages = [], []
+        response = self.client.get(url, dict(params, cursor=''))
+        while True:
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertNotIn('count', data)
+            names += [row.get('name', row['id']) for row in data['results']]
+            pages.append(data)
+            if not data['next']:
+                return names, pages
+            response = self.client.get(data['next'])
+
+    def test_walks_every_row_in_order_with_id_tiebreaker(self):
+        for ordering in ['age', '-age', 'name', '-created_at', 'rating_average', '-rating_average', None]:
+            params = {'ordering': ordering} if ordering else {}
+            with self.subTest(ordering=ordering):
+                names, pages = self.walk('/api/animals/', params)
+                if not ordering:
+                    expected = Animal.objects.order_by('pk')
+                elif ordering.startswith('-'):
+                    expected = Animal.objects.order_by(F(ordering[1:]).desc(nulls_last=True), '-pk')
+                else:
+                    expected = Animal.objects.order_by(F(ordering).asc(nulls_first=True), 'pk')
+                self.assertEqual(names, list(expected.values_list('name', flat=True)))
+                self.assertEqual(len(pages), 2)
+                response = self.client.get(pages[-1]['previous'])
+                self.assertEqual([row['name'] for row in response.json()['results']], names[:10])
+
+    def test_previous_link_returns_the_previous_page(self):
+        names, pages = self.walk('/api/animals/', {'ordering': 'age'})
+        response = self.client.get(pages[-1]['previous'])
+        self.assertEqual([row['name'] for row in response.json()['results']], names[:10])
+
+    def test_deep_page_costs_one_query(self):
+        names, pages = self.walk('/api/adoptions/', {})
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(pages[0]['next'])
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/animals/', {'cursor': 'nao-e-um-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_page_number_mode_keeps_count(self):
+        data = self.client.get('/api/animals/', {'page': 2}).json()
+        self.assertEqual(data['count'], Animal.objects.count())
+        self.assertEqual(len(data['results']), Animal.objects.count() - 10)
+
+
+class ResponseCacheTests(PetHavenTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.anonymous = APIClient()
+
+    def get(self, url, **params):
+        response = self.anonymous.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_anonymous_reads_are_served_from_cache(self):
+        url = f'/api/animals/{self.animals[0].pk}/'
+        self.assertEqual(self.get(url)['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.json()['name'], 'Animal 0')
+
+    def test_query_string_is_normalized(self):
+        self.get('/api/animals/', type='dog', size='small')
+        response = self.anonymous.get('/api/animals/?size=small&type=dog')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(self.get('/api/animals/', type='cat')['X-Cache'], 'MISS')
+
+    def test_writes_invalidate_dependent_responses(self):
+        animal = self.animals[0]
+        ngo_animals = f'/api/ngos/{animal.ngo_id}/animals/'
+        self.get('/api/animals/')
+        self.get(ngo_animals)
+        self.get(f'/api/ngos/{animal.ngo_id}/')
+
+        animal.ngo.name = 'ONG Renomeada'
+        animal.ngo.save()
+        self.assertEqual(self.get('/api/animals/').json()['results'][0]['ngo_name'], 'ONG Renomeada')
+
+        self.get(f'/api/ngos/{animal.ngo_id}/')
+        Adoption.objects.create(user=self.users[3], animal=animal, status='approved')
+        self.assertFalse(next(row['is_available'] for row in self.get(ngo_animals).json()
+                              if row['id'] == animal.pk))
+        # A lista/detalhe de ONGs não depende de adoções
+        self.assertEqual(self.get(f'/api/ngos/{animal.ngo_id}/')['X-Cache'], 'HIT')
+
+        Review.objects.filter(animal=animal).first().delete()
+        self.assertEqual(self.get(ngo_animals)['X-Cache'], 'MISS')
+
+    def test_authenticated_requests_bypass_cache(self):
+        response = self.client.get('/api/animals/')
+        self.assertFalse(response.has_header('X-Cache'))
+
+    def test_stats(self):
+        self.get('/api/ngos/')
+        self.get('/api/ngos/')
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'senha-forte-123')
+        self.client.force_authenticate(admin)
+        stats = self.client.get('/api/metrics/cache/').json()['responses']
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_rate']), (1, 1, 0.5))
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/metrics/cache/').status_code, 403)
+
+
+class ConditionalGetTests(PetHavenTestCase):
+
+    def test_not_modified_skips_serialization(self):
+        url = f'/api/animals/{self.animals[0].pk}/'
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        self.assertTrue(response.has_header('Last-Modified'))
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_list_etag_tracks_row_set(self):
+        url = '/api/animals/'
+        etag = self.client.get(url, {'type': 'dog'})['ETag']
+        self.assertEqual(self.client.get(url, {'type': 'dog'}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Escritas que não tocam o conjunto invalidam o cache, mas mantêm o ETag
+        self.animals[1].save()
+        self.assertEqual(self.client.get(url, {'type': 'dog'}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertNotEqual(self.client.get(url, {'type': 'cat'})['ETag'], etag)
+
+        self.ngos[0].save()
+        self.assertEqual(self.client.get(url, {'type': 'dog'}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        etag = self.client.get(url, {'type': 'dog'})['ETag']
+        Animal.objects.filter(type='dog').last().delete()
+        response = self.client.get(url, {'type': 'dog'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_adoption_etag_follows_status_change(self):
+        adoption = Adoption.objects.filter(status='pending').first()
+        url = f'/api/adoptions/{adoption.pk}/'
+        etag = self.client.get(url)['ETag']
+        adoption.status = 'approved'
+        adoption.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_adoption_etag_follows_embedded_user(self):
+        adoption = Adoption.objects.filter(status='pending').first()
+        url = f'/api/adoptions/{adoption.pk}/?expand=user_details'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        adoption.user.email = 'novo@example.com'
+        adoption.user.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['user_details']['email'], 'novo@example.com')
+
+    def test_geocoding_changes_ngo_etag(self):
+        ngo = self.ngos[0]
+        NGO.objects.filter(pk=ngo.pk).update(latitude=None, longitude=None, geohash='')
+        url = f'/api/ngos/{ngo.pk}/'
+        self.client.get(url)
+        etag = self.client.get(url)['ETag']
+        call_command('geocode_ngos', stdout=StringIO())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.json()['latitude'])
+
+    def test_missing_object_is_still_404(self):
+        self.assertEqual(self.client.get('/api/ngos/999999/').status_code, 404)
+
+
+class PhotoPipelineTests(PetHavenTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(MEDIA_ROOT=cls.media_root, IMAGE_PIPELINE_ASYNC=False)
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def upload(self, size=(800, 600)):
+        from PIL import Image
+        buffer = BytesIO()
+        Image.new('RGB', size, 'orange').save(buffer, 'JPEG')
+        photo = SimpleUploadedFile('rex.jpg', buffer.getvalue(), content_type='image/jpeg')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/animals/', {
+                'name': 'Rex', 'type': 'dog', 'breed': 'SRD', 'age': 3, 'gender': 'male',
+                'description': 'Foto grande', 'ngo': self.ngo.pk, 'photo': photo,
+            }, format='multipart')
+        self.assertEqual(response.status_code, 201, response.content)
+        return self.client.get(f"/api/animals/{response.json()['id']}/").json()
+
+    def test_upload_generates_variants_and_srcset(self):
+        variants = self.upload()['photo_variants']
+        self.assertEqual(sorted(variants['webp']), ['160', '320', '640'])
+        self.assertTrue(variants['webp']['160'].startswith('http://testserver/media/animals/variants/'))
+        self.assertIn(' 640w', variants['srcset']['jpeg'])
+
+        from PIL import Image
+        path = variants['webp']['320'].split('/media/', 1)[1]
+        with Image.open(f'{self.media_root}/{path}') as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (320, 240)))
+
+    def test_small_photos_are_not_upscaled_and_names_are_content_hashed(self):
+        first = self.upload(size=(200, 100))['photo_variants']
+        self.assertEqual(sorted(first['webp']), ['160', '200'])
+        second = self.upload(size=(200, 100))['photo_variants']
+        self.assertEqual(first['webp'], second['webp'])
+
+    def test_animals_without_photo(self):
+        self.assertEqual(self.client.get(f'/api/animals/{self.animals[0].pk}/').json()['photo_variants'], {})
+
+
+class BulkImportTests(PetHavenTestCase):
+
+    CSV = (
+        'name,type,breed,age,size,gender,description,ngo\n'
+        'Bolinha,dog,SRD,4,,female,Muito dócil,{ngo}\n'
+        'Sem Tipo,lizard,SRD,4,small,male,Tipo inválido,{ngo}\n'
+        'Frajola,cat,SRD,10,small,male,Gato esperto,999999\n'
+        'Tom,cat,SRD,12,large,male,Preguiçoso,\n'
+    )
+
+    def upload(self, content, name='animais.csv', **data):
+        upload = SimpleUploadedFile(name, content.encode('utf-8'))
+        return self.client.post('/api/animals/bulk_import/', dict(data, file=upload), format='multipart')
+
+    def test_csv_import_reports_row_errors_without_aborting(self):
+        before = Animal.objects.count()
+        # ONGs do lote + INSERT único e ONGs com estatísticas, num savepoint
+        with self.assertNumQueries(5):
+            response = self.upload(self.CSV.format(ngo=self.ngo.pk), ngo=self.ngos[1].pk)
+        self.assertEqual(response.status_code, 201, response.content)
+        report = response.json()
+        self.assertEqual(report['created'], 2)
+        self.assertEqual([error['line'] for error in report['errors']], [3, 4])
+        self.assertIn('type', report['errors'][0]['errors'])
+        self.assertIn('ngo', report['errors'][1]['errors'])
+        self.assertEqual(Animal.objects.count(), before + 2)
+        self.assertEqual(Animal.objects.get(name='Bolinha').size, 'medium')
+        self.assertEqual(Animal.objects.get(name='Tom').ngo, self.ngos[1])
+
+    def test_ndjson_import(self):
+        lines = [
+            '{"name": "Luna", "type": "cat", "breed": "SRD", "age": 5, "gender": "female", '
+            '"description": "Calma", "ngo": %d}' % self.ngo.pk,
+            '{"name": "quebrado"',
+            '',
+        ]
+        report = self.upload('\n'.join(lines), name='animais.ndjson').json()
+        self.assertEqual((report['created'], report['error_count']), (1, 1))
+        # O índice de busca acompanha o bulk_create (triggers do FTS5)
+        self.assertEqual(
+            [row['name'] for row in self.client.get('/api/animals/', {'search': 'luna'}).json()['results']],
+            ['Luna'],
+        )
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.upload(self.CSV.format(ngo=self.ngo.pk)).status_code, 401)
+
+    def test_management_command_in_batches(self):
+        rows = ''.join(f'Cão {i},dog,SRD,{i},small,male,Lote,{self.ngo.pk}\n' for i in range(25))
+        path = tempfile.mktemp(suffix='.csv')
+        with open(path, 'w') as fp:
+            fp.write('name,type,breed,age,size,gender,description,ngo\n' + rows + 'x,dog,SRD,-1,,male,Idade,1\n')
+        out, err = StringIO(), StringIO()
+        before = Animal.objects.count()
+        call_command('import_animals', path, batch_size=10, stdout=out, stderr=err)
+        self.assertEqual(Animal.objects.count(), before + 25)
+        self.assertIn('25 linhas importadas, 1 com erro', out.getvalue())
+        self.assertIn('linha 27', err.getvalue())
+
+
+class StreamingExportTests(PetHavenTestCase):
+
+    def export(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_csv_export_honors_filters(self):
+        with CaptureQueriesContext(connection) as ctx:
+            content = self.export('/api/animals/export/', type='dog', ordering='-age')
+        self.assertEqual(len(ctx.captured_queries), 1)
+        rows = list(csv.DictReader(content.splitlines()))
+        expected = Animal.objects.filter(type='dog').order_by('-age', 'pk')
+        self.assertEqual([int(row['id']) for row in rows], list(expected.values_list('pk', flat=True)))
+        self.assertEqual(rows[0]['ngo_name'], expected[0].ngo.name)
+
+    def test_ndjson_export(self):
+        content = self.export('/api/adoptions/export/', file_format='ndjson', status='rejected')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(len(rows), Adoption.objects.filter(status='rejected').count())
+        self.assertEqual({row['status'] for row in rows}, {'rejected'})
+        self.assertEqual(rows[0]['animal_name'], 'Animal 0')
+
+    def test_review_export_requires_authentication(self):
+        self.assertIn('rating', self.export('/api/reviews/export/').splitlines()[0])
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/api/reviews/export/').status_code, 401)
+
+
+class TokenCacheTests(PetHavenTestCase):
+
+    def setUp(self):
+        super().setUp()
+        token_cache.clear()
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_second_request_skips_token_lookup(self):
+        url = f'/api/users/{self.user.pk}/'
+        with self.assertNumQueries(2):  # Token + User, usuário
+            self.assertEqual(self.client.get(url).status_code, 200)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        stats = token_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_deleted_token_is_rejected(self):
+        self.client.get('/api/users/')
+        self.token.delete()
+        self.assertEqual(self.client.get('/api/users/').status_code, 401)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get('/api/users/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/users/').status_code, 401)
+
+    def test_lru_and_ttl(self):
+        from .authentication import TokenCache
+        cache_ = TokenCache(max_size=2, ttl=60)
+        for key in 'abc':
+            cache_.set(key, self.user, None)
+        self.assertIsNone(cache_.get('a'))
+        self.assertIsNotNone(cache_.get('c'))
+        self.assertEqual(cache_.stats()['evictions'], 1)
+        cache_.ttl = -1
+        cache_.set('d', self.user, None)
+        self.assertIsNone(cache_.get('d'))
+
+
+class RatingAggregateTests(PetHavenTestCase):
+
+    def assertAggregates(self, obj, count, total):
+        obj.refresh_from_db()
+        self.assertEqual((obj.rating_count, obj.rating_sum), (count, total))
+        self.assertEqual(obj.rating_average, total / count if count else None)
+
+    def test_aggregates_follow_create_edit_and_delete(self):
+        animal, ngo = self.animals[2], self.ngos[2]
+        self.assertAggregates(animal, 1, 5)
+        review = Review.objects.create(user=self.users[5], animal=animal, rating=2, comment='Ok')
+        self.assertAggregates(animal, 2, 7)
+        self.assertAggregates(ngo, 2, 7)
+
+        review = Review.objects.get(pk=review.pk)
+        review.rating = 4
+        review.save()
+        self.assertAggregates(animal, 2, 9)
+
+        review.animal = self.animals[3]
+        review.save()
+        self.assertAggregates(animal, 1, 5)
+        self.assertAggregates(self.animals[3], 2, 9)
+
+        Review.objects.filter(animal=self.animals[3]).delete()
+        self.assertAggregates(self.animals[3], 0, 0)
+        self.assertAggregates(self.ngos[3], 0, 0)
+
+    def test_stale_instance_save_keeps_aggregates(self):
+        ngo = NGO.objects.get(pk=self.ngo.pk)
+        puppy = Animal.objects.filter(ngo=ngo, name__startswith='Filhote').first()
+        Review.objects.create(user=self.users[5], animal=self.animals[1], rating=1, comment='Hm')
+        Review.objects.create(user=self.users[5], animal=puppy, rating=3, comment='Hm')
+        expected = (ngo.rating_count + 1, ngo.rating_sum + 3)
+        ngo.name = 'Renomeada'
+        ngo.save()
+        self.assertAggregates(ngo, *expected)
+
+    def test_exposed_and_orderable(self):
+        data = self.client.get('/api/animals/', {'ordering': '-rating_average'}).json()
+        averages = [row['rating_average'] for row in data['results']]
+        self.assertEqual(averages[0], 5.0)
+        self.assertIn('rating_count', self.client.get(f'/api/ngos/{self.ngo.pk}/').json())
+        ngos = self.client.get('/api/ngos/', {'ordering': '-rating_count'}).json()['results']
+        self.assertEqual(ngos[0]['id'], self.ngo.pk)
+
+    def test_reconcile_repairs_drift(self):
+        Animal.objects.filter(pk=self.animals[0].pk).update(rating_count=0, rating_sum=0, rating_average=None)
+        NGO.objects.filter(pk=self.ngos[4].pk).update(rating_count=99)
+        out = StringIO()
+        call_command('reconcile_ratings', stdout=out)
+        self.assertIn('1 animais e 1 ONGs corrigidos', out.getvalue())
+        reviews = Review.objects.filter(animal=self.animals[0])
+        self.assertAggregates(self.animals[0], reviews.count(), sum(r.rating for r in reviews))
+        self.assertAggregates(self.ngos[4], 1, 5)
+
+
+class NGOStatsTests(PetHavenTestCase):
+
+    def stats(self, ngo=None):
+        return self.client.get(f'/api/ngos/{(ngo or self.ngo).pk}/stats/').json()
+
+    def assertMatchesLiveCounts(self, *ngos):
+        for ngo in ngos:
+            stored = {(metric, key): value for metric, key, value in
+                      NGOStat.objects.filter(ngo=ngo).exclude(metric='_built').exclude(value=0)
+                      .values_list('metric', 'key', 'value')}
+            self.assertEqual(stored, dict(compute_stats([ngo.pk])[ngo.pk]))
+
+    def test_first_read_materializes_then_costs_two_queries(self):
+        data = self.stats()
+        self.assertEqual(data['available_animals'], {
+            'total': 8, 'by_type': {'dog': 8}, 'by_size': {'medium': 7, 'small': 1},
+        })
+        self.assertEqual(data['adoptions'], {'total': 9, 'by_status': {'pending': 1, 'rejected': 8}})
+        self.assertIsNone(data['median_approval_hours'])
+        self.assertTrue(NGOStat.objects.filter(ngo=self.ngo, metric='_built').exists())
+
+        cache.clear()
+        # ONG + tabela de resumo
+        with self.assertNumQueries(2):
+            self.assertEqual(self.stats(), data)
+
+    def test_new_stat_key_survives_a_concurrent_insert(self):
+        self.stats()
+        key = (self.ngo.pk, 'available_size', 'large')
+        real_update = QuerySet.update
+
+        def racing_update(queryset, **kwargs):
+            # Outra requisição cria a linha entre o UPDATE que não achou nada e o INSERT
+            updated = real_update(queryset, **kwargs)
+            if not updated and not NGOStat.objects.filter(ngo=self.ngo, key='large').exists():
+                NGOStat.objects.create(ngo=self.ngo, metric='available_size', key='large', value=1)
+            return updated
+
+        with mock.patch.object(QuerySet, 'update', racing_update):
+            apply_stat_deltas({key: 1})
+        self.assertEqual(NGOStat.objects.get(ngo=self.ngo, metric='available_size', key='large').value, 2)
+
+    def test_incremental_updates_match_full_recount(self):
+        for ngo in self.ngos[:2]:
+            self.stats(ngo)
+        adoption = Adoption.objects.get(animal=self.animals[0], status='pending')
+        adoption.status = 'approved'
+        adoption.save()
+        puppy = Animal.objects.filter(ngo=self.ngo, name__startswith='Filhote').first()
+        puppy.ngo, puppy.size = self.ngos[1], 'large'
+        puppy.save()
+        moved = Animal.objects.get(pk=self.animals[0].pk)
+        moved.ngo = self.ngos[1]
+        moved.save()
+        Animal.objects.filter(pk=self.animals[1].pk).first().delete()
+        Animal.objects.create(name='Novo', type='cat', breed='SRD', age=1, gender='male',
+                              description='Novo', ngo=self.ngo)
+        self.assertMatchesLiveCounts(*self.ngos[:2])
+
+        data = self.stats(self.ngos[1])
+        self.assertEqual(data['adoptions']['by_status'], {'approved': 1, 'rejected': 8})
+        self.assertEqual(data['available_animals']['by_size'], {'large': 1})
+        self.assertEqual(data['median_approval_hours'], 0)
+
+    def test_bulk_import_updates_materialized_stats(self):
+        self.stats()
+        upload = SimpleUploadedFile('animais.csv', b'name,type,breed,age,size,gender,description\n'
+                                                   b'Mimi,cat,SRD,2,small,female,Gata\n')
+        response = self.client.post('/api/animals/bulk_import/', {'file': upload, 'ngo': self.ngo.pk},
+                                    format='multipart')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(self.stats()['available_animals']['by_type'], {'cat': 1, 'dog': 8})
+
+    def test_median_and_rebuild_command(self):
+        adoptions = list(Adoption.objects.filter(animal=self.animals[0], status='rejected')[:4])
+        for hours, adoption in zip([1, 3, 10, 30], adoptions):
+            Adoption.objects.filter(pk=adoption.pk).update(approval_date=adoption.adoption_date
+                                                           + timedelta(hours=hours, minutes=5))
+        NGOStat.objects.create(ngo=self.ngo, metric='_built', value=1)
+        self.assertEqual(self.stats()['adoptions']['total'], 0)
+
+        out = StringIO()
+        call_command('rebuild_ngo_stats', stdout=out)
+        self.assertIn(f'{NGO.objects.count()} ONGs', out.getvalue())
+        cache.clear()
+        self.assertEqual(self.stats()['median_approval_hours'], 6.5)
+        self.assertMatchesLiveCounts(*self.ngos)
+
+
+class AsyncReadTests(PetHavenTestCase):
+    """As rotas /api/async/... devolvem o mesmo que as síncronas"""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(None)
+
+    async def test_same_payload_and_etag_as_sync_routes(self):
+        paths = [
+            '/api/animals/?ordering=-age', f'/api/animals/{self.animals[0].pk}/',
+            f'/api/animals/{self.animals[0].pk}/reviews/', '/api/ngos/?city=Recife',
+            f'/api/ngos/{self.ngo.pk}/', f'/api/ngos/{self.ngo.pk}/animals/',
+            '/api/animals/?cursor=&ordering=name', '/api/animals/999999/', '/api/animals/?ngo=999999',
+        ]
+        for path in paths:
+            with self.subTest(path=path):
+                expected = await sync_to_async(self.client.get)(path, HTTP_ACCEPT='application/json')
+                response = await self.async_client.get(path.replace('/api/', '/api/async/', 1))
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(response.json(), expected.json())
+                self.assertEqual(response.get('ETag'), expected.get('ETag'))
+
+    async def test_not_modified_and_shared_response_cache(self):
+        url = f'/api/async/animals/{self.animals[0].pk}/'
+        first = await self.async_client.get(url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual((await self.async_client.get(url))['X-Cache'], 'HIT')
+        response = await self.async_client.get(url, headers={'If-None-Match': first['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+        expected = await sync_to_async(self.client.get)(f'/api/animals/{self.animals[0].pk}/',
+                                                        HTTP_ACCEPT='application/json')
+        self.assertEqual(expected['X-Cache'], 'HIT')
+
+    async def test_invalid_lookup_is_404(self):
+        response = await self.async_client.get('/api/async/ngos/abc/')
+        self.assertEqual(response.status_code, 404)
+
+
+class AdoptionTransitionTests(PetHavenTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.animal = self.animals[1]
+        self.first = Adoption.objects.get(animal=self.animal, status='pending')
+        self.second = Adoption.objects.create(user=self.users[2], animal=self.animal)
+        self.third = Adoption.objects.create(user=self.users[3], animal=self.animal)
+
+    def update_status(self, adoption, new_status):
+        return self.client.post(f'/api/adoptions/{adoption.pk}/update_status/?expand=animal_details',
+                                {'status': new_status})
+
+    def batch(self, *changes, **extra):
+        data = dict(extra, changes=[{'id': adoption.pk, 'status': new} for adoption, new in changes])
+        return self.client.post('/api/adoptions/batch_status/', data, format='json')
+
+    def test_approval_locks_animal_and_rejects_competing_requests(self):
+        ngo = self.animal.ngo
+        self.client.get(f'/api/ngos/{ngo.pk}/stats/')
+        response = self.update_status(self.first, 'approved')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['status'], 'approved')
+        self.assertFalse(response.json()['animal_details']['is_available'])
+        self.assertIsNotNone(response.json()['approval_date'])
+        self.assertEqual(
+            set(Adoption.objects.filter(animal=self.animal).values_list('status', flat=True)), {'approved', 'rejected'},
+        )
+
+        stored = dict(((metric, key), value) for metric, key, value in NGOStat.objects.filter(ngo=ngo)
+                      .exclude(metric='_built').exclude(value=0).values_list('metric', 'key', 'value'))
+        self.assertEqual(stored, dict(compute_stats([ngo.pk])[ngo.pk]))
+
+        self.assertEqual(self.update_status(self.first, 'completed').status_code, 200)
+        self.assertEqual(self.update_status(self.first, 'pending').status_code, 400)
+        self.assertEqual(self.update_status(self.first, 'bogus').status_code, 400)
+
+    def test_second_approval_is_a_conflict(self):
+        response = self.batch((self.first, 'approved'), reject_competing=False)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['auto_rejected'], [])
+        response = self.update_status(self.second, 'approved')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Adoption.objects.get(pk=self.second.pk).status, 'pending')
+
+    def test_batch_is_all_or_nothing(self):
+        rejected = Adoption.objects.filter(animal=self.animals[0], status='rejected').first()
+        response = self.batch((self.first, 'approved'), (rejected, 'approved'))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(rejected.pk), response.json()['details'])
+        self.assertEqual(Adoption.objects.get(pk=self.first.pk).status, 'pending')
+        self.assertTrue(Animal.objects.get(pk=self.animal.pk).is_available)
+
+        response = self.batch((self.first, 'approved'), (self.second, 'approved'))
+        self.assertEqual(response.status_code, 400)
+
+        other = Adoption.objects.get(animal=self.animals[2], status='pending')
+        response = self.batch((self.first, 'approved'), (other, 'rejected'))
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual([row['status'] for row in response.json()['updated']], ['approved', 'rejected'])
+        self.assertEqual(sorted(response.json()['auto_rejected']), [self.second.pk, self.third.pk])
+
+    def test_contradictory_batch_is_not_a_conflict(self):
+        taken = Adoption.objects.get(animal=self.animals[2], status='pending')
+        self.assertEqual(self.update_status(taken, 'approved').status_code, 200)
+        late = Adoption.objects.create(user=self.users[4], animal=self.animals[2])
+        response = self.batch((self.first, 'approved'), (self.second, 'approved'), (late, 'approved'))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.batch((late, 'approved')).status_code, 409)
+
+    def test_cancelling_an_approval_makes_the_animal_available_again(self):
+        self.update_status(self.first, 'approved')
+        self.assertEqual(self.update_status(self.first, 'cancelled').status_code, 200)
+        self.assertTrue(Animal.objects.get(pk=self.animal.pk).is_available)
+
+    def test_stale_read_loses_the_race(self):
+        stale = Adoption.objects.get(pk=self.second.pk)
+        Adoption.objects.filter(pk=self.second.pk).update(status='cancelled')
+        with self.assertRaises(TransitionError) as ctx:
+            set_status(stale, 'approved', stale.updated_at)
+        self.assertTrue(ctx.exception.conflict)
+
+    def test_database_allows_one_approved_adoption_per_animal(self):
+        Adoption.objects.filter(pk=self.first.pk).update(status='approved')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Adoption.objects.filter(pk=self.second.pk).update(status='completed')
+
+    def test_status_is_read_only_and_duplicate_requests_are_rejected(self):
+        self.client.force_authenticate(self.users[4])
+        response = self.client.post('/api/adoptions/', {
+            'user': self.users[4].pk, 'animal': self.animals[5].pk, 'status': 'approved',
+        })
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['status'], 'pending')
+        response = self.client.post('/api/adoptions/', {'user': self.users[4].pk, 'animal': self.animals[5].pk})
+        self.assertEqual(response.status_code, 400)
+
+    def test_animal_and_user_are_read_only_on_update(self):
+        self.update_status(self.first, 'approved')
+        other = self.animals[5]
+        response = self.client.patch(f'/api/adoptions/{self.first.pk}/',
+                                     {'animal': other.pk, 'user': self.users[4].pk, 'notes': 'Visita feita'})
+        self.assertEqual(response.status_code, 200, response.content)
+        adoption = Adoption.objects.get(pk=self.first.pk)
+        self.assertEqual((adoption.animal_id, adoption.user_id, adoption.notes),
+                         (self.animal.pk, self.first.user_id, 'Visita feita'))
+        run_pending()
+        self.assertTrue(Animal.objects.get(pk=other.pk).is_available)
+        self.assertFalse(Animal.objects.get(pk=self.animal.pk).is_available)
+
+    def test_deleting_an_approval_makes_the_animal_available_again(self):
+        self.update_status(self.first, 'approved')
+        run_pending()
+        self.assertEqual(self.client.delete(f'/api/adoptions/{self.first.pk}/').status_code, 204)
+        run_pending()
+        self.assertTrue(Animal.objects.get(pk=self.animal.pk).is_available)
+        # Excluir uma pendente não mexe no animal aprovado para outra pessoa
+        approved = Adoption.objects.create(user=self.users[4], animal=self.animal)
+        self.assertEqual(self.update_status(approved, 'approved').status_code, 200)
+        Adoption.objects.create(user=self.users[5], animal=self.animal).delete()
+        run_pending()
+        self.assertFalse(Animal.objects.get(pk=self.animal.pk).is_available)
+
+
+class SparseFieldsTests(PetHavenTestCase):
+
+    def test_nested_details_are_opt_in(self):
+        row = self.client.get('/api/adoptions/').json()['results'][0]
+        self.assertNotIn('animal_details', row)
+        self.assertNotIn('user_details', row)
+        self.assertEqual(row['status_display'], 'Pendente')
+        row = self.client.get('/api/adoptions/', {'expand': 'animal_details,user_details'}).json()['results'][0]
+        self.assertEqual(row['animal_details']['ngo_name'], Animal.objects.get(pk=row['animal']).ngo.name)
+        self.assertIn('username', row['user_details'])
+
+    def test_fields_trim_output_and_selected_columns(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/reviews/', {'fields': 'rating,animal_details'})
+        rows = response.json()['results']
+        self.assertEqual(set(rows[0]), {'id', 'rating', 'animal_details'})
+        select = next(q['sql'] for q in ctx.captured_queries if 'FROM "api_review"' in q['sql'] and 'LIMIT' in q['sql'])
+        self.assertNotIn('"api_review"."comment"', select)
+        self.assertNotIn('"auth_user"', select)
+        self.assertIn('"api_ngo"."name"', select)
+
+    def test_lean_list_skips_joins(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/adoptions/', {'fields': 'status'})
+        select = next(q['sql'] for q in ctx.captured_queries if 'LIMIT' in q['sql'])
+        self.assertNotIn('JOIN', select)
+        self.assertNotIn('"notes"', select)
+
+    def test_fields_do_not_prune_writes(self):
+        Adoption.objects.create(user=self.users[2], animal=self.animals[3], status='approved')
+        response = self.client.post('/api/reviews/?fields=rating', {
+            'user': self.users[2].pk, 'animal': self.animals[3].pk, 'rating': 4, 'comment': 'Bom',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.data['comment'], 'Bom')
+
+    def test_nested_actions_honor_the_same_parameters(self):
+        url = f'/api/animals/{self.animals[0].pk}/reviews/'
+        self.assertEqual(set(self.client.get(url, {'fields': 'rating'}).json()[0]), {'id', 'rating'})
+        self.assertIn('user_details', self.client.get(url, {'expand': 'user_details'}).json()[0])
+
+
+class FastListSerializationTests(PetHavenTestCase):
+    """O caminho rápido de `list` gera exatamente os mesmos bytes que o DRF"""
+
+    URLS = [
+        '/api/animals/', '/api/animals/?ordering=-rating_average', '/api/animals/?search=filhote',
+        '/api/animals/?cursor=&ordering=name', '/api/animals/?type=dog', '/api/ngos/',
+        '/api/ngos/?search=ong', '/api/adoptions/', '/api/adoptions/?expand=animal_details,user_details',
+        '/api/adoptions/?fields=status_display,approval_date', '/api/reviews/?expand=animal_details',
+        '/api/reviews/?ordering=-rating&cursor=',
+    ]
+
+    def get(self, url, fast):
+        cache.clear()
+        with override_settings(FAST_LIST_SERIALIZATION=fast):
+            return self.client.get(url, HTTP_ACCEPT='application/json')
+
+    def test_byte_identical_output(self):
+        Animal.objects.filter(pk=self.animals[3].pk).update(photo='animals/foto.jpg', photo_variants={
+            'source': 'animals/foto.jpg', 'webp': {'160': 'animals/variants/abc-160.webp'},
+        })
+        Adoption.objects.filter(animal=self.animals[2]).update(approval_date=F('updated_at'), status='approved')
+        for url in self.URLS:
+            with self.subTest(url=url):
+                expected = self.get(url, fast=False)
+                response = self.get(url, fast=True)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, expected.content)
+
+    def test_list_queries_skip_model_instances(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/adoptions/', {'fields': 'status'})
+        select = next(q['sql'] for q in ctx.captured_queries if 'LIMIT' in q['sql'])
+        self.assertEqual(select.split(' FROM ')[0], 'SELECT "api_adoption"."id", "api_adoption"."status"')
+
+
+class JSONRenderingTests(PetHavenTestCase):
+    """ORJSONRenderer/ORJSONParser e a compressão das respostas"""
+
+    def test_renderer_matches_drf_bytes(self):
+        data = {
+            'decimal': Decimal('12.50'), 'lazy': gettext_lazy('Cachorro'), 'text': 'São\u2028Paulo',
+            'utc': datetime(2024, 1, 2, 3, 4, 5, 123456, tzinfo=dt_timezone.utc),
+            'offset': datetime(2024, 1, 2, 3, 4, 5, tzinfo=dt_timezone(timedelta(hours=-3))),
+            'numbers': [1, 2.5, None, True], 7: {'nested': []},
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        for url in ('/api/animals/', '/api/adoptions/?expand=animal_details,user_details', '/api/ngos/'):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_ACCEPT='application/json')
+                self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    def test_indented_output_falls_back_to_drf(self):
+        response = self.client.get('/api/ngos/', HTTP_ACCEPT='application/json; indent=2')
+        self.assertIn(b'\n  "count": ', response.content)
+
+    def test_parser(self):
+        response = self.client.post('/api/reviews/', data='{"animal": 1,', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('JSON parse error', response.json()['detail'])
+        body = json.dumps({'comment': 'Carinhoso 🐶', 'rating': 4.5, 'tags': [None, True]}).encode()
+        self.assertEqual(ORJSONParser().parse(BytesIO(body)), json.loads(body))
+
+    def test_gzip_above_threshold(self):
+        plain = self.client.get('/api/animals/')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', plain['Vary'])
+        response = self.client.get('/api/animals/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertLess(int(response['Content-Length']), len(plain.content))
+        # O ETag fraco continua valendo para o GET condicional
+        self.assertTrue(response['ETag'].startswith('W/'))
+        response = self.client.get('/api/animals/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_small_responses_and_refused_encodings_stay_plain(self):
+        with override_settings(RESPONSE_COMPRESSION_MIN_SIZE=10 ** 6):
+            response = self.client.get('/api/animals/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        response = self.client.get('/api/animals/', HTTP_ACCEPT_ENCODING='identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_streaming_export_is_gzipped(self):
+        response = self.client.get('/api/animals/export/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        content = gzip.decompress(b''.join(response.streaming_content)).decode('utf-8')
+        self.assertEqual(len(content.splitlines()), Animal.objects.count() + 1)
+
+
+class RequestTimingTests(PetHavenTestCase):
+    """Server-Timing e log de requisições e queries lentas"""
+
+    def timing(self, response):
+        return dict(
+            (name, params) for name, _, params in
+            (entry.strip().partition(';') for entry in response['Server-Timing'].split(','))
+        )
+
+    def test_server_timing_counts_queries(self):
+        with CaptureQueriesContext(connection) as ctx, override_settings(FAST_LIST_SERIALIZATION=False):
+            response = self.client.get('/api/animals/')
+        timing = self.timing(response)
+        self.assertEqual(set(timing), {'db', 'serializer', 'view', 'render', 'total'})
+        self.assertIn(f'desc="{len(ctx.captured_queries)} queries"', timing['db'])
+        self.assertGreater(float(timing['serializer'].partition('=')[2]), 0)
+
+    def test_only_api_routes(self):
+        self.assertFalse(self.client.get('/admin/login/').has_header('Server-Timing'))
+
+    async def test_async_views(self):
+        response = await self.async_client.get('/api/async/animals/')
+        self.assertIn('queries"', response['Server-Timing'])
+
+    @override_settings(SLOW_QUERY_MS=0, SLOW_REQUEST_MS=0)
+    def test_slow_log(self):
+        with self.assertLogs('api.timing', 'WARNING') as logs:
+            self.client.get('/api/animals/', {'type': 'dog'})
+        self.assertTrue(any('SQL lento' in line and 'animal-list' in line and '"type" = ?' in line
+                            for line in logs.output))
+        self.assertTrue(any('Requisição lenta' in line and 'GET /api/animals/?type=dog' in line
+                            for line in logs.output))
+
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql("SELECT *\n  FROM t WHERE id IN (%s, %s,%s) AND name = 'it''s' LIMIT 21"),
+            'SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?',
+        )
+
+
+class SeedDataTests(TestCase):
+    """Catálogo sintético para testes de carga"""
+
+    def test_seed_respects_constraints_and_aggregates(self):
+        created = seed(ngos=3, animals=40, users=15, adoptions=120, reviews=30, batch_size=25, random_seed=7)
+        self.assertEqual(created[Animal], 40)
+        self.assertEqual(Adoption.objects.count(), 120)
+        self.assertEqual(set(Adoption.objects.values_list('status', flat=True)),
+                         {status for status, _ in Adoption.STATUS_CHOICES})
+        adopted = Adoption.objects.filter(status__in=Adoption.ADOPTED_STATUSES)
+        self.assertEqual(adopted.count(), adopted.values('animal').distinct().count())
+        self.assertEqual(set(Animal.objects.filter(is_available=False).values_list('pk', flat=True)),
+                         set(adopted.values_list('animal', flat=True)))
+        for review in Review.objects.select_related('animal'):
+            self.assertTrue(adopted.filter(user=review.user_id, animal=review.animal_id).exists())
+        # Agregados e estatísticas já consistentes com as linhas criadas
+        self.assertEqual(reconcile_all(), {'animals': 0, 'ngos': 0})
+        self.assertEqual(NGOStat.objects.filter(metric=BUILT).count(), 3)
+
+    def test_endpoint_benchmark_writes_json(self):
+        seed(ngos=2, animals=10, users=3, adoptions=10, reviews=3, random_seed=1)
+        path = tempfile.mktemp(suffix='.json')
+        self.addCleanup(lambda: os.path.exists(path) and os.remove(path))
+        call_command('benchmark_endpoints', requests=2, warmup=0, match='ngo-', host='testserver',
+                     output=path, stdout=StringIO())
+        with open(path) as result:
+            results = {row['name']: row for row in json.load(result)['results']}
+        self.assertIn('ngo-list ordering=-rating_average', results)
+        self.assertIn('ngo-stats', results)
+        self.assertEqual(results['ngo-list']['status'], 200)
+        self.assertIsNotNone(results['ngo-list']['queries'])
+
+
+class ProximityTests(TestCase):
+    """?near=lat,lon&radius=km em ONGs e animais, com localização pela cidade"""
+    ORIGIN = (-8.05, -34.88)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.recife = NGO.objects.create(name='Patas Recife', city='Recife', email='recife@example.com')
+        cls.olinda = NGO.objects.create(name='Patas Olinda', city='olinda ', email='olinda@example.com')
+        cls.caruaru = NGO.objects.create(name='Patas Caruaru', city='Caruaru', email='caruaru@example.com')
+        cls.nowhere = NGO.objects.create(name='Sem mapa', city='Cidadezinha', email='x@example.com')
+        # Dentro da caixa de 10 km em volta da origem, mas fora do círculo
+        cls.corner = NGO.objects.create(name='Canto', city='Recife', email='canto@example.com',
+                                        latitude=-8.05 + 0.085, longitude=-34.88 + 0.085)
+        for ngo in (cls.recife, cls.olinda, cls.caruaru, cls.nowhere, cls.corner):
+            Animal.objects.create(name=f'Bicho {ngo.name}', type='dog', breed='SRD', age=2, gender='male',
+                                  description='Teste', ngo=ngo)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def names(self, path, **params):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row['name'] for row in response.data['results']]
+
+    def test_geocoding_on_save(self):
+        self.assertEqual((self.recife.latitude, self.recife.longitude), (-8.0476, -34.877))
+        self.assertEqual(self.recife.geohash, encode_geohash(-8.0476, -34.877))
+        self.assertIsNotNone(self.olinda.latitude)
+        self.assertIsNone(self.nowhere.latitude)
+        self.assertEqual(self.nowhere.geohash, '')
+
+        self.recife.city = 'Caruaru'
+        self.recife.save()
+        self.assertEqual((self.recife.latitude, self.recife.longitude), (-8.276, -35.9819))
+        # Coordenadas explícitas não são sobrescritas pela cidade
+        self.corner.refresh_from_db()
+        self.assertAlmostEqual(self.corner.latitude, -7.965)
+        self.assertEqual(self.corner.geohash, encode_geohash(self.corner.latitude, self.corner.longitude))
+
+    def test_encode_geohash(self):
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+
+    def test_ngos_near_ordered_by_distance(self):
+        params = {'near': '%s,%s' % self.ORIGIN}
+        self.assertEqual(self.names('/api/ngos/', radius=10, **params), ['Patas Recife', 'Patas Olinda'])
+        names = self.names('/api/ngos/', radius=150, **params)
+        self.assertEqual(names, ['Patas Recife', 'Patas Olinda', 'Canto', 'Patas Caruaru'])
+        ngos = {ngo.name: ngo for ngo in NGO.objects.all()}
+        distances = [haversine_km(*self.ORIGIN, ngos[name].latitude, ngos[name].longitude) for name in names]
+        self.assertEqual(distances, sorted(distances))
+        # ?ordering= explícito prevalece sobre a distância
+        self.assertEqual(self.names('/api/ngos/', radius=10, ordering='-name', **params),
+                         ['Patas Recife', 'Patas Olinda'])
+
+    def test_animals_near_use_ngo_location(self):
+        self.assertEqual(self.names('/api/animals/', near='-8.28,-35.98', radius=5), ['Bicho Patas Caruaru'])
+        self.assertEqual(self.names('/api/animals/', near='%s,%s' % self.ORIGIN, radius=10, type='dog'),
+                         ['Bicho Patas Recife', 'Bicho Patas Olinda'])
+
+    def test_prefilter_uses_geohash_index(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/ngos/', {'near': '%s,%s' % self.ORIGIN, 'radius': 10})
+        sql = next(query['sql'] for query in ctx.captured_queries if 'ASIN' in query['sql'])
+        with connection.cursor() as cursor:
+            plan = ' '.join(str(row) for row in cursor.execute(f'EXPLAIN QUERY PLAN {sql}').fetchall())
+        self.assertIn('ngo_geohash_idx', plan)
+
+    def test_invalid_parameters(self):
+        for params in ({'near': 'abc'}, {'near': '-8.05'}, {'near': '91,0'},
+                       {'near': '-8,-34', 'radius': 'x'}, {'near': '-8,-34', 'radius': 501},
+                       {'near': '-8,-34', 'radius': 0}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/animals/', params).status_code, 400)
+
+    @mock.patch.object(HybridPagination, 'page_size', 2)
+    def test_cursor_pages_keep_distance_order(self):
+        expected = ['Patas Recife', 'Patas Olinda', 'Canto', 'Patas Caruaru']
+        for prefix in ('/api/', '/api/async/'):
+            with self.subTest(prefix=prefix):
+                url, names = f'{prefix}ngos/?near=-8.05,-34.88&radius=150&cursor=', []
+                while url:
+                    response = (async_to_sync(self.async_client.get)(url) if 'async' in prefix
+                                else self.client.get(url, HTTP_ACCEPT='application/json'))
+                    self.assertEqual(response.status_code, 200, response.content)
+                    names += [row['name'] for row in response.json()['results']]
+                    url, previous = response.json()['next'], response.json()['previous']
+                self.assertEqual(names, expected)
+                response = self.client.get(previous, HTTP_ACCEPT='application/json')
+                self.assertEqual([row['name'] for row in response.json()['results']], expected[:2])
+
+    def test_fast_path_and_async_match(self):
+        path = '/api/animals/?near=-8.05,-34.88&radius=150'
+        fast = self.client.get(path, HTTP_ACCEPT='application/json')
+        cache.clear()
+        with override_settings(FAST_LIST_SERIALIZATION=False):
+            slow = self.client.get(path, HTTP_ACCEPT='application/json')
+        self.assertEqual(fast.content, slow.content)
+        cache.clear()
+        response = async_to_sync(self.async_client.get)(path.replace('/api/', '/api/async/', 1))
+        self.assertEqual(response.json(), slow.json())
+
+
+def throttle_rates(**rates):
+    return override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates})
+
+
+class ThrottlingTests(PetHavenTestCase):
+    """Limites por janela deslizante no cache, por IP/usuário e por escopo"""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(None)
+
+    def at(self, timestamp):
+        return mock.patch.object(SlidingWindowThrottle, 'timer', mock.Mock(return_value=timestamp))
+
+    @throttle_rates(anon='100/min', search='3/min')
+    def test_search_scope_and_headers(self):
+        for remaining in (2, 1, 0):
+            response = self.client.get('/api/animals/', {'search': 'Animal'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['RateLimit-Limit'], '3')
+            self.assertEqual(response['RateLimit-Remaining'], str(remaining))
+            self.assertIn('scope="search"', response['RateLimit-Policy'])
+        response = self.client.get('/api/animals/', {'search': 'Animal'})
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        # Listar sem busca só conta no limite geral
+        response = self.client.get('/api/animals/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['RateLimit-Limit'], '100')
+
+    @throttle_rates(anon='4/min')
+    def test_previous_window_weighs_by_overlap(self):
+        with self.at(6000 + 50):
+            statuses = [self.client.get('/api/ngos/').status_code for _ in range(5)]
+        self.assertEqual(statuses, [200] * 4 + [429])
+        # Na metade da janela seguinte, as 4 anteriores ainda valem 2
+        with self.at(6060 + 30):
+            statuses = [self.client.get('/api/ngos/').status_code for _ in range(3)]
+            response = self.client.get('/api/ngos/')
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertEqual(response['Retry-After'], '15')
+        with self.at(6060 + 45):
+            self.assertEqual(self.client.get('/api/ngos/').status_code, 200)
+
+    @throttle_rates(anon='2/min', user='3/min')
+    def test_users_and_ips_have_separate_counters(self):
+        for _ in range(2):
+            self.client.get('/api/ngos/')
+        self.assertEqual(self.client.get('/api/ngos/').status_code, 429)
+        self.assertEqual(self.client.get('/api/ngos/', REMOTE_ADDR='10.0.0.2').status_code, 200)
+        token = Token.objects.create(user=self.user)
+        response = self.client.get('/api/ngos/', HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['RateLimit-Limit'], '3')
+
+    @throttle_rates(auth='2/min')
+    def test_forwarded_for_does_not_reset_the_counter(self):
+        for index in range(3):
+            response = self.client.post('/api/auth/login/', {'username': 'user0', 'password': 'errada'},
+                                        HTTP_X_FORWARDED_FOR=f'203.0.113.{index}')
+        self.assertEqual(response.status_code, 429)
+
+    @throttle_rates(auth='2/min')
+    def test_login_and_register_share_auth_scope(self):
+        for _ in range(2):
+            response = self.client.post('/api/auth/login/', {'username': 'user0', 'password': 'errada'})
+            self.assertEqual(response.status_code, 400, response.content)
+        response = self.client.post('/api/auth/register/', {'username': 'novo', 'password': 'senha-forte-123'})
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(User.objects.filter(username='novo').exists())
+
+    @throttle_rates(write='1/min')
+    def test_write_scope(self):
+        self.client.force_authenticate(self.user)
+        data = {'name': 'Nova', 'city': 'Recife', 'email': 'nova@example.com'}
+        self.assertEqual(self.client.post('/api/ngos/', data).status_code, 201)
+        self.assertEqual(self.client.post('/api/ngos/', data).status_code, 429)
+        self.assertEqual(self.client.get('/api/ngos/').status_code, 200)
+
+    @throttle_rates(search='1/min')
+    def test_async_views(self):
+        async def fetch():
+            return [await self.async_client.get('/api/async/animals/', {'search': 'Animal'}) for _ in range(2)]
+        first, second = async_to_sync(fetch)()
+        self.assertEqual(first['RateLimit-Remaining'], '0')
+        self.assertEqual(second.status_code, 429)
+        self.assertIn('Retry-After', second)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReadReplicaTests(PetHavenTestCase):
+    """Leituras de catálogo nas réplicas, escritas e leituras logo após uma escrita no primário"""
+
+    def view(self, viewset, request, action='list'):
+        view = viewset(action_map={request.method.lower(): action}, format_kwarg=None, args=(), kwargs={})
+        view.request = view.initialize_request(request)
+        return view
+
+    def test_catalog_reads_go_to_replica(self):
+        factory = APIRequestFactory()
+        for viewset in (AnimalViewSet, NGOViewSet):
+            self.assertEqual(self.view(viewset, factory.get('/')).get_queryset().db, 'replica1')
+            self.assertEqual(self.view(viewset, factory.post('/'), 'create').get_queryset().db, 'default')
+        request = factory.get('/')
+        request.pinned_to_primary = True
+        self.assertEqual(self.view(AnimalViewSet, request).get_queryset().db, 'default')
+
+    def test_replica_reads_do_not_fill_response_cache(self):
+        client = APIClient()
+        url = f'/api/animals/{self.animals[0].pk}/'
+        # 'default' no papel de réplica: a leitura vai por `.using()` como numa réplica de verdade
+        with override_settings(DATABASE_REPLICAS=['default']):
+            self.assertEqual([client.get(url)['X-Cache'] for _ in range(2)], ['MISS', 'MISS'])
+        with override_settings(DATABASE_REPLICAS=[]):
+            etag = client.get(url)['ETag']
+        # O que foi montado no primário serve também quem lê das réplicas
+        with override_settings(DATABASE_REPLICAS=['default']):
+            self.assertEqual(client.get(url)['X-Cache'], 'HIT')
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.assertEqual(len(queries), 0)
+
+    def test_writes_and_migrations_use_primary(self):
+        router = PrimaryReplicaRouter()
+        animal = self.animals[0]
+        animal._state.db = 'replica1'
+        self.assertEqual(router.db_for_write(Animal, instance=animal), 'default')
+        self.assertTrue(router.allow_relation(animal, self.ngo))
+        self.assertFalse(router.allow_migrate('replica1', 'api'))
+        self.assertIsNone(router.allow_migrate('default', 'api'))
+
+    def test_write_pins_client_to_primary(self):
+        factory = APIRequestFactory()
+        self.assertFalse(is_pinned(factory.get('/')))
+        response = self.client.post('/api/adoptions/', {'animal': self.animals[1].pk}, format='json')
+        self.assertLess(response.status_code, 500)
+        self.assertTrue(is_pinned(factory.get('/')))
+        # Outro cliente continua lendo das réplicas
+        self.assertFalse(is_pinned(factory.get('/', REMOTE_ADDR='10.0.0.2')))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_sqlite_pragmas(self):
+        path = tempfile.mktemp(suffix='.sqlite3')
+        self.addCleanup(lambda: [os.remove(name) for name in (path, f'{path}-wal', f'{path}-shm')
+                                 if os.path.exists(name)])
+        default = connections['default']
+        wrapper = default.__class__({**default.settings_dict, 'NAME': path}, alias='pragmas')
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            values = [cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                      for name in ('journal_mode', 'synchronous', 'mmap_size', 'busy_timeout')]
+        self.assertEqual(values, ['wal', 1, 256 * 1024 * 1024, 20000])
+
+        # O banco versionado no repositório não passa para WAL
+        kept_path = f'{path}.kept'
+        self.addCleanup(lambda: os.path.exists(kept_path) and os.remove(kept_path))
+        with override_settings(SQLITE_KEEP_JOURNAL=[kept_path]):
+            kept = default.__class__({**default.settings_dict, 'NAME': kept_path}, alias='kept')
+            self.addCleanup(kept.close)
+            with kept.cursor() as cursor:
+                self.assertEqual(cursor.execute('PRAGMA journal_mode').fetchone()[0], 'delete')
+
+
+class JobQueueTests(PetHavenTestCase):
+    """Fila de tarefas no banco: efeitos das mudanças de adoção fora da requisição"""
+
+    def setUp(self):
+        super().setUp()
+        Job.objects.all().delete()
+        self.adoption = Adoption.objects.get(animal=self.animals[1], status='pending')
+
+    def failing_task(self, **payload):
+        def fail(**kwargs):
+            raise RuntimeError('SMTP fora do ar')
+        TASKS['test.fail'] = fail
+        self.addCleanup(TASKS.pop, 'test.fail', None)
+        return enqueue('test.fail', payload)
+
+    def test_status_change_enqueues_and_worker_notifies(self):
+        response = self.client.post(f'/api/adoptions/{self.adoption.pk}/update_status/', {'status': 'approved'},
+                                    format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mail.outbox, [])
+        job = Job.objects.get()
+        self.assertEqual(job.payload, {'adoption_id': self.adoption.pk, 'status': 'approved', 'previous': 'pending'})
+
+        self.assertEqual(run_pending(), ['done'])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('done', 1))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox),
+                         sorted([self.user.email, self.animals[1].ngo.email]))
+        self.assertIn('Aprovado', mail.outbox[0].subject)
+
+    def test_rolled_back_transition_leaves_no_job(self):
+        Adoption.objects.create(user=self.users[2], animal=self.animals[2], status='approved')
+        Job.objects.all().delete()
+        other = Adoption.objects.get(animal=self.animals[2], user=self.user, status='pending')
+        response = self.client.post(f'/api/adoptions/{other.pk}/update_status/', {'status': 'approved'},
+                                    format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Job.objects.exists())
+
+    def test_admin_cancellation_releases_animal(self):
+        self.adoption.status = 'approved'
+        self.adoption.save()
+        self.adoption.status = 'cancelled'
+        self.adoption.save()
+        self.assertFalse(Animal.objects.get(pk=self.animals[1].pk).is_available)
+        self.assertEqual(run_pending(), ['done', 'done'])
+        self.assertTrue(Animal.objects.get(pk=self.animals[1].pk).is_available)
+
+    def test_out_of_order_jobs_follow_database_state(self):
+        self.adoption.status = 'approved'
+        self.adoption.save()
+        self.adoption.status = 'cancelled'
+        self.adoption.save()
+        approved = Job.objects.order_by('pk').first()
+        # A aprovação (antiga) roda por último, como numa nova tentativa
+        Job.objects.filter(pk=approved.pk).update(run_at=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(run_pending(), ['done'])
+        Job.objects.filter(pk=approved.pk).update(run_at=timezone.now())
+        self.assertEqual(run_pending(), ['done'])
+        self.assertTrue(Animal.objects.get(pk=self.animals[1].pk).is_available)
+
+    def test_retry_with_backoff_then_failure(self):
+        job = self.failing_task()
+        start = timezone.now()
+        with self.assertLogs('api.jobs', 'WARNING'):
+            self.assertEqual(run_pending(), ['retry'])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_by), ('queued', 1, ''))
+        self.assertIn('SMTP fora do ar', job.last_error)
+        self.assertGreaterEqual(job.run_at, start + timedelta(seconds=settings.JOB_RETRY_BASE_SECONDS * 0.8))
+        # Ainda esperando: nada a fazer
+        self.assertEqual(run_pending(), [])
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now(), attempts=job.max_attempts - 1)
+        with self.assertLogs('api.jobs', 'WARNING') as logs:
+            self.assertEqual(run_pending(), ['failed'])
+        self.assertIn('tentativa 5/5', logs.output[0])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', job.max_attempts))
+
+    def test_claims_are_exclusive_and_expired_leases_return(self):
+        jobs = [self.failing_task(n=n) for n in range(3)]
+        first = claim('worker-a', 2)
+        self.assertEqual([job.pk for job in first], [job.pk for job in jobs[:2]])
+        self.assertEqual([job.pk for job in claim('worker-b', 5)], [jobs[2].pk])
+        self.assertEqual(claim('worker-c', 5), [])
+
+        expired = timezone.now() - timedelta(seconds=settings.JOB_LEASE_SECONDS + 1)
+        Job.objects.filter(pk=jobs[0].pk).update(locked_at=expired)
+        self.assertEqual([job.pk for job in claim('worker-c', 5)], [jobs[0].pk])
+        # O worker que perdeu a reserva não grava resultado
+        self.assertIsNone(execute(jobs[0].pk, 'worker-a'))
+        self.assertEqual(Job.objects.get(pk=jobs[0].pk).locked_by, 'worker-c')
+
+    def test_worker_command(self):
+        self.client.post(f'/api/adoptions/{self.adoption.pk}/update_status/', {'status': 'rejected'},
+                         format='json')
+        out = StringIO()
+        call_command('run_jobs', processes=0, once=True, stdout=out)
+        self.assertIn('1 tarefa(s): done', out.getvalue())
+        self.assertEqual(Job.objects.get().status, 'done')
+
+
+class MatchingTests(TestCase):
+    """/api/animals/matches/: ranking dos disponíveis pelo perfil do adotante"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.recife = NGO.objects.create(name='Patas Recife', city='Recife', email='recife@example.com')
+        cls.caruaru = NGO.objects.create(name='Patas Caruaru', city='Caruaru', email='caruaru@example.com')
+        cls.nowhere = NGO.objects.create(name='Sem mapa', city='Cidadezinha', email='x@example.com')
+
+        def animal(name, ngo, **fields):
+            fields = {'type': 'dog', 'size': 'medium', 'gender': 'male', 'age': 12, **fields}
+            return Animal.objects.create(name=name, breed='SRD', description='Teste', ngo=ngo, **fields)
+
+        cls.rex = animal('Rex', cls.recife, size='small', age=6)
+        cls.bob = animal('Bob', cls.caruaru, size='small', age=6)
+        cls.mia = animal('Mia', cls.recife, type='cat', gender='female', age=30)
+        cls.lost = animal('Perdido', cls.nowhere, size='small', age=6)
+        cls.adopted = animal('Adotado', cls.recife, size='small', age=6, is_available=False)
+
+    def setUp(self):
+        cache.clear()
+        # A matriz é do processo; cada teste começa de uma reconstrução
+        matching.matrix.generations = matching.matrix.columns = None
+        self.client = APIClient()
+
+    def matches(self, **params):
+        response = self.client.get('/api/animals/matches/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [(row['name'], row['match_score'], row['distance_km']) for row in response.data['results']]
+
+    def test_ranking(self):
+        results = self.matches(type='dog', size='small', age_max=12, near='-8.05,-34.88', radius=10)
+        self.assertEqual([name for name, _, _ in results], ['Rex', 'Bob', 'Perdido', 'Mia'])
+        self.assertGreater(results[0][1], results[1][1])
+        self.assertLess(results[0][2], 1)
+        self.assertGreater(results[1][2], 100)
+        self.assertIsNone(results[2][2])
+        # Sem critério nenhum, todos empatam e o desempate é pelo id
+        self.assertEqual(self.matches(), [(name, 0.0, None) for name in ('Rex', 'Bob', 'Mia', 'Perdido')])
+        self.assertEqual([name for name, _, _ in self.matches(type='cat,other', gender='female', limit=1)],
+                         ['Mia'])
+
+    def test_invalid_preferences(self):
+        for params in ({'type': 'dragon'}, {'near': '91,0'}, {'age_min': 10, 'age_max': 5},
+                       {'limit': settings.MATCHING_MAX_RESULTS + 1}):
+            response = self.client.get('/api/animals/matches/', params)
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_incremental_refresh(self):
+        self.assertEqual(self.matches(type='cat')[0][0], 'Mia')
+        with CaptureQueriesContext(connection) as queries:
+            self.matches(type='cat')
+        # Sem escrita nova, a matriz não relê o banco: só a busca dos animais da página
+        self.assertEqual(len([q for q in queries if 'api_animal' in q['sql']]), 1)
+
+        self.bob.type = 'cat'
+        self.bob.save()
+        self.assertEqual([name for name, score, _ in self.matches(type='cat') if score == 1], ['Bob', 'Mia'])
+        self.mia.is_available = False
+        self.mia.save()
+        self.assertNotIn('Mia', [name for name, _, _ in self.matches()])
+        self.mia.is_available = True
+        self.mia.save()
+        self.rex.delete()
+        self.assertEqual([name for name, _, _ in self.matches()], ['Bob', 'Mia', 'Perdido'])
+
+    def test_apply_mixed_batch(self):
+        self.matches()
+        Animal.objects.filter(pk=self.adopted.pk).update(is_available=True)
+        Animal.objects.filter(pk=self.mia.pk).update(is_available=False)
+
+        def changed(*animals):
+            by_pk = {row[0]: row for row in Animal.objects.filter(pk__in=[a.pk for a in animals])
+                     .values_list(*matching.SOURCE_FIELDS, 'is_available')}
+            return [by_pk[a.pk] for a in animals]
+
+        # Entrada e saída no mesmo lote: a nova linha fica depois das remoções
+        matching.matrix.apply(changed(self.adopted, self.mia))
+        columns = matching.matrix.columns
+        self.assertEqual({int(columns['id'][i]): i for i in range(len(columns['id']))}, matching.matrix.index)
+        Animal.objects.filter(pk=self.adopted.pk).update(age=40)
+        matching.matrix.apply(changed(self.adopted))
+        self.assertEqual(matching.matrix.columns['age'][matching.matrix.index[self.adopted.pk]], 40)
+        self.assertEqual([name for name, _, _ in self.matches()], ['Rex', 'Bob', 'Perdido', 'Adotado'])
+
+    def test_periodic_resync_sees_other_processes(self):
+        self.assertIn('Mia', [name for name, _, _ in self.matches()])
+        # Escrita sem sinais, como a de outro processo com cache local: as gerações não mudam
+        Animal.objects.filter(pk=self.mia.pk).update(type='other', updated_at=timezone.now())
+        self.assertEqual(self.matches(type='other'), [(name, 0.0, None) for name in ('Rex', 'Bob', 'Mia', 'Perdido')])
+        matching.matrix.synced_at -= timedelta(seconds=settings.MATCHING_REFRESH_SECONDS + 1)
+        self.assertEqual(self.matches(type='other')[0], ('Mia', 1.0, None))
+
+    @skipUnless(matching.np is not None, 'numpy não instalado')
+    def test_python_fallback_matches_numpy(self):
+        params = {'type': ['dog'], 'size': ['small', 'large'], 'age_min': 10, 'age_max': 20,
+                  'near': (-8.05, -34.88), 'radius': 25}
+        expected = matching.top_matches(params, 10)
+        with mock.patch.object(matching, 'np', None):
+            matching.matrix.generations = None
+            matching.matrix.columns = None
+            self.assertEqual(matching.top_matches(params, 10), expected)
+
+
+class FacetTests(PetHavenTestCase):
+    """/api/animals/facets/: contagens da barra de filtros numa consulta"""
+
+    def facets(self, **params):
+        response = self.client.get('/api/animals/facets/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data
+
+    def list_count(self, **params):
+        return self.client.get('/api/animals/', {**params, 'page_size': 1}).data['count']
+
+    def test_counts_exclude_own_filter(self):
+        Animal.objects.filter(name='Animal 3').update(is_available=False)
+        params = {'type': 'dog', 'gender': 'male', 'search': 'animal'}
+        data = self.facets(**params)
+        self.assertEqual(data['count'], self.list_count(**params))
+        # Cada valor de cada faceta bate com a listagem com esse valor no lugar do filtro
+        for name, values in data['facets'].items():
+            for entry in values:
+                value = str(entry['value']).lower() if isinstance(entry['value'], bool) else entry['value']
+                self.assertEqual(entry['count'], self.list_count(**{**params, name: value}), (name, entry))
+        types = {entry['value']: entry['count'] for entry in data['facets']['type']}
+        # Machos entre "Animal 0..7": cães 0 e 6, gato 4, outro 2 (os filhotes não casam com a busca)
+        self.assertEqual(types, {'dog': 2, 'cat': 1, 'other': 1})
+        self.assertEqual(data['facets']['ngo'], [
+            {'value': self.ngos[i].pk, 'label': f'ONG {i}', 'count': 1} for i in (0, 6)
+        ])
+        self.assertEqual(data['facets']['is_available'][0]['label'], 'Sim')
+
+    def test_single_grouped_query(self):
+        with self.assertNumQueries(1):
+            data = self.facets(size='small', is_available='true', near='-8.05,-34.88', radius=50)
+        self.assertEqual(data['count'], self.list_count(size='small', near='-8.05,-34.88', radius=50))
+        sizes = {entry['value']: entry['count'] for entry in data['facets']['size']}
+        self.assertEqual(sizes, {
+            size: self.list_count(size=size, near='-8.05,-34.88', radius=50) for size in ('small', 'medium', 'large')
+        })
+
+    def test_invalid_filter(self):
+        self.assertEqual(self.client.get('/api/animals/facets/', {'type': 'dragon'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/animals/facets/', {'ngo': 999999}).status_code, 400)
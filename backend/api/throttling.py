@@ -0,0 +1,143 @@
+import math
+import time
+
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'100/min' -> (100, 60), como nas taxas do DRF"""
+    limit, period = rate.split('/')
+    return int(limit), DURATIONS[period[0]]
+
+
+class RateLimit:
+    """Situação de um limite para os cabeçalhos RateLimit-* (api/middleware.py)"""
+    __slots__ = ('scope', 'limit', 'remaining', 'reset', 'duration')
+
+    def __init__(self, scope, limit, remaining, reset, duration):
+        self.scope = scope
+        self.limit = limit
+        self.remaining = remaining
+        self.reset = reset
+        self.duration = duration
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    Janela deslizante aproximada: contadores por janela fixa no cache
+    'throttle', compartilhado pelos workers, com a janela anterior pesando o
+    quanto ainda se sobrepõe à atual. `cache.incr` é atômico no Redis; nos
+    arquivos é ler e gravar, e requisições simultâneas do mesmo cliente
+    podem passar um pouco do limite. Uma requisição recusada devolve o que
+    contou. Sem taxa configurada para o escopo, não limita.
+
+    Guarda no request o limite mais apertado para os cabeçalhos RateLimit-*.
+    """
+    cache = ConnectionProxy(caches, 'throttle')
+    timer = time.time
+    scope = None
+    cache_format = 'throttle:%(scope)s:%(ident)s:%(window)d'
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        scope = self.get_scope(request, view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope) if scope else None
+        if rate is None:
+            return True
+        limit, duration = parse_rate(rate)
+        ident = self.get_client_ident(request)
+
+        now = self.timer()
+        window, elapsed = divmod(now, duration)
+        key = self.cache_format % {'scope': scope, 'ident': ident, 'window': window}
+        previous = self.cache.get(self.cache_format % {'scope': scope, 'ident': ident, 'window': window - 1}, 0)
+        current = self.increment(key, duration)
+        overlap = 1 - elapsed / duration
+        allowed = previous * overlap + current <= limit
+        if not allowed:
+            current = self.cache.decr(key)
+            self.wait_seconds = self.compute_wait(limit, duration, elapsed, previous, current)
+
+        self.record(request, RateLimit(
+            scope, limit, max(0, math.floor(limit - previous * overlap - current)),
+            math.ceil(duration - elapsed), duration,
+        ))
+        return allowed
+
+    def increment(self, key, duration):
+        # Duas janelas de vida: a atual ainda serve de "anterior" na seguinte
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            if self.cache.add(key, 1, timeout=2 * duration):
+                return 1
+            return self.cache.incr(key)
+
+    def compute_wait(self, limit, duration, elapsed, previous, current):
+        """Segundos até a próxima requisição caber no limite"""
+        if current + 1 <= limit:
+            # Ainda na janela atual, quando o peso da anterior cair o bastante
+            return max(0.0, (1 - (limit - current - 1) / previous) * duration - elapsed) if previous else 0.0
+        # Só na janela seguinte, em que a atual passa a ser a anterior
+        return duration - elapsed + max(0.0, 1 - (limit - 1) / current) * duration
+
+    def wait(self):
+        return self.wait_seconds
+
+    def get_scope(self, request, view):
+        return self.scope
+
+    def get_client_ident(self, request):
+        """Usuário autenticado (token ou sessão) ou, para anônimos, o IP (ver NUM_PROXIES)"""
+        if request.user and request.user.is_authenticated:
+            return f'user-{request.user.pk}'
+        return f'ip-{self.get_ident(request)}'
+
+    def record(self, request, rate_limit):
+        current = getattr(request._request, 'rate_limit', None)
+        if current is None or rate_limit.remaining < current.remaining:
+            request._request.rate_limit = rate_limit
+
+
+class ClientRateThrottle(SlidingWindowThrottle):
+    """Limite geral por cliente: escopo 'user' com login, 'anon' por IP sem"""
+
+    def get_scope(self, request, view):
+        return 'user' if request.user and request.user.is_authenticated else 'anon'
+
+
+class ScopedRateThrottle(SlidingWindowThrottle):
+    """
+    Limites por tipo de operação, somados ao geral. O escopo vem de
+    `throttle_scopes = {action: escopo}` na view, senão de `throttle_scope`;
+    sem nenhum dos dois, buscas (?search= numa view com search_fields) caem
+    em 'search' e métodos de escrita em 'write'.
+    """
+
+    def get_scope(self, request, view):
+        scope = getattr(view, 'throttle_scopes', {}).get(getattr(view, 'action', None))
+        scope = scope or getattr(view, 'throttle_scope', None)
+        if scope:
+            return scope
+        if getattr(view, 'search_fields', None) and request.query_params.get(api_settings.SEARCH_PARAM):
+            return 'search'
+        if request.method not in SAFE_METHODS:
+            return 'write'
+        return None
+
+
+def throttle_scope(scope):
+    """
+    `throttle_scope` para uma view-função do @api_view, que não repassa
+    esse atributo à classe gerada. Vai por cima do @api_view.
+    """
+    def decorator(view):
+        view.cls.throttle_scope = scope
+        return view
+    return decorator
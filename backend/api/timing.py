@@ -0,0 +1,89 @@
+import logging
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Medições da requisição em andamento; None fora do RequestTimingMiddleware.
+# Um ContextVar acompanha também as threads do sync_to_async (views assíncronas).
+current_timings = ContextVar('current_timings', default=None)
+
+
+class RequestTimings:
+    """Tempos (em segundos) e contagem de queries de uma requisição"""
+    __slots__ = ('start', 'view_name', 'view_start', 'view', 'queries', 'sql', 'serializer', 'serializing')
+
+    def __init__(self):
+        self.start = perf_counter()
+        self.view_name = None
+        self.view_start = None
+        self.view = None
+        self.queries = 0
+        self.sql = 0.0
+        self.serializer = 0.0
+        self.serializing = False
+
+
+_IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)+\s*\)')
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%s")
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """SQL sem valores, para agrupar no log as execuções da mesma query"""
+    sql = _SPACES.sub(' ', sql).strip()
+    sql = _IN_LIST.sub('(...)', sql)
+    return _LITERALS.sub('?', sql)
+
+
+def sql_timer(execute, sql, params, many, context):
+    """
+    execute_wrapper instalado em toda conexão (api/signals.py): fora de uma
+    requisição medida custa uma leitura de ContextVar.
+    """
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = perf_counter() - start
+        timings.queries += 1
+        timings.sql += elapsed
+        if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+            logger.warning('SQL lento (%.1f ms) em %s: %s', elapsed * 1000, timings.view_name or '-',
+                           normalize_sql(sql))
+
+
+def install_sql_timer(connection):
+    if sql_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_timer)
+
+
+@contextmanager
+def timed_serialization():
+    """Soma o bloco ao tempo de serialização da requisição (aninhados contam uma vez)"""
+    timings = current_timings.get()
+    if timings is None or timings.serializing:
+        yield
+        return
+    timings.serializing = True
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timings.serializer += perf_counter() - start
+        timings.serializing = False
+
+
+class TimedSerializerMixin:
+    """Conta o to_representation do serializer no tempo de serialização da requisição"""
+
+    def to_representation(self, instance):
+        with timed_serialization():
+            return super().to_representation(instance)
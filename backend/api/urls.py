@@ -1,8 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework.authtoken.views import obtain_auth_token
-from .views import UserViewSet, NGOViewSet, AnimalViewSet, AdoptionViewSet, ReviewViewSet
+from .views import UserViewSet, NGOViewSet, AnimalViewSet, AdoptionViewSet, ReviewViewSet, cache_stats
 from .auth import register_user, CustomAuthToken
+from . import async_views
 
 # Create a router and register our viewsets with it
 router = DefaultRouter()
@@ -15,9 +16,20 @@ router.register(r'reviews', ReviewViewSet)
 # The API URLs are now determined automatically by the router
 urlpatterns = [
     path('', include(router.urls)),
-    path('auth/', include('rest_framework.urls')),  # Adds login/logout for browsable API
     
-    # Autenticação customizada
+    # Autenticação customizada (antes do include abaixo, que também tem auth/login/)
     path('auth/register/', register_user, name='register'),
     path('auth/login/', CustomAuthToken.as_view(), name='login'),
+    path('auth/', include('rest_framework.urls')),  # Adds login/logout for browsable API
+    
+    # Métricas
+    path('metrics/cache/', cache_stats, name='cache-stats'),
+    
+    # Leituras assíncronas (servidor ASGI), mesmo payload e cache das rotas acima
+    path('async/ngos/', async_views.NGOListView.as_view(), name='async-ngo-list'),
+    path('async/ngos/<pk>/', async_views.NGODetailView.as_view(), name='async-ngo-detail'),
+    path('async/ngos/<pk>/animals/', async_views.NGOAnimalsView.as_view(), name='async-ngo-animals'),
+    path('async/animals/', async_views.AnimalListView.as_view(), name='async-animal-list'),
+    path('async/animals/<pk>/', async_views.AnimalDetailView.as_view(), name='async-animal-detail'),
+    path('async/animals/<pk>/reviews/', async_views.AnimalReviewsView.as_view(), name='async-animal-reviews'),
 ]
@@ -1,11 +1,30 @@
 from rest_framework import viewsets, permissions, filters, status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
+from rest_framework.parsers import MultiPartParser, FormParser
+from django_filters import utils as filter_utils
 from django_filters.rest_framework import DjangoFilterBackend
 from django.contrib.auth.models import User
 
 from .models import NGO, Animal, Adoption, Review
-from .serializers import UserSerializer, NGOSerializer, AnimalSerializer, AdoptionSerializer, ReviewSerializer
+from .serializers import (
+    UserSerializer, NGOSerializer, AnimalSerializer, AdoptionSerializer, AdoptionBatchStatusSerializer,
+    MatchPreferencesSerializer, ReviewSerializer,
+)
+from .search import FullTextSearchFilter
+from .geo import ProximityFilter
+from .facets import facet_counts
+from .matching import top_matches
+from .cache import cache_response, response_cache_stats
+from .authentication import token_cache
+from .conditional import conditional_response
+from .databases import ReplicaReadMixin
+from .importer import detect_format, import_animals
+from .export import ExportMixin
+from .fastpath import FastListMixin
+from .sparse import SparseFieldsViewMixin, sparse_queryset
+from .stats import ngo_stats
+from .adoptions import TransitionError, transition_adoptions
 
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
@@ -17,81 +36,234 @@ class UserViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def adoptions(self, request, pk=None):
         user = self.get_object()
-        adoptions = Adoption.objects.filter(user=user)
-        serializer = AdoptionSerializer(adoptions, many=True)
+        context = self.get_serializer_context()
+        adoptions = sparse_queryset(Adoption.objects.filter(user=user), AdoptionSerializer, context)
+        serializer = AdoptionSerializer(adoptions, many=True, context=context)
         return Response(serializer.data)
     
     @action(detail=True, methods=['get'])
     def reviews(self, request, pk=None):
         user = self.get_object()
-        reviews = Review.objects.filter(user=user)
-        serializer = ReviewSerializer(reviews, many=True)
+        context = self.get_serializer_context()
+        reviews = sparse_queryset(Review.objects.filter(user=user), ReviewSerializer, context)
+        serializer = ReviewSerializer(reviews, many=True, context=context)
         return Response(serializer.data)
 
-class NGOViewSet(viewsets.ModelViewSet):
+class NGOViewSet(ReplicaReadMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = NGO.objects.all()
     serializer_class = NGOSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [filters.SearchFilter, DjangoFilterBackend]
+    filter_backends = [FullTextSearchFilter, ProximityFilter, DjangoFilterBackend, filters.OrderingFilter]
     search_fields = ['name', 'city', 'email']
+    search_fts_table = 'api_ngo_fts'
+    search_fts_weights = [10.0, 5.0, 1.0]
     filterset_fields = ['city']
+    ordering_fields = ['name', 'rating_average', 'rating_count']
+    
+    @conditional_response(NGO)
+    @cache_response(NGO)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @conditional_response(NGO)
+    @cache_response(NGO)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
     
     @action(detail=True, methods=['get'])
+    @cache_response(NGO, Animal, Adoption, Review)
     def animals(self, request, pk=None):
         ngo = self.get_object()
-        animals = Animal.objects.filter(ngo=ngo)
+        animals = Animal.objects.using(ngo._state.db).select_related('ngo').filter(ngo=ngo)
         serializer = AnimalSerializer(animals, many=True)
         return Response(serializer.data)
+    
+    @action(detail=True)
+    @cache_response(NGO, Animal, Adoption)
+    def stats(self, request, pk=None):
+        """Animais disponíveis por tipo/porte, adoções por status e mediana até a aprovação"""
+        return Response(ngo_stats(self.get_object()))
 
-class AnimalViewSet(viewsets.ModelViewSet):
-    queryset = Animal.objects.all()
+class AnimalViewSet(ReplicaReadMixin, FastListMixin, ExportMixin, viewsets.ModelViewSet):
+    queryset = Animal.objects.select_related('ngo')
     serializer_class = AnimalSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [filters.SearchFilter, DjangoFilterBackend, filters.OrderingFilter]
+    filter_backends = [FullTextSearchFilter, ProximityFilter, DjangoFilterBackend, filters.OrderingFilter]
     search_fields = ['name', 'breed', 'description']
+    search_fts_table = 'api_animal_fts'
+    search_fts_weights = [10.0, 5.0, 1.0]
+    # ?near= usa a localização da ONG do animal
+    near_prefix = 'ngo__'
+    throttle_scopes = {'bulk_import': 'import', 'matches': 'search'}
     filterset_fields = ['type', 'size', 'gender', 'ngo', 'is_available']
-    ordering_fields = ['name', 'age', 'created_at']
+    ordering_fields = ['name', 'age', 'created_at', 'rating_average', 'rating_count']
+    export_fields = ['id', 'name', 'type', 'breed', 'age', 'size', 'gender', 'description',
+                     'ngo', 'ngo__name', 'is_available', 'created_at', 'updated_at']
+    
+    @conditional_response(NGO, Animal, timestamps=['updated_at', 'ngo__updated_at'])
+    @cache_response(NGO, Animal, Adoption, Review)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @conditional_response(NGO, Animal, timestamps=['updated_at', 'ngo__updated_at'])
+    @cache_response(NGO, Animal, Adoption, Review)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser, FormParser])
+    def bulk_import(self, request):
+        """
+        Importa animais de um arquivo CSV ou NDJSON (campo `file`). O campo
+        opcional `ngo` vale para as linhas que não informam a ONG.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"error": "Envie o arquivo no campo 'file'"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        file_format = request.data.get('file_format') or detect_format(upload.name)
+        if file_format not in ('csv', 'ndjson'):
+            return Response({"error": "Formato inválido"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        report = import_animals(upload, file_format, default_ngo=request.data.get('ngo'))
+        response_status = status.HTTP_201_CREATED if report.created else status.HTTP_400_BAD_REQUEST
+        return Response(report.as_dict(), status=response_status)
+    
+    @action(detail=False, methods=['get'])
+    @cache_response(NGO, Animal)
+    def facets(self, request):
+        """
+        Contagens de type, size, gender, ngo e is_available sob a busca e os
+        filtros atuais (mesmos parâmetros da listagem), cada faceta ignorando
+        o próprio filtro: a barra de filtros inteira numa requisição.
+        """
+        queryset = self.get_queryset()
+        for backend in self.filter_backends:
+            if backend not in (DjangoFilterBackend, filters.OrderingFilter):
+                queryset = backend().filter_queryset(request, queryset, self)
+        filterset = DjangoFilterBackend().get_filterset(request, queryset, self)
+        if not filterset.is_valid():
+            raise filter_utils.translate_validation(filterset.errors)
+        selected = dict(filterset.form.cleaned_data)
+        if selected.get('ngo') is not None:
+            selected['ngo'] = selected['ngo'].pk
+        return Response(facet_counts(queryset, selected))
+    
+    @action(detail=False, methods=['get'])
+    def matches(self, request):
+        """
+        Animais disponíveis do mais ao menos afinado com o perfil (?type=,
+        size=, gender=, age_min=, age_max=, near=lat,lon&radius=, limit=),
+        com `match_score` de 0 a 1 e `distance_km` quando há near.
+        """
+        preferences = MatchPreferencesSerializer(data=request.query_params)
+        preferences.is_valid(raise_exception=True)
+        ranked = top_matches(preferences.validated_data, preferences.validated_data['limit'])
+        # A matriz pode estar um instante atrás do banco: só o que ainda está disponível
+        animals = self.get_queryset().filter(is_available=True).in_bulk([pk for pk, _, _ in ranked])
+        ranked = [(animals[pk], score, distance) for pk, score, distance in ranked if pk in animals]
+        serializer = self.get_serializer([animal for animal, _, _ in ranked], many=True)
+        results = [
+            dict(data, match_score=score, distance_km=distance)
+            for data, (_, score, distance) in zip(serializer.data, ranked)
+        ]
+        return Response({'count': len(results), 'results': results})
     
     @action(detail=True, methods=['get'])
     def adoptions(self, request, pk=None):
         animal = self.get_object()
-        adoptions = Adoption.objects.filter(animal=animal)
-        serializer = AdoptionSerializer(adoptions, many=True)
+        context = self.get_serializer_context()
+        adoptions = sparse_queryset(Adoption.objects.using(animal._state.db).filter(animal=animal),
+                                    AdoptionSerializer, context)
+        serializer = AdoptionSerializer(adoptions, many=True, context=context)
         return Response(serializer.data)
     
     @action(detail=True, methods=['get'])
     def reviews(self, request, pk=None):
         animal = self.get_object()
-        reviews = Review.objects.filter(animal=animal)
-        serializer = ReviewSerializer(reviews, many=True)
+        context = self.get_serializer_context()
+        reviews = sparse_queryset(Review.objects.using(animal._state.db).filter(animal=animal),
+                                  ReviewSerializer, context)
+        serializer = ReviewSerializer(reviews, many=True, context=context)
         return Response(serializer.data)
 
-class AdoptionViewSet(viewsets.ModelViewSet):
-    queryset = Adoption.objects.all()
+class AdoptionViewSet(SparseFieldsViewMixin, FastListMixin, ExportMixin, viewsets.ModelViewSet):
+    queryset = Adoption.objects.select_related('user', 'animal__ngo')
     serializer_class = AdoptionSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['status', 'user', 'animal']
+    export_fields = ['id', 'status', 'adoption_date', 'updated_at', 'notes', 'user', 'user__username',
+                     'user__email', 'animal', 'animal__name', 'animal__ngo', 'animal__ngo__name']
+    
+    @conditional_response(NGO, Animal, Adoption, untimed=(User,),
+                          timestamps=['updated_at', 'animal__updated_at', 'animal__ngo__updated_at'])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @conditional_response(NGO, Animal, Adoption, untimed=(User,),
+                          timestamps=['updated_at', 'animal__updated_at', 'animal__ngo__updated_at'])
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
     
     @action(detail=True, methods=['post'])
     def update_status(self, request, pk=None):
         adoption = self.get_object()
-        status = request.data.get('status')
+        new_status = request.data.get('status')
         
-        if status not in dict(Adoption.STATUS_CHOICES).keys():
+        if new_status not in dict(Adoption.STATUS_CHOICES).keys():
             return Response({"error": "Invalid status"}, status=status.HTTP_400_BAD_REQUEST)
-            
-        adoption.status = status
-        adoption.save()
         
-        serializer = AdoptionSerializer(adoption)
+        try:
+            transition_adoptions({adoption.pk: new_status})
+        except TransitionError as exc:
+            return self.transition_error(exc)
+        
+        serializer = self.get_serializer(self.get_queryset().get(pk=adoption.pk))
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['post'])
+    def batch_status(self, request):
+        """
+        Aplica várias mudanças de status numa transação:
+        {"changes": [{"id": 1, "status": "approved"}, ...], "reject_competing": true}.
+        Se uma falhar, nenhuma é aplicada.
+        """
+        serializer = AdoptionBatchStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        changes = {change['id']: change['status'] for change in serializer.validated_data['changes']}
+        
+        try:
+            updated, rejected = transition_adoptions(
+                changes, reject_competing=serializer.validated_data['reject_competing'],
+            )
+        except TransitionError as exc:
+            return self.transition_error(exc)
+        
+        adoptions = self.get_queryset().filter(pk__in=[adoption.pk for adoption in updated]).order_by('pk')
+        return Response({
+            'updated': self.get_serializer(adoptions, many=True).data,
+            'auto_rejected': [adoption.pk for adoption in rejected],
+        })
+    
+    def transition_error(self, exc):
+        response_status = status.HTTP_409_CONFLICT if exc.conflict else status.HTTP_400_BAD_REQUEST
+        return Response({"error": "Mudança de status recusada", "details": exc.errors}, status=response_status)
 
-class ReviewViewSet(viewsets.ModelViewSet):
-    queryset = Review.objects.all()
+class ReviewViewSet(SparseFieldsViewMixin, FastListMixin, ExportMixin, viewsets.ModelViewSet):
+    queryset = Review.objects.select_related('user', 'animal__ngo')
     serializer_class = ReviewSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['user', 'animal', 'rating']
     ordering_fields = ['rating', 'created_at']
+    export_fields = ['id', 'rating', 'comment', 'created_at', 'user', 'user__username',
+                     'animal', 'animal__name']
+
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def cache_stats(request):
+    """
+    Contadores de acerto/falha dos caches da API
+    """
+    return Response({'responses': response_cache_stats(), 'tokens': token_cache.stats()})
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -48,6 +49,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',  # Antes de quem lê ou altera o corpo da resposta
+    'api.middleware.RequestTimingMiddleware',  # Server-Timing e log de lentidão das rotas da API
+    'api.middleware.RateLimitHeadersMiddleware',  # RateLimit-* dos throttles (api/throttling.py)
+    'api.middleware.ReplicaPinningMiddleware',  # Leituras no primário logo após uma escrita
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',  # Middleware de localização
     'corsheaders.middleware.CorsMiddleware',
@@ -84,10 +89,66 @@ WSGI_APPLICATION = 'pethaven.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        # PETHAVEN_DB_PATH: banco fora do repositório (o db.sqlite3 versionado é só para desenvolvimento)
+        'NAME': BASE_DIR / os.environ.get('PETHAVEN_DB_PATH', 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        # Espera (s) pelo lock de escrita antes de "database is locked"
+        'OPTIONS': {'timeout': 20},
     }
 }
 
+# Réplicas de leitura: arquivos SQLite separados por vírgula em PETHAVEN_DB_REPLICAS
+# (ex.: replica.sqlite3; `manage.py sync_replicas` copia o primário para eles).
+# Leituras dos viewsets de ONGs e animais vão para elas (api/databases.py).
+for index, path in enumerate(filter(None, os.environ.get('PETHAVEN_DB_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'], 'NAME': BASE_DIR / path.strip(), 'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['api.databases.PrimaryReplicaRouter']
+REPLICA_PIN_SECONDS = 5
+
+# Aplicados em cada conexão SQLite (api/databases.py): WAL deixa leituras
+# seguirem durante uma escrita; com WAL, synchronous=NORMAL continua seguro
+# contra corrupção e só pode perder a última transação numa queda de energia
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+}
+# journal_mode fica gravado no cabeçalho do arquivo: nestes bancos (o
+# db.sqlite3 versionado) as conexões não mudam o modo do journal, e sem WAL
+# o synchronous fica no padrão
+SQLITE_KEEP_JOURNAL = [BASE_DIR / 'db.sqlite3']
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# As gerações usadas pelo cache de respostas (api/cache.py) precisam ser vistas
+# por todos os processos: em produção com vários workers, use um backend
+# compartilhado (Redis/Memcached) no lugar do LocMemCache.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pethaven',
+    },
+    # Contadores dos limites de requisição (api/throttling.py), que precisam valer somando
+    # todos os workers: em arquivos, compartilhados pelos processos da máquina, ou no
+    # Redis de PETHAVEN_THROTTLE_REDIS_URL, compartilhado entre máquinas e com incr atômico
+    'throttle': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['PETHAVEN_THROTTLE_REDIS_URL'],
+    } if os.environ.get('PETHAVEN_THROTTLE_REDIS_URL') else {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'var' / 'throttle',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
+RESPONSE_CACHE_TIMEOUT = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -144,25 +205,97 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Variações das fotos de animais (api/images.py), geradas num pool de threads
+# depois do commit do upload
+IMAGE_VARIANT_WIDTHS = [160, 320, 640]
+IMAGE_PIPELINE_WORKERS = 2
+IMAGE_PIPELINE_ASYNC = True
+
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',  # Alterado para permitir acesso anônimo por padrão
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ],
+    # orjson quando instalado (api/renderers.py); sem ele, o JSON padrão do DRF
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    # Janela deslizante no cache compartilhado (api/throttling.py): o limite geral por
+    # cliente e um por tipo de operação; throttle_scope(s) nas views escolhe o escopo
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.ClientRateThrottle',
+        'api.throttling.ScopedRateThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': '300/min',
+        'user': '1200/min',
+        'search': '60/min',
+        'auth': '10/min',
+        'write': '120/min',
+        'import': '20/hour',
+    },
+    # Proxies reversos confiáveis na frente da aplicação: com 0, o IP dos anônimos é o
+    # REMOTE_ADDR e um X-Forwarded-For inventado não troca o contador do cliente
+    'NUM_PROXIES': int(os.environ.get('PETHAVEN_NUM_PROXIES', 0)),
+    # Número de página (com count) por padrão; ?cursor= ativa a paginação keyset
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.HybridPagination',
     'PAGE_SIZE': 10,
 }
 
+# Listagens montadas de .values() sem passar pelos campos do DRF (api/fastpath.py)
+FAST_LIST_SERIALIZATION = True
+
+# Compressão das respostas (api/middleware.py): gzip, ou brotli se o pacote estiver instalado
+RESPONSE_COMPRESSION_MIN_SIZE = 1024  # bytes
+RESPONSE_COMPRESSION_BROTLI_QUALITY = 4
+
+# Busca por proximidade (?near=lat,lon&radius=km, api/geo.py)
+GEO_DEFAULT_RADIUS_KM = 25
+GEO_MAX_RADIUS_KM = 500
+
+# /api/animals/matches/ (api/matching.py): peso de cada critério informado no perfil
+MATCHING_WEIGHTS = {'type': 3, 'size': 2, 'gender': 1, 'age': 2, 'distance': 2}
+MATCHING_AGE_TOLERANCE = 24  # meses fora da faixa pedida até a idade deixar de pontuar
+MATCHING_MAX_RESULTS = 100
+# Ressincronização periódica da matriz, para escritas de outros processos que as gerações do cache não mostram
+MATCHING_REFRESH_SECONDS = 30
+
+# Instrumentação das requisições (api/middleware.py, api/timing.py)
+SERVER_TIMING_HEADER = True
+SLOW_REQUEST_MS = 500
+SLOW_QUERY_MS = 100
+
+# Fila de tarefas no banco (api/jobs.py), executada por `manage.py run_jobs`
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BASE_SECONDS = 30  # dobra a cada tentativa
+JOB_RETRY_MAX_SECONDS = 3600
+JOB_LEASE_SECONDS = 300  # reserva de um worker que parou de responder volta para a fila
+
+# Avisos de adoção (api/tasks.py); em desenvolvimento os e-mails vão para o console
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'PetHaven <nao-responda@pethaven.org>'
+
+# Cache de tokens em memória (api/authentication.py)
+TOKEN_CACHE_MAX_SIZE = 10000
+TOKEN_CACHE_TTL = 60  # segundos
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True  # In production, you'd specify specific origins
+CORS_EXPOSE_HEADERS = ['Retry-After', 'RateLimit-Limit', 'RateLimit-Remaining', 'RateLimit-Reset', 'RateLimit-Policy']
 
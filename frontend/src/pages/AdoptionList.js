@@ -17,7 +17,7 @@ const AdoptionList = () => {
       setLoading(true);
       try {
         // Usar URL completo para evitar problemas com o proxy
-        const response = await axios.get(`http://localhost:8000/api/adoptions/?user=${user.id}`);
+        const response = await axios.get(`http://localhost:8000/api/adoptions/?user=${user.id}&expand=animal_details`);
         setAdoptions(response.data.results || []);
       } catch (err) {
         setError('Falha ao carregar suas solicitações de adoção. Por favor, tente novamente mais tarde.');
@@ -27,7 +27,7 @@ const AnimalDetail = () => {
         if (isAuthenticated) {
           try {
             // Usar URL completo para evitar problemas com o proxy
-            const adoptionsResponse = await axios.get(`http://localhost:8000/api/adoptions/?animal=${id}&user=${user.id}`);
+            const adoptionsResponse = await axios.get(`http://localhost:8000/api/adoptions/?animal=${id}&user=${user.id}&fields=status`);
             if (adoptionsResponse.data.results.length > 0) {
               setAdoptionStatus(adoptionsResponse.data.results[0].status);
             }
@@ -43,11 +43,11 @@ const Profile = () => {
     setDataLoading(true);
     try {
       // Fetch adoptions - usar URL completo para evitar problemas com o proxy
-      const adoptionsResponse = await axios.get(`http://localhost:8000/api/adoptions/?user=${user.id}`);
+      const adoptionsResponse = await axios.get(`http://localhost:8000/api/adoptions/?user=${user.id}&expand=animal_details`);
       setAdoptions(adoptionsResponse.data.results || []);
       
       // Fetch reviews - usar URL completo para evitar problemas com o proxy
-      const reviewsResponse = await axios.get(`http://localhost:8000/api/reviews/?user=${user.id}`);
+      const reviewsResponse = await axios.get(`http://localhost:8000/api/reviews/?user=${user.id}&expand=animal_details`);
       setReviews(reviewsResponse.data.results || []);
     } catch (error) {
       console.error('Error fetching user data:', error);